@@ -0,0 +1,147 @@
+"""
+Audio Cache
+Content-addressed WAV files under my_data/audio_cache/, one per
+(text, voice, rate, backend). Fixed phrases are pre-rendered and pinned;
+everything else is evicted least-recently-used once the cache passes its
+size cap, except files held for lines still queued or playing.
+The files are the only state - LRU order is the file mtime.
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict
+
+
+def normalize(text):
+    return " ".join((text or "").split())
+
+
+class AudioCache:
+    def __init__(self, data_dir="my_data", max_bytes=50 * 1024 * 1024):
+        self.directory = os.path.join(data_dir, "audio_cache")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.pinned = set()
+        self.in_use = Counter()  # key -> utterances queued or playing from it
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    def _scan(self):
+        if not os.path.exists(self.directory):
+            return
+        files = []
+        for file in os.listdir(self.directory):
+            if not file.endswith(".wav") or ".tmp" in file:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, file))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, file[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def key(text, backend):
+        """sha256 over the backend's voice settings and the normalized text"""
+        return hashlib.sha256(f"{backend.cache_key}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".wav")
+
+    def get(self, text, backend):
+        """Path of the cached WAV for text, or None"""
+        key = self.key(text, backend)
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)  # Persist recency for the next startup
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+        return path
+
+    def hold(self, text, backend):
+        """Keep text's file from being evicted while it's queued or playing. Returns the key to release"""
+        key = self.key(text, backend)
+        with self._lock:
+            self.in_use[key] += 1
+        return key
+
+    def release(self, key):
+        with self._lock:
+            self.in_use[key] -= 1
+            if self.in_use[key] <= 0:
+                del self.in_use[key]
+
+    def render(self, text, backend, pin=False):
+        """Cached WAV for text, synthesizing it first if needed. None if the backend can't render"""
+        key = self.key(text, backend)
+        if pin:
+            with self._lock:
+                self.pinned.add(key)
+        path = self.get(text, backend)
+        if path:
+            return path
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp = os.path.join(self.directory, f"{key}.{threading.get_ident()}.tmp.wav")  # say picks the format from the extension
+        try:
+            if not backend.render(normalize(text), tmp):
+                return None
+            os.replace(tmp, path)  # Atomic - readers never see a half-written file
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        with self._lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = os.path.getsize(path)
+            self.total_bytes += self.entries[key]
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep=None):
+        """Drop least recently used files until under the cap - never pinned ones, ones held
+        for a queued or playing utterance, or keep (just rendered, about to be used)"""
+        for key in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self.pinned or key in self.in_use or key == keep:
+                continue
+            self.total_bytes -= self.entries.pop(key)
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def prerender(self, phrases, backend):
+        """Render and pin fixed phrases. Returns how many had to be synthesized"""
+        rendered = 0
+        for text in dict.fromkeys(normalize(p) for p in phrases if p):
+            known = self.key(text, backend) in self.entries
+            if self.render(text, backend, pin=True) and not known:
+                rendered += 1
+        return rendered
+
+    def stats(self):
+        return {
+            "files": len(self.entries),
+            "bytes": self.total_bytes,
+            "pinned": len(self.pinned),
+            "in_use": len(self.in_use),
+            "hits": self.hits,
+            "misses": self.misses
+        }
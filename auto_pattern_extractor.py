@@ -2,221 +2,628 @@
 Auto-Pattern Extraction Engine
 Learns AK's patterns from behavior, not self-reporting.
 Detects contradictions. Tracks outcomes. Builds consciousness foundation.
+
+History is streamed once: each record is normalized a single time and fanned
+out to every analyzer stage. Stages keep running aggregates, so the same
+pipeline serves full rebuilds and incremental updates. Large histories are
+split into row-id shards, analyzed across processes and merged in order.
+Order-dependent stages (transitions, loops, time of day) only see records with
+a timestamp - imports without one (WhatsApp) would interleave by row id and
+invent transitions. Every record counts towards language and beliefs.
 """
 
+import heapq
 import json
 import os
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from collections import Counter, defaultdict
 import re
+from memory_store import MemoryStore, get_memory_store
+from bm25_index import STOPWORDS
+from state_sequence import StateSequence
 
-class PatternExtractor:
-    def __init__(self, data_dir="my_data"):
-        self.data_dir = data_dir
-        self.min_instances = 5  # Minimum occurrences to declare a pattern
-        self.min_confidence = 0.50  # 50% threshold
-        
-    def load_all_conversations(self):
-        """Load every conversation from memory"""
-        conversations = []
-        
-        # Load from master file
-        master_file = os.path.join(self.data_dir, "conversations.json")
-        if os.path.exists(master_file):
+BELIEF_PATTERN = r"(i always|i never|i don't|i do) (.+?)(?:\.|$)"
+AGGREGATES_VERSION = 2  # Bump when what a stage counts changes - older saved state is rebuilt
+
+
+class Record:
+    """One conversation, unpacked once for every stage"""
+    __slots__ = ("has_state", "emoji", "content", "timestamp", "_lower", "_words", "_hour")
+
+    def __init__(self, conv):
+        state = conv.get("state", {})
+        self.has_state = isinstance(state, dict)
+        self.emoji = state.get("emoji") if self.has_state else None
+        self.content = conv.get("content", "") or ""
+        self.timestamp = conv.get("timestamp", "")
+        self._lower = None
+        self._words = None
+        self._hour = False
+
+    @property
+    def lower(self):
+        if self._lower is None:
+            self._lower = self.content.lower()
+        return self._lower
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = self.lower.split()
+        return self._words
+
+    @property
+    def hour(self):
+        """Hour of day, or None if the timestamp doesn't parse"""
+        if self._hour is False:
             try:
-                with open(master_file) as f:
-                    data = json.load(f)
-                    conversations.extend([c for c in data if isinstance(c, dict)])
+                self._hour = datetime.fromisoformat(self.timestamp).hour
             except:
-                pass
-        
-        # Load from daily files
-        for file in os.listdir(self.data_dir):
-            if file.startswith("conversations_") and file.endswith(".json"):
-                try:
-                    with open(os.path.join(self.data_dir, file)) as f:
-                        data = json.load(f)
-                        conversations.extend([c for c in data if isinstance(c, dict)])
-                except:
-                    pass
-        
-        return conversations
-    
-    def extract_state_transitions(self, conversations):
-        """Learn what triggers state changes"""
-        transitions = []
-        
-        for i in range(len(conversations) - 1):
-            curr = conversations[i]
-            next_conv = conversations[i + 1]
-            
-            if not isinstance(curr, dict) or not isinstance(next_conv, dict):
-                continue
-                
-            curr_state = curr.get("state", {})
-            next_state = next_conv.get("state", {})
-            
-            if not isinstance(curr_state, dict) or not isinstance(next_state, dict):
-                continue
-            
-            curr_emoji = curr_state.get("emoji")
-            next_emoji = next_state.get("emoji")
-            
-            if curr_emoji and next_emoji and curr_emoji != next_emoji:
-                # State changed - what was said?
-                trigger_text = next_conv.get("content", "")
-                
-                transitions.append({
-                    "from": curr_emoji,
-                    "to": next_emoji,
-                    "trigger": trigger_text[:100],
-                    "timestamp": next_conv.get("timestamp", "")
-                })
-        
-        return transitions
-    
-    def detect_loops(self, conversations):
-        """Find spiral loops - same state repeating"""
-        loops = []
-        current_loop = []
-        
-        for conv in conversations:
-            if not isinstance(conv, dict):
-                continue
-                
-            state = conv.get("state", {})
-            if not isinstance(state, dict):
-                continue
-                
-            emoji = state.get("emoji")
-            
-            # Spiral detection
-            if emoji == "🌀":
-                current_loop.append({
-                    "timestamp": conv.get("timestamp", ""),
-                    "content": conv.get("content", "")[:100]
+                self._hour = None
+        return self._hour
+
+
+class AnalyzerStage:
+    """
+    Base class for a pipeline stage. feed() sees every record once, in order;
+    result() turns the running state into this stage's slice of the report.
+    to_dict()/load() persist the running state between incremental runs.
+    merge() folds in a stage that saw the records right after this one's.
+    feed_batch() may override the per-record loop with vectorized work.
+    """
+    report_key = None
+    sequential = False  # Fed only timestamped records (order or time of day matters)
+
+    def feed(self, record):
+        raise NotImplementedError
+
+    def feed_batch(self, records, sequence):
+        for record in records:
+            self.feed(record)
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self, extractor):
+        raise NotImplementedError
+
+    def to_dict(self):
+        return {}
+
+    def load(self, data):
+        pass
+
+
+class TransitionStage(AnalyzerStage):
+    """Learn what triggers state changes"""
+    report_key = "state_transitions"
+    sequential = True
+
+    def __init__(self):
+        self.seen = False
+        self.first_emoji = None  # Needed to count the transition across a shard boundary
+        self.prev_emoji = None
+        self.counts = Counter()
+        self.total = 0
+
+    def feed(self, record):
+        emoji = record.emoji
+        if not self.seen:
+            self.seen = True
+            self.first_emoji = emoji
+        if self.prev_emoji and emoji and self.prev_emoji != emoji:
+            self.counts[f"{self.prev_emoji} → {emoji}"] += 1
+            self.total += 1
+        self.prev_emoji = emoji
+
+    def feed_batch(self, records, sequence):
+        if not records:
+            return
+        batch = type(self)()
+        batch.seen = True
+        batch.first_emoji = records[0].emoji
+        batch.prev_emoji = records[-1].emoji
+        for (a, b), count in sequence.transitions().items():
+            batch.counts[f"{a} → {b}"] = count
+        batch.total = sum(batch.counts.values())
+        self.merge(batch)
+
+    def merge(self, other):
+        if not other.seen:
+            return
+        if not self.seen:
+            self.seen = True
+            self.first_emoji = other.first_emoji
+        if self.prev_emoji and other.first_emoji and self.prev_emoji != other.first_emoji:
+            self.counts[f"{self.prev_emoji} → {other.first_emoji}"] += 1
+            self.total += 1
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.prev_emoji = other.prev_emoji
+
+    def result(self, extractor):
+        return {
+            "total": self.total,
+            "patterns": extractor._transition_patterns(self.counts, self.total)
+        }
+
+    def to_dict(self):
+        return {"seen": self.seen, "first_emoji": self.first_emoji, "prev_emoji": self.prev_emoji,
+                "counts": dict(self.counts), "total": self.total}
+
+    def load(self, data):
+        self.seen = data.get("seen", False)
+        self.first_emoji = data.get("first_emoji")
+        self.prev_emoji = data.get("prev_emoji")
+        self.counts = Counter(data.get("counts", {}))
+        self.total = data.get("total", 0)
+
+
+class LoopStage(AnalyzerStage):
+    """Find spiral loops - same state repeating"""
+    report_key = "loops_detected"
+    sequential = True
+    min_length = 3  # 3+ spirals in a row = loop
+    max_details = 5
+
+    def __init__(self):
+        self.run = None  # Open run: {"length", "start", "end"}
+        self.total = 0
+        self.details = []
+        # A run at the very start may continue one from the previous shard
+        self.seen = False
+        self.leading = False  # The open run started at our first state record
+        self.lead = None  # That run once closed
+
+    def feed(self, record):
+        if not record.has_state:
+            return
+        if not self.seen:
+            self.seen = True
+            self.leading = record.emoji == "🌀"
+        if record.emoji == "🌀":
+            if self.run is None:
+                self.run = {"length": 0, "start": record.timestamp, "end": record.timestamp}
+            self.run["length"] += 1
+            self.run["end"] = record.timestamp
+        else:
+            self._close_run()
+
+    def _close_run(self):
+        run = self.run
+        if run and self.leading:
+            self.lead = dict(run)
+            self.leading = False
+        if run and run["length"] >= self.min_length:
+            self.total += 1
+            if len(self.details) < self.max_details:
+                self.details.append({
+                    "duration": run["length"],
+                    "start": run["start"],
+                    "end": run["end"],
+                    "pattern": "spiral_loop"
                 })
+        self.run = None
+
+    def feed_batch(self, records, sequence):
+        batch = type(self)()
+        runs = sequence.state_runs("🌀")
+        batch.seen = any(r.has_state for r in records)
+        first_state = next((i for i, r in enumerate(records) if r.has_state), None)
+
+        for first, last, length, closed in runs:
+            run = {"length": length, "start": records[first].timestamp, "end": records[last].timestamp}
+            if first == first_state:
+                batch.leading = True
+            if closed:
+                batch.run = run
+                batch._close_run()
             else:
-                # Loop ended
-                if len(current_loop) >= 3:  # 3+ spirals in a row = loop
-                    loops.append({
-                        "duration": len(current_loop),
-                        "start": current_loop[0]["timestamp"],
-                        "end": current_loop[-1]["timestamp"],
-                        "pattern": "spiral_loop"
-                    })
-                current_loop = []
-        
-        return loops
-    
-    def extract_language_patterns(self, conversations):
-        """Learn AK's linguistic fingerprints per state"""
-        state_language = defaultdict(lambda: {"words": [], "phrases": []})
-        
-        for conv in conversations:
-            if not isinstance(conv, dict):
-                continue
-                
-            state = conv.get("state", {})
-            content = conv.get("content", "")
-            
-            if not isinstance(state, dict) or not content:
-                continue
-            
-            emoji = state.get("emoji")
-            if not emoji:
-                continue
-            
-            # Extract key phrases
-            words = content.lower().split()
-            state_language[emoji]["words"].extend(words)
-            
-            # Extract multi-word phrases
-            if len(words) >= 2:
-                phrases = [" ".join(words[i:i+2]) for i in range(len(words)-1)]
-                state_language[emoji]["phrases"].extend(phrases)
-        
-        # Calculate most common per state
+                batch.run = run
+        self.merge(batch)
+
+    def _extend_run(self, run):
+        if self.run is None:
+            self.run = dict(run)
+        else:
+            self.run["length"] += run["length"]
+            self.run["end"] = run["end"]
+
+    def merge(self, other):
+        if not other.seen:
+            return
+        if not self.seen:
+            self.seen = True
+            self.leading = other.leading or other.lead is not None
+
+        if other.leading:
+            # The other shard is one unbroken spiral - it just extends ours
+            self._extend_run(other.run)
+            return
+
+        skipped = 0
+        if other.lead:
+            # Its opening run continues ours; count the joined run once, here
+            self._extend_run(other.lead)
+            skipped = 1 if other.lead["length"] >= self.min_length else 0
+        self._close_run()
+
+        self.total += other.total - skipped
+        room = self.max_details - len(self.details)
+        if room > 0:
+            self.details.extend(other.details[skipped:skipped + room])
+        self.run = dict(other.run) if other.run else None
+
+    def result(self, extractor):
+        return {"total": self.total, "details": self.details}
+
+    def to_dict(self):
+        return {"run": self.run, "total": self.total, "details": self.details,
+                "seen": self.seen, "leading": self.leading, "lead": self.lead}
+
+    def load(self, data):
+        self.run = data.get("run")
+        self.total = data.get("total", 0)
+        self.details = data.get("details", [])
+        self.seen = data.get("seen", False)
+        self.leading = data.get("leading", False)
+        self.lead = data.get("lead")
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters over a stream of items, in at most `capacity` slots.
+    Exact until the cap is reached; after that an unseen item evicts the current
+    minimum and inherits its count, so counts overestimate by at most errors[item].
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}  # Only items that inherited a count
+        self._heap = None  # Lazy (count, item) min-heap, built at the first eviction
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, items):
+        counts = self.counts
+        for item in items:
+            if item in counts:
+                counts[item] += 1
+            elif len(counts) < self.capacity:
+                counts[item] = 1
+            else:
+                self._evict_for(item)
+
+    def _evict_for(self, item):
+        counts = self.counts
+        heap = self._heap
+        if heap is None:
+            heap = self._heap = [(c, i) for i, c in counts.items()]
+            heapq.heapify(heap)
+
+        # Counts only grow, so a stale heap entry is refreshed and pushed back down
+        while True:
+            count, victim = heap[0]
+            current = counts[victim]
+            if current == count:
+                break
+            heapq.heapreplace(heap, (current, victim))
+
+        del counts[victim]
+        self.errors.pop(victim, None)
+        counts[item] = count + 1
+        self.errors[item] = count
+        heapq.heapreplace(heap, (count + 1, item))
+
+    def _floor(self):
+        """Upper bound on the count of any item we're not tracking"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """Combine two summaries (mergeable: bounds still hold for the union of both streams)"""
+        floor, other_floor = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for item in list(self.counts) + [i for i in other.counts if i not in self.counts]:
+            mine = item in self.counts
+            theirs = item in other.counts
+            counts[item] = (self.counts[item] if mine else floor) + (other.counts[item] if theirs else other_floor)
+            error = ((self.errors.get(item, 0) if mine else floor) +
+                     (other.errors.get(item, 0) if theirs else other_floor))
+            if error:
+                errors[item] = error
+
+        if len(counts) > self.capacity:
+            keep = {item for item, _ in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:self.capacity]}
+            counts = {item: c for item, c in counts.items() if item in keep}
+            errors = {item: e for item, e in errors.items() if item in keep}
+        self.counts = counts
+        self.errors = errors
+        self._heap = None
+
+    def most_common(self, n):
+        """Same ordering as Counter.most_common - ties keep first-seen order"""
+        return heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+
+    def to_dict(self):
+        return {"counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data, capacity):
+        sketch = cls(capacity)
+        sketch.merge_counts(data.get("counts", {}))
+        sketch.errors = {i: e for i, e in data.get("errors", {}).items() if i in sketch.counts}
+        return sketch
+
+    def merge_counts(self, counts):
+        """Load exact counts (e.g. an old unbounded Counter), keeping the largest"""
+        if len(counts) > self.capacity:
+            keep = {i for i, _ in heapq.nlargest(self.capacity, counts.items(), key=lambda kv: kv[1])}
+            counts = {i: c for i, c in counts.items() if i in keep}
+        self.counts = dict(counts)
+        self.errors = {}
+        self._heap = None
+
+
+class LanguageStage(AnalyzerStage):
+    """
+    Learn AK's linguistic fingerprints per state.
+    Words and phrases go into fixed-size Space-Saving sketches, so memory is
+    capped however long the history gets. Subclass to change the caps.
+    """
+    report_key = "language_fingerprints"
+    word_capacity = 5000  # Tracked words per state
+    phrase_capacity = 5000  # Tracked bigrams per state
+    stopwords = STOPWORDS  # Not counted as words; phrases made only of stopwords are skipped
+
+    def __init__(self):
+        self.words = {}
+        self.phrases = {}
+
+    def _sketches(self, emoji):
+        words = self.words.get(emoji)
+        if words is None:
+            words = self.words[emoji] = SpaceSaving(self.word_capacity)
+            self.phrases[emoji] = SpaceSaving(self.phrase_capacity)
+        return words, self.phrases[emoji]
+
+    def feed(self, record):
+        if not record.has_state or not record.content or not record.emoji:
+            return
+        words = record.words
+        stopwords = self.stopwords
+        word_sketch, phrase_sketch = self._sketches(record.emoji)
+        word_sketch.update(w for w in words if w not in stopwords)
+        phrase_sketch.update(
+            f"{a} {b}" for a, b in zip(words, words[1:])
+            if a not in stopwords or b not in stopwords
+        )
+
+    def merge(self, other):
+        for emoji, sketch in other.words.items():
+            word_sketch, phrase_sketch = self._sketches(emoji)
+            word_sketch.merge(sketch)
+            phrase_sketch.merge(other.phrases[emoji])
+
+    def result(self, extractor):
         patterns = {}
-        for emoji, data in state_language.items():
-            word_freq = Counter(data["words"])
-            phrase_freq = Counter(data["phrases"])
-            
+        for emoji in self.words:
             patterns[emoji] = {
-                "top_words": [w for w, c in word_freq.most_common(10) if len(w) > 3],
-                "top_phrases": [p for p, c in phrase_freq.most_common(5)]
+                "top_words": [w for w, c in self.words[emoji].most_common(10) if len(w) > 3],
+                "top_phrases": [p for p, c in self.phrases[emoji].most_common(5)]
             }
-        
         return patterns
-    
-    def detect_time_patterns(self, conversations):
-        """When do different states occur? Time-based triggers."""
-        time_states = defaultdict(list)
-        
-        for conv in conversations:
-            if not isinstance(conv, dict):
-                continue
-                
-            state = conv.get("state", {})
-            timestamp = conv.get("timestamp", "")
-            
-            if not isinstance(state, dict) or not timestamp:
-                continue
-            
-            emoji = state.get("emoji")
-            if not emoji:
-                continue
-            
-            try:
-                dt = datetime.fromisoformat(timestamp)
-                hour = dt.hour
-                time_states[emoji].append(hour)
-            except:
-                continue
-        
-        # Find patterns
+
+    def to_dict(self):
+        return {
+            "word_sketches": {e: s.to_dict() for e, s in self.words.items()},
+            "phrase_sketches": {e: s.to_dict() for e, s in self.phrases.items()}
+        }
+
+    def load(self, data):
+        if "word_sketches" in data:
+            for emoji, sketch in data["word_sketches"].items():
+                self.words[emoji] = SpaceSaving.from_dict(sketch, self.word_capacity)
+                self.phrases[emoji] = SpaceSaving.from_dict(
+                    data.get("phrase_sketches", {}).get(emoji, {}), self.phrase_capacity)
+            return
+        # Unbounded Counters from before the sketches
+        for emoji, counts in data.get("words", {}).items():
+            word_sketch, phrase_sketch = self._sketches(emoji)
+            word_sketch.merge_counts(counts)
+            phrase_sketch.merge_counts(data.get("phrases", {}).get(emoji, {}))
+
+
+class TimeStage(AnalyzerStage):
+    """When do different states occur? Time-based triggers."""
+    report_key = "time_patterns"
+    sequential = True
+
+    def __init__(self):
+        self.hours = defaultdict(Counter)
+
+    def feed(self, record):
+        if not record.has_state or not record.emoji or not record.timestamp:
+            return
+        hour = record.hour
+        if hour is not None:
+            self.hours[record.emoji][hour] += 1
+
+    def merge(self, other):
+        for emoji, counts in other.hours.items():
+            self.hours[emoji].update(counts)
+
+    def result(self, extractor):
         patterns = {}
-        for emoji, hours in time_states.items():
-            if len(hours) < self.min_instances:
+        for emoji, hour_dist in self.hours.items():
+            total = sum(hour_dist.values())
+            if total < extractor.min_instances:
                 continue
-            
-            hour_dist = Counter(hours)
-            peak_hours = [h for h, c in hour_dist.most_common(3)]
-            
             patterns[emoji] = {
-                "peak_hours": peak_hours,
-                "total_instances": len(hours),
+                "peak_hours": [h for h, c in hour_dist.most_common(3)],
+                "total_instances": total,
                 "distribution": dict(hour_dist)
             }
-        
         return patterns
-    
-    def detect_contradictions(self, conversations):
-        """Find when stated beliefs ≠ observed behavior"""
-        contradictions = []
-        
-        # Look for "I always" or "I never" statements
-        belief_pattern = r"(i always|i never|i don't|i do) (.+?)(?:\.|$)"
-        
-        stated_beliefs = []
-        for conv in conversations:
-            if not isinstance(conv, dict):
-                continue
-            
-            content = conv.get("content", "").lower()
-            matches = re.findall(belief_pattern, content)
-            
-            for prefix, claim in matches:
-                stated_beliefs.append({
-                    "claim": f"{prefix} {claim}",
-                    "timestamp": conv.get("timestamp", ""),
-                    "full_text": content
-                })
-        
+
+    def to_dict(self):
+        return {"hours": {e: dict(c) for e, c in self.hours.items()}}
+
+    def load(self, data):
+        for emoji, counts in data.get("hours", {}).items():
+            # JSON turned the hour keys into strings
+            self.hours[emoji] = Counter({int(h): c for h, c in counts.items()})
+
+
+class BeliefStage(AnalyzerStage):
+    """Find when stated beliefs ≠ observed behavior"""
+    report_key = "stated_beliefs"
+    limit = 10
+
+    def __init__(self):
+        self.beliefs = []
+
+    def feed(self, record):
         # TODO: Cross-reference with actual behavior
-        # This is a placeholder - full implementation would check if behavior matches claims
+        if len(self.beliefs) >= self.limit:
+            return
+        for prefix, claim in re.findall(BELIEF_PATTERN, record.lower):
+            self.beliefs.append({
+                "claim": f"{prefix} {claim}",
+                "timestamp": record.timestamp,
+                "full_text": record.lower
+            })
+        del self.beliefs[self.limit:]
+
+    def merge(self, other):
+        self.beliefs.extend(other.beliefs[:self.limit - len(self.beliefs)])
+
+    def result(self, extractor):
+        return self.beliefs
+
+    def to_dict(self):
+        return {"beliefs": self.beliefs}
+
+    def load(self, data):
+        self.beliefs = data.get("beliefs", [])
+
+
+DEFAULT_STAGES = (TransitionStage, LoopStage, LanguageStage, TimeStage, BeliefStage)
+
+
+class PatternAggregates:
+    """
+    Running state behind extraction: one instance of every stage plus the
+    position in history. Persisted to my_data/pattern_state.json so the
+    next run only folds in new messages.
+    """
+
+    def __init__(self, stages=DEFAULT_STAGES):
+        self.last_id = 0  # Last store row folded in
+        self.generation = 0  # Store's pattern_generation when these rows were read
+        self.total = 0
+        self.stages = [stage() for stage in stages]
+
+    def update(self, conv):
+        """Normalize one conversation and fan it out to every stage"""
+        record = Record(conv)
+        self.total += 1
+        for stage in self.stages:
+            if record.timestamp or not stage.sequential:
+                stage.feed(record)
+
+    def update_many(self, rows):
+        """Fold in a page of (row id, conversation) - the state sequence is encoded once for all stages"""
+        if not rows:
+            return
+        records = [Record(conv) for _, conv in rows]
+        timed = [record for record in records if record.timestamp]
+        sequence = StateSequence.from_records(timed)
+        self.total += len(records)
+        for stage in self.stages:
+            if stage.sequential:
+                stage.feed_batch(timed, sequence)
+            else:
+                stage.feed_batch(records, None)
+        self.last_id = rows[-1][0]
+
+    def consume(self, rows, page_size=1000):
+        """Stream (row id, conversation) pairs through update_many a page at a time"""
+        page = []
+        for row in rows:
+            page.append(row)
+            if len(page) >= page_size:
+                self.update_many(page)
+                page = []
+        self.update_many(page)
+
+    def merge(self, other):
+        """Fold in aggregates built from the rows right after ours"""
+        self.total += other.total
+        self.last_id = max(self.last_id, other.last_id)
+        for stage, other_stage in zip(self.stages, other.stages):
+            stage.merge(other_stage)
+
+    def to_dict(self):
+        return {
+            "version": AGGREGATES_VERSION,
+            "last_id": self.last_id,
+            "generation": self.generation,
+            "total": self.total,
+            "stages": {type(stage).__name__: stage.to_dict() for stage in self.stages}
+        }
+
+    @classmethod
+    def from_dict(cls, data, stages=DEFAULT_STAGES):
+        aggregates = cls(stages)
+        saved = data.get("stages")
+        if (data.get("version") != AGGREGATES_VERSION or saved is None
+                or any(type(s).__name__ not in saved for s in aggregates.stages)):
+            # Older state or a newly added stage - everything has to see the full history
+            return cls(stages)
+        aggregates.last_id = data.get("last_id", 0)
+        aggregates.generation = data.get("generation", 0)
+        aggregates.total = data.get("total", 0)
+        for stage in aggregates.stages:
+            stage.load(saved[type(stage).__name__])
+        return aggregates
+
+
+def analyze_shard(data_dir, stages, after_id, until_id):
+    """Run a fresh pipeline over store rows after_id < id <= until_id (in a worker process)"""
+    store = MemoryStore(data_dir)
+    aggregates = PatternAggregates(stages)
+    try:
+        aggregates.consume(store.iter_conversations(after_id=after_id, until_id=until_id))
+    finally:
+        store.close()
+    return aggregates
+
+
+class PatternExtractor:
+    def __init__(self, data_dir="my_data", stages=DEFAULT_STAGES, workers=1, shard_size=50000):
+        self.data_dir = data_dir
+        self.stages = stages
+        self.workers = workers  # Processes for large catch-ups (1 = stream in this process)
+        self.shard_size = shard_size  # Rows per shard when running in parallel
+        self.min_instances = 5  # Minimum occurrences to declare a pattern
+        self.min_confidence = 0.50  # 50% threshold
+        self.state_file = os.path.join(data_dir, "pattern_state.json")
+        
+    def iter_conversations(self, after_id=0, until_id=None):
+        """Stream (row id, conversation) from the store - never materializes history"""
+        store = get_memory_store(self.data_dir)
+        store.sync_log()
         
-        return stated_beliefs[:10]  # Top 10 for now
+        # Full history, not just the retention window - journal and
+        # imported messages count once batch_classify.py has labeled them
+        return store.iter_conversations(after_id=after_id, until_id=until_id)
+    
+    def load_all_conversations(self):
+        """Load every conversation from memory"""
+        return [conv for _, conv in self.iter_conversations()]
     
     def calculate_pattern_confidence(self, instances, total_opportunities):
         """Calculate confidence score for a pattern"""
@@ -233,53 +640,99 @@ class PatternExtractor:
         
         return round(ratio * 100, 1)
     
-    def generate_pattern_report(self):
-        """Main extraction - generate full pattern analysis"""
+    def load_aggregates(self):
+        """Running state from the last incremental run (empty if there isn't one)"""
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file) as f:
+                    return PatternAggregates.from_dict(json.load(f), self.stages)
+            except Exception as e:
+                print(f"Pattern state unreadable, rebuilding: {e}")
+        return PatternAggregates(self.stages)
+    
+    def save_aggregates(self, aggregates):
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(aggregates.to_dict(), f)
+        os.replace(tmp_file, self.state_file)
+    
+    def update_aggregates(self, rebuild=False, save=True):
+        """One streaming pass over the messages stored since the last run"""
+        store = get_memory_store(self.data_dir)
+        store.sync_log()
+        aggregates = PatternAggregates(self.stages) if rebuild else self.load_aggregates()
+        if aggregates.last_id and aggregates.generation != store.get_meta("pattern_generation", 0):
+            # batch_classify.py relabeled rows these aggregates already counted
+            print("🔁 Messages were relabeled since the last run - rebuilding patterns")
+            aggregates = PatternAggregates(self.stages)
+        start_total = aggregates.total
+        
+        # From here on, relabeling any row up to through_id bumps pattern_generation
+        # (so the next run rebuilds) - rows added after it wait for the next run
+        through_id = store.last_row_id()
+        if save:
+            store.set_meta("pattern_last_id", max(through_id, store.get_meta("pattern_last_id", 0)))
+        aggregates.generation = store.get_meta("pattern_generation", 0)
+        
+        shards = []
+        if self.workers > 1:
+            shards = [
+                (after_id, min(last_id, through_id))
+                for after_id, last_id in store.shard_bounds(aggregates.last_id, self.shard_size)
+                if after_id < through_id
+            ]
+        
+        if len(shards) > 1:
+            # Map: each shard gets a fresh pipeline; reduce: merge them back in order
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [
+                    pool.submit(analyze_shard, self.data_dir, self.stages, after_id, until_id)
+                    for after_id, until_id in shards
+                ]
+                for future in futures:
+                    aggregates.merge(future.result())
+        else:
+            aggregates.consume(self.iter_conversations(after_id=aggregates.last_id, until_id=through_id))
+        
+        new_messages = aggregates.total - start_total
+        if new_messages and save:
+            self.save_aggregates(aggregates)
+        return aggregates, new_messages
+    
+    def report_from_aggregates(self, aggregates):
+        """Build the report from running state - no history scan"""
+        analysis = {stage.report_key: stage.result(self) for stage in aggregates.stages}
+        analysis["confidence_threshold"] = self.min_confidence
+        
+        return {
+            "generated": datetime.now().isoformat(),
+            "total_conversations": aggregates.total,
+            "analysis": analysis
+        }
+    
+    def generate_pattern_report(self, incremental=True, rebuild=False):
+        """
+        Main extraction - generate full pattern analysis
+        
+        Args:
+            incremental: Fold only new messages into the saved aggregates
+                         (False = one fresh pass over the full history, not saved)
+            rebuild: Discard the saved aggregates and fold history in again
+        """
         print("🧠 Auto-Pattern Extraction Engine")
         print("=" * 50)
         
-        conversations = self.load_all_conversations()
-        print(f"📊 Analyzing {len(conversations)} conversations...\n")
+        if incremental:
+            aggregates, new_messages = self.update_aggregates(rebuild)
+        else:
+            aggregates, new_messages = self.update_aggregates(rebuild=True, save=False)
+        print(f"📊 {aggregates.total} conversations ({new_messages} analyzed this run)\n")
         
-        if len(conversations) < self.min_instances:
+        if aggregates.total < self.min_instances:
             print("⚠️  Not enough data yet. Need at least 5 conversations.")
             return None
         
-        # Extract all pattern types
-        print("🔍 Detecting state transitions...")
-        transitions = self.extract_state_transitions(conversations)
-        
-        print("🌀 Detecting loops...")
-        loops = self.detect_loops(conversations)
-        
-        print("💬 Extracting language patterns...")
-        language = self.extract_language_patterns(conversations)
-        
-        print("⏰ Finding time patterns...")
-        time_patterns = self.detect_time_patterns(conversations)
-        
-        print("⚠️  Checking for contradictions...")
-        contradictions = self.detect_contradictions(conversations)
-        
-        # Build report
-        report = {
-            "generated": datetime.now().isoformat(),
-            "total_conversations": len(conversations),
-            "analysis": {
-                "state_transitions": {
-                    "total": len(transitions),
-                    "patterns": self._analyze_transitions(transitions)
-                },
-                "loops_detected": {
-                    "total": len(loops),
-                    "details": loops[:5]  # Top 5
-                },
-                "language_fingerprints": language,
-                "time_patterns": time_patterns,
-                "stated_beliefs": contradictions,
-                "confidence_threshold": self.min_confidence
-            }
-        }
+        report = self.report_from_aggregates(aggregates)
         
         # Save report
         os.makedirs(os.path.join(self.data_dir, "patterns"), exist_ok=True)
@@ -291,6 +744,7 @@ class PatternExtractor:
         
         with open(report_file, 'w') as f:
             json.dump(report, f, indent=2)
+        get_memory_store(self.data_dir).add_pattern_report(report, os.path.basename(report_file))
         
         print(f"\n✅ Pattern report saved: {report_file}")
         
@@ -299,19 +753,12 @@ class PatternExtractor:
         
         return report
     
-    def _analyze_transitions(self, transitions):
-        """Analyze state transition patterns"""
-        transition_counts = Counter()
-        
-        for t in transitions:
-            key = f"{t['from']} → {t['to']}"
-            transition_counts[key] += 1
-        
-        # Only show patterns with min instances
+    def _transition_patterns(self, transition_counts, total):
+        """Only show patterns with min instances"""
         patterns = {}
         for transition, count in transition_counts.items():
             if count >= self.min_instances:
-                confidence = self.calculate_pattern_confidence(count, len(transitions))
+                confidence = self.calculate_pattern_confidence(count, total)
                 if confidence >= self.min_confidence * 100:
                     patterns[transition] = {
                         "count": count,
@@ -361,5 +808,13 @@ class PatternExtractor:
 
 
 if __name__ == "__main__":
-    extractor = PatternExtractor()
-    extractor.generate_pattern_report()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Extract thinking patterns from conversation history")
+    parser.add_argument("--full", action="store_true", help="Recompute from the full history instead of running aggregates")
+    parser.add_argument("--rebuild", action="store_true", help="Discard saved aggregates and fold history in again")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for large histories")
+    args = parser.parse_args()
+    
+    extractor = PatternExtractor(workers=args.workers)
+    extractor.generate_pattern_report(incremental=not args.full, rebuild=args.rebuild)
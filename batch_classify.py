@@ -0,0 +1,147 @@
+"""
+Batch State Classification
+Back-labels historical and imported text with analyze_mental_state.
+Chunks are classified across a process pool and written back into the
+memory store; a checkpoint commits with every chunk so runs can resume.
+Usage: python batch_classify.py [--workers N] [--chunk-size N] [--restart]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from memory_store import get_memory_store
+from state_detection import STATES, analyze_mental_state
+
+CHECKPOINT = "classify_checkpoint"
+
+# Learned patterns, set once per worker process
+_worker_memory = {}
+
+
+def _init_worker(learning):
+    global _worker_memory
+    _worker_memory = {"learning": learning}
+
+
+def classify_chunk(chunk):
+    """Classify [(id, text, existing_emoji)] -> [(id, state)] inside a worker"""
+    results = []
+    for row_id, text, existing in chunk:
+        analysis = analyze_mental_state(text or "", _worker_memory)
+        emoji, info = analysis["primary"]
+
+        # A hand-written emoji label wins - we only fill in name and confidence
+        if existing in STATES:
+            emoji = existing
+            info = analysis["all_scores"][existing]
+
+        results.append((row_id, {
+            "emoji": emoji,
+            "name": info["name"],
+            "confidence": info["confidence"],
+            "source": "batch"
+        }))
+    return results
+
+
+def import_whatsapp(store, data_dir="my_data"):
+    """Bring my_data/whatsapp/messages.json into the store so it can be labeled"""
+    path = os.path.join(data_dir, "whatsapp", "messages.json")
+    if not os.path.exists(path):
+        return 0
+
+    with open(path) as f:
+        messages = json.load(f)
+
+    entries = [
+        {"role": "user", "content": text, "timestamp": "", "source_ref": f"whatsapp:{i}"}
+        for i, text in enumerate(messages) if isinstance(text, str) and text.strip()
+    ]
+    return sum(1 for row_id in store.add_many(entries, source="whatsapp") if row_id)
+
+
+def classify_store(store, workers=None, chunk_size=5000, restart=False):
+    """
+    Label every unlabeled user record in the store.
+    Chunks are written in order, each with its checkpoint, so an interrupted
+    run picks up after the last committed chunk.
+    """
+    checkpoint = {"last_id": 0, "labeled": 0} if restart else store.get_meta(CHECKPOINT, {"last_id": 0, "labeled": 0})
+    state_counts = Counter()
+    started = time.perf_counter()
+    labeled_this_run = 0
+
+    def chunks():
+        cursor = checkpoint["last_id"]
+        while True:
+            chunk = store.unlabeled(after_id=cursor, limit=chunk_size)
+            if not chunk:
+                return
+            cursor = chunk[-1][0]
+            yield chunk
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(store.get_state_learning(),)) as pool:
+        in_flight = deque()
+        source = chunks()
+
+        # Keep a bounded number of chunks in flight - millions of rows never sit in memory
+        for chunk in source:
+            in_flight.append((chunk[-1][0], pool.submit(classify_chunk, chunk)))
+            if len(in_flight) < workers * 2:
+                continue
+            labeled_this_run += _commit(store, in_flight.popleft(), checkpoint, state_counts)
+
+        while in_flight:
+            labeled_this_run += _commit(store, in_flight.popleft(), checkpoint, state_counts)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "labeled": labeled_this_run,
+        "total_labeled": checkpoint["labeled"],
+        "states": dict(state_counts),
+        "per_second": labeled_this_run / elapsed if elapsed > 0 else 0
+    }
+
+
+def _commit(store, job, checkpoint, state_counts):
+    last_id, future = job
+    updates = future.result()
+    checkpoint["last_id"] = last_id
+    checkpoint["labeled"] += len(updates)
+    store.update_states(updates, checkpoint=(CHECKPOINT, checkpoint))
+    state_counts.update(state["emoji"] for _, state in updates)
+    print(f"  ✓ labeled through id {last_id} ({checkpoint['labeled']:,} total)")
+    return len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back-label journal, imported and unlabeled messages")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Messages per chunk")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--data-dir", default="my_data")
+    args = parser.parse_args()
+
+    print("🏷️  Batch State Classification")
+    print("=" * 50)
+
+    store = get_memory_store(args.data_dir)
+    store.sync_log()
+    imported = import_whatsapp(store, args.data_dir)
+    if imported:
+        print(f"📥 Imported {imported} WhatsApp messages")
+
+    result = classify_store(store, args.workers, args.chunk_size, args.restart)
+
+    print(f"\n✅ Labeled {result['labeled']:,} messages ({result['per_second']:,.0f}/s)")
+    for emoji, count in Counter(result["states"]).most_common():
+        print(f"  {emoji} {STATES[emoji]['name']}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Pattern Extraction Benchmark
+Builds a synthetic history in a scratch data directory and times a full
+pattern rebuild with 1, 2, 4... worker processes. Every parallel report is
+checked against the single-process one.
+Usage: python bench_pattern_extraction.py [--messages N] [--max-workers N] [--shard-size N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from auto_pattern_extractor import PatternExtractor
+from memory_store import MemoryStore
+from state_detection import STATES
+
+WORDS = ("i keep thinking about this over and over again why is it stuck "
+         "got it everything makes sense now because the data says so "
+         "let me explain how it works i always start strong i never finish "
+         "ugh this is broken need to focus locked in let's do it hmm interesting").split()
+
+
+def make_history(data_dir, messages, seed=0):
+    """Fill a store with `messages` synthetic, state-labeled conversations (reused if present)"""
+    store = MemoryStore(data_dir)
+    existing = store.count()
+    if existing >= messages:
+        store.close()
+        return existing
+
+    rng = random.Random(seed)
+    emojis = list(STATES)
+    start = datetime(2020, 1, 1)
+    emoji = "🧠"
+    batch = []
+    print(f"Generating {messages - existing:,} synthetic messages in {data_dir}...")
+    for i in range(existing, messages):
+        # Sticky states so spiral runs and transitions look like a real history
+        if rng.random() < 0.3:
+            emoji = rng.choice(emojis + ["🌀"] * 3)
+        batch.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(3, 20))),
+            "state": {"emoji": emoji, "name": STATES[emoji]["name"], "confidence": 60},
+            "timestamp": (start + timedelta(minutes=7 * i)).isoformat()
+        })
+        if len(batch) >= 10000:
+            store.add_many(batch, source="bench")
+            batch = []
+    if batch:
+        store.add_many(batch, source="bench")
+    store.set_meta("keyword_index", True)  # add_many indexed every row already
+
+    count = store.count()
+    store.close()
+    return count
+
+
+def timed_report(data_dir, workers, shard_size):
+    extractor = PatternExtractor(data_dir, workers=workers, shard_size=shard_size)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        aggregates, _ = extractor.update_aggregates(rebuild=True, save=False)
+    elapsed = time.perf_counter() - start
+    report = extractor.report_from_aggregates(aggregates)
+    report.pop("generated")
+    return elapsed, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time map-reduce pattern extraction")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--data-dir", default=os.path.join("my_data", "bench_patterns"))
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    count = make_history(args.data_dir, args.messages)
+
+    print("🧠 Pattern Extraction Benchmark")
+    print("=" * 56)
+    print(f"{count:,} messages, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>10} {'msgs/s':>12} {'speedup':>8}")
+
+    baseline_time, baseline = timed_report(args.data_dir, 1, args.shard_size)
+    print(f"{1:>8} {baseline_time:>10.2f} {count / baseline_time:>12,.0f} {1.0:>7.1f}x")
+
+    workers = 2
+    while workers <= args.max_workers:
+        elapsed, report = timed_report(args.data_dir, workers, args.shard_size)
+        assert report == baseline, "Parallel report disagrees with the single-process pass"
+        print(f"{workers:>8} {elapsed:>10.2f} {count / elapsed:>12,.0f} {baseline_time / elapsed:>7.1f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
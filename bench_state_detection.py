@@ -0,0 +1,161 @@
+"""
+State Detection Benchmark
+Compares the compiled StateMatcher against the original per-call
+implementation on long journal dumps, with and without learned patterns.
+Usage: python bench_state_detection.py
+"""
+
+import json
+import os
+import random
+import time
+from state_detection import StateMatcher, analyze_mental_state
+
+
+def legacy_analyze_mental_state(text, memory):
+    """The original per-call implementation, kept here as the baseline"""
+    
+    states = {
+        "🧠": {"name": "logic", "patterns": ["therefore", "because", "analyze", "consider", "think", "reason", "evidence", "data", "fact", "objective", "if then", "hypothesis"], "structure": "clear"},
+        "🌀": {"name": "spiral", "patterns": ["keep thinking", "over and over", "can't stop", "stuck", "loop", "again", "why", "but what if", "round and round", "obsessing", "ruminating"], "structure": "repetitive"},
+        "⚡": {"name": "flow", "patterns": ["got it", "flowing", "yes", "boom", "crushing it", "zone", "flying", "clicking", "everything makes sense", "connected", "aha"], "structure": "energetic"},
+        "🪞": {"name": "reflection", "patterns": ["realize", "notice", "pattern", "hmm", "interesting", "i see", "looking back", "meta", "observe", "aware", "noticing"], "structure": "contemplative"},
+        "📘": {"name": "teaching", "patterns": ["let me explain", "so basically", "the way it works", "for example", "think of it like", "here's how", "imagine", "essentially"], "structure": "explanatory"},
+        "😤": {"name": "frustrated", "patterns": ["fuck", "shit", "ugh", "annoyed", "frustrated", "irritated", "why isn't", "broken", "stupid", "hate", "pissed"], "structure": "tense"},
+        "🎯": {"name": "determined", "patterns": ["will", "must", "going to", "let's do", "need to", "have to", "focused", "locked in", "get this done", "no excuses"], "structure": "decisive"}
+    }
+    
+    # Check user's personal learned patterns
+    if memory.get("learning"):
+        for state, data in memory["learning"].items():
+            if state in states and isinstance(data, dict) and "patterns" in data:
+                states[state]["patterns"].extend(data["patterns"])
+    
+    confidence_scores = {}
+    text_lower = text.lower()
+    
+    for emoji, config in states.items():
+        score = 0
+        matches = []
+        
+        # Check patterns
+        for pattern in config["patterns"]:
+            if pattern in text_lower:
+                score += 10
+                matches.append(pattern)
+        
+        # Analyze structure
+        sentences = text.split('.')
+        if config["structure"] == "clear" and len(sentences) > 1:
+            score += 5
+        elif config["structure"] == "repetitive" and ("?" in text or "..." in text):
+            score += 7
+        elif config["structure"] == "energetic" and ("!" in text):
+            score += 5
+        elif config["structure"] == "tense" and any(word.isupper() for word in text.split() if len(word) > 3):
+            score += 8
+        
+        confidence_scores[emoji] = {
+            "score": score,
+            "confidence": min(score * 2, 95),
+            "matches": matches,
+            "name": config["name"]
+        }
+    
+    sorted_states = sorted(confidence_scores.items(), key=lambda x: x[1]["score"], reverse=True)
+    primary = sorted_states[0] if sorted_states[0][1]["score"] > 0 else ("🧠", {"score": 0, "confidence": 30, "name": "logic"})
+    
+    return {
+        "primary": primary,
+        "all_scores": confidence_scores
+    }
+
+
+def load_corpus(data_dir="my_data"):
+    """Every piece of text we have on disk - journal, WhatsApp, raw Q&A"""
+    texts = []
+    for root, _, files in os.walk(data_dir):
+        for file in files:
+            if not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(root, file)) as f:
+                    data = json.load(f)
+            except:
+                continue
+            for item in data if isinstance(data, list) else []:
+                if isinstance(item, str):
+                    texts.append(item)
+                elif isinstance(item, dict):
+                    texts.extend(v for v in item.values() if isinstance(v, str) and len(v) > 20)
+    return texts or ["I keep thinking about this over and over. Why isn't it working?"]
+
+
+def make_dump(texts, size):
+    """Concatenate shuffled entries until the dump reaches `size` characters"""
+    rng = random.Random(size)
+    parts, total = [], 0
+    while total < size:
+        text = rng.choice(texts)
+        parts.append(text)
+        total += len(text) + 1
+    return "\n".join(parts)[:size]
+
+
+def make_learning(count):
+    """Synthetic learned patterns spread across the states"""
+    rng = random.Random(count)
+    emojis = ["🧠", "🌀", "⚡", "🪞", "📘", "😤", "🎯"]
+    learning = {emoji: {"patterns": []} for emoji in emojis}
+    for i in range(count):
+        word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+        learning[emojis[i % len(emojis)]]["patterns"].append(f"{word} {i}")
+    return learning
+
+
+def timed(fn, text, memory, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text, memory)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    texts = load_corpus()
+    print("🧠 State Detection Benchmark")
+    print("=" * 72)
+    print(f"{'dump':>10} {'learned':>8} {'engine':>10} {'legacy MB/s':>12} {'new MB/s':>10} {'speedup':>8}")
+
+    for learned in (0, 1000):
+        memory = {"learning": make_learning(learned)}
+        engine = "automaton" if StateMatcher(memory["learning"]).automaton else "scan"
+
+        for size in (1_000, 100_000, 1_000_000):
+            dump = make_dump(texts, size)
+            repeat = max(1, 200_000 // size)
+
+            analyze_mental_state(dump, memory)  # Build the cached matcher outside the timing
+            legacy_time, legacy_result = timed(legacy_analyze_mental_state, dump, memory, repeat)
+            new_time, new_result = timed(analyze_mental_state, dump, memory, repeat)
+
+            assert new_result == legacy_result, "Compiled matcher disagrees with the legacy scorer"
+            mb = size / 1e6
+            print(f"{size:>10,} {learned:>8} {engine:>10} {mb / legacy_time:>12.1f} {mb / new_time:>10.1f} "
+                  f"{legacy_time / new_time:>7.1f}x")
+
+    # Short chat-sized messages - per-call overhead dominates here
+    messages = [t[:200] for t in texts][:2000]
+    memory = {"learning": make_learning(50)}
+    start = time.perf_counter()
+    legacy = [legacy_analyze_mental_state(m, memory) for m in messages]
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = [analyze_mental_state(m, memory) for m in messages]
+    new_time = time.perf_counter() - start
+    assert new == legacy
+    print(f"\n{len(messages)} chat messages: legacy {len(messages) / legacy_time:,.0f}/s, "
+          f"new {len(messages) / new_time:,.0f}/s ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+BM25 Memory Retrieval
+Ranks memories by relevance instead of recency of a substring hit.
+Document lengths and term statistics are kept up to date incrementally,
+so adding a message never rebuilds the index. Queries are answered with
+MaxScore-style early termination over impact-ordered postings.
+The index is loaded from my_data/bm25_index.json (or built from the store)
+on a background thread and saved back, so no chat turn waits for it.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "from",
+    "had", "has", "have", "he", "her", "his", "i", "i'm", "if", "in", "into", "is",
+    "it", "it's", "its", "just", "me", "my", "no", "not", "of", "on", "or", "so",
+    "that", "the", "their", "them", "then", "there", "they", "this", "to", "too",
+    "was", "we", "were", "what", "when", "which", "who", "with", "you", "your"
+}
+
+INDEX_VERSION = 2  # Bump when the saved layout changes - older files are rebuilt
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [t for t in TOKEN_PATTERN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def term_frequencies(text):
+    """({term: tf}, token count) for a document"""
+    tokens = tokenize(text)
+    frequencies = {}
+    for token in tokens:
+        frequencies[token] = frequencies.get(token, 0) + 1
+    return frequencies, len(tokens)
+
+
+class BM25Index:
+    """
+    Postings are grouped by (term frequency, document length): every document
+    in a group gets the same score for that term, so a query can walk a term's
+    groups best-first and stop once nothing left in them can reach the top k.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {(tf, doc length): [doc_id, ...]}
+        self.df = {}  # term -> number of documents containing it
+        self.doc_terms = {}  # doc_id -> {term: tf}, scores a candidate in one pass
+        self.doc_lengths = {}
+        self.docs = {}  # doc_id -> record returned by search (when one was given)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text, record=None):
+        """Index one document (replaces it if the id already exists)"""
+        frequencies, length = term_frequencies(text)
+        self.add_terms(doc_id, frequencies, length, record if record is not None else {"content": text})
+
+    def add_terms(self, doc_id, frequencies, length, record=None):
+        """Index an already tokenized document ({term: tf} and its token count)"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        if not length:
+            return
+
+        postings, df = self.postings, self.df
+        for term, tf in frequencies.items():
+            groups = postings.get(term)
+            if groups is None:
+                groups = postings[term] = {}
+            group = groups.get((tf, length))
+            if group is None:
+                groups[(tf, length)] = [doc_id]
+            else:
+                group.append(doc_id)
+            df[term] = df.get(term, 0) + 1
+
+        self.doc_terms[doc_id] = frequencies
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        if record is not None:
+            self.docs[doc_id] = record
+
+    def remove(self, doc_id):
+        self.docs.pop(doc_id, None)
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+
+        for term, tf in self.doc_terms.pop(doc_id).items():
+            groups = self.postings[term]
+            group = groups[(tf, length)]
+            group.remove(doc_id)
+            if not group:
+                del groups[(tf, length)]
+            self.df[term] -= 1
+            if not self.df[term]:
+                del self.postings[term], self.df[term]
+
+    def idf(self, term):
+        df = self.df.get(term, 0)
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def top(self, query, k=5):
+        """
+        Return the top-k (score, doc_id) pairs for a query, best first.
+        Terms are visited by their best possible score and each candidate is
+        scored in full from doc_terms. A term's groups are walked by an upper
+        bound (the group's score plus what later terms can add to a document
+        of that length), stopping once it can't beat the current k-th score;
+        the search ends once no unseen document can (MaxScore).
+        """
+        n = len(self.doc_lengths)
+        if not n or k <= 0:
+            return []
+
+        avg_length = self.total_length / n
+        k1, b = self.k1, self.b
+
+        def term_score(idf, tf, length):
+            return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+
+        terms = []
+        for term in set(tokenize(query)):
+            groups = self.postings.get(term)
+            if not groups:
+                continue
+            max_tf = {}  # doc length -> highest tf of this term in documents that long
+            for tf, length in groups:
+                if tf > max_tf.get(length, 0):
+                    max_tf[length] = tf
+            idf = self.idf(term)
+            best = max(term_score(idf, tf, length) for tf, length in groups)
+            terms.append((best, term, idf, max_tf, groups))
+        if not terms:
+            return []
+        terms.sort(key=lambda item: item[0], reverse=True)
+        weights = [(term, idf) for _, term, idf, _, _ in terms]
+
+        # remaining[i] - the most a document not seen yet can score from terms i onward
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0]
+
+        lists = []
+        for i, (_, _, idf, _, groups) in enumerate(terms):
+            later = terms[i + 1:]
+            ordered = []
+            for (tf, length), docs in groups.items():
+                bound = term_score(idf, tf, length)
+                for _, _, other_idf, max_tf, _ in later:
+                    other_tf = min(max_tf.get(length, 0), length - tf)
+                    if other_tf > 0:
+                        bound += term_score(other_idf, other_tf, length)
+                ordered.append((bound, docs))
+            ordered.sort(key=lambda group: group[0], reverse=True)
+            lists.append(ordered)
+
+        best = []  # Min-heap of (score, order, doc_id), at most k
+        seen = set()
+        threshold = 0.0
+        for i, ordered in enumerate(lists):
+            if remaining[i] <= threshold:
+                break  # No unseen document can make the top k any more
+            for bound, docs in ordered:
+                if bound <= threshold:
+                    break
+                for doc_id in docs:
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+
+                    frequencies = self.doc_terms[doc_id]
+                    norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                    score = 0.0
+                    for term, idf in weights:
+                        tf = frequencies.get(term)
+                        if tf:
+                            score += idf * tf * (k1 + 1) / (tf + norm)
+
+                    if len(best) < k:
+                        heapq.heappush(best, (score, -len(seen), doc_id))
+                    elif score > threshold:
+                        heapq.heapreplace(best, (score, -len(seen), doc_id))
+                    else:
+                        continue
+                    if len(best) == k:
+                        threshold = best[0][0]
+                        if bound <= threshold:
+                            break
+
+        best.sort(reverse=True)
+        return [(score, doc_id) for score, _, doc_id in best]
+
+    def search(self, query, k=5):
+        """Return the top-k (score, record) pairs for a query"""
+        return [(score, self.docs.get(doc_id)) for score, doc_id in self.top(query, k)]
+
+
+class MemoryRetriever:
+    """
+    BM25 over the memory store (conversations + journal) and my_data/raw/*.json.
+    Store rows are indexed by row id and resolved to records at search time;
+    raw files are re-read whenever their mtime changes.
+    """
+
+    def __init__(self, store, data_dir="my_data"):
+        self.store = store
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, "bm25_index.json")
+        self.index = BM25Index()
+        self.last_id = 0
+        self.raw_files = {}  # path -> mtime
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+        self.thread = threading.Thread(target=self._build, name="bm25-build", daemon=True)
+        self.thread.start()
+
+    # === BUILD ===
+    def _build(self):
+        """Load the saved index, catch up on rows added since, and save it back"""
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                loaded = self._load()
+                added = self._sync_rows()
+                self._sync_raw()
+                if added or not loaded:
+                    self.save()
+            print(f"📚 BM25 index ready: {len(self.index)} docs "
+                  f"({'loaded' if loaded else 'built'}, +{added} rows) in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"BM25 index build failed: {e}")
+        finally:
+            self.ready.set()
+
+    def _load(self):
+        """Restore store rows from the saved index. False if there is none (or it's stale)"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"BM25 index unreadable, rebuilding: {e}")
+            return False
+
+        last_id = saved.get("last_id", 0)
+        if saved.get("version") != INDEX_VERSION or (last_id and not self.store.get_many([last_id])):
+            return False  # Older layout, or the store was recreated under it
+
+        for doc_id, length, frequencies in saved.get("docs", []):
+            self.index.add_terms(doc_id, frequencies, length)
+        self.last_id = last_id
+        return True
+
+    def save(self):
+        """Write the store rows of the index (raw files are re-read on load)"""
+        docs = [
+            [doc_id, length, self.index.doc_terms[doc_id]]
+            for doc_id, length in self.index.doc_lengths.items() if isinstance(doc_id, int)
+        ]
+        os.makedirs(self.data_dir, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": INDEX_VERSION, "last_id": self.last_id, "docs": docs}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # === SYNC ===
+    def sync(self):
+        """Index rows added to the store and raw files changed since the last sync"""
+        with self._lock:
+            self._sync_rows()
+            self._sync_raw()
+
+    def _sync_rows(self):
+        added = 0
+        for row_id, record in self.store.iter_conversations(after_id=self.last_id):
+            content = record.get("content", "")
+            if isinstance(content, str):
+                frequencies, length = term_frequencies(content)
+                self.index.add_terms(row_id, frequencies, length)
+                added += 1
+            self.last_id = row_id
+        return added
+
+    def _sync_raw(self):
+        raw_dir = os.path.join(self.data_dir, "raw")
+        if not os.path.exists(raw_dir):
+            return
+
+        for file in sorted(os.listdir(raw_dir)):
+            if not file.endswith(".json"):
+                continue
+            path = os.path.join(raw_dir, file)
+            mtime = os.path.getmtime(path)
+            if self.raw_files.get(path) == mtime:
+                continue
+
+            try:
+                with open(path) as f:
+                    items = json.load(f)
+            except Exception as e:
+                print(f"Skipping {file}: {e}")
+                continue
+
+            # Drop the old version of this file before re-adding it
+            prefix = f"raw:{file}:"
+            for doc_id in [d for d in self.index.docs if isinstance(d, str) and d.startswith(prefix)]:
+                self.index.remove(doc_id)
+
+            for i, item in enumerate(items if isinstance(items, list) else []):
+                if isinstance(item, dict):
+                    text = " ".join(str(v) for v in item.values() if isinstance(v, str))
+                elif isinstance(item, str):
+                    text = item
+                else:
+                    continue
+                self.index.add(f"{prefix}{i}", text, {"content": text, "timestamp": "", "source": file})
+
+            self.raw_files[path] = mtime
+
+    # === SEARCH ===
+    def search(self, query, k=5, wait=0):
+        """
+        Top-k records for a query. Returns [] if the index is still being
+        built after wait seconds - callers fall back to keyword hits.
+        """
+        if not self.ready.wait(wait):
+            return []
+        self.sync()
+        with self._lock:
+            hits = self.index.top(query, k)
+            raw = {doc_id: self.index.docs[doc_id] for _, doc_id in hits if isinstance(doc_id, str)}
+        rows = self.store.get_many([doc_id for _, doc_id in hits if isinstance(doc_id, int)])
+        records = {**rows, **raw}
+        return [records[doc_id] for _, doc_id in hits if doc_id in records]
+
+
+# Global retriever instances, one per data directory
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_memory_retriever(store, data_dir="my_data"):
+    """Get or create the retriever singleton - loads or builds in the background, then kept in sync"""
+    with _retrievers_lock:
+        retriever = _retrievers.get(data_dir)
+        if retriever is None:
+            retriever = MemoryRetriever(store, data_dir)
+            _retrievers[data_dir] = retriever
+        return retriever
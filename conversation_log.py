@@ -0,0 +1,224 @@
+"""
+Conversation Log
+Append-only, line-delimited (JSONL) storage for every interaction.
+Writing a message costs one append, no matter how long the history is.
+"""
+
+import json
+import os
+
+RETENTION = 10000  # Logical window - the file itself is never rewritten
+
+
+class ConversationLog:
+    def __init__(self, data_dir="my_data", filename="conversations.jsonl", retention=RETENTION):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, filename)
+        self.retention = retention
+        self._count = 0
+        self._counted_size = 0
+
+    def append(self, entry):
+        """Append one record and return the total number of records in the log"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+        return len(self)
+
+    def __len__(self):
+        """Total records ever written - only counts bytes added since the last call"""
+        if not os.path.exists(self.path):
+            self._count = 0
+            self._counted_size = 0
+            return 0
+
+        size = os.path.getsize(self.path)
+        if size < self._counted_size:
+            # File was replaced or truncated - start over
+            self._count = 0
+            self._counted_size = 0
+
+        if size > self._counted_size:
+            with open(self.path, "rb") as f:
+                f.seek(self._counted_size)
+                while True:
+                    block = f.read(1 << 20)
+                    if not block:
+                        break
+                    self._count += block.count(b"\n")
+            self._counted_size = size
+
+        return self._count
+
+    def __iter__(self):
+        return self.iter()
+
+    def iter(self, window=True, start_offset=None):
+        """
+        Yield records in write order
+
+        Args:
+            window: Only yield the last `retention` records
+            start_offset: Byte offset to resume from (overrides window)
+        """
+        if not os.path.exists(self.path):
+            return
+
+        if start_offset is None:
+            start_offset = self.window_offset() if window else 0
+
+        with open(self.path, "rb") as f:
+            f.seek(start_offset)
+            for line in f:
+                record = self._parse(line)
+                if record is not None:
+                    yield record
+
+    def iter_with_offsets(self, start_offset=0):
+        """Yield (offset, next_offset, record) from a byte offset; stops before a partial last line"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(start_offset)
+            offset = start_offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                next_offset = offset + len(line)
+                record = self._parse(line)
+                if record is not None:
+                    yield offset, next_offset, record
+                offset = next_offset
+
+    def tail(self, n=50):
+        """Return the last n records without reading the whole file"""
+        if n <= 0 or not os.path.exists(self.path):
+            return []
+        return list(self.iter(start_offset=self._offset_of_last(n)))
+
+    def window_offset(self):
+        """Byte offset where the retention window starts"""
+        if self.retention is None:
+            return 0
+        return self._offset_of_last(self.retention)
+
+    def _offset_of_last(self, n):
+        """Byte offset where the last n lines begin - scans backwards in blocks"""
+        block_size = 1 << 16
+
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            pos = end
+            newlines = 0
+
+            while pos > 0:
+                read_size = min(block_size, pos)
+                pos -= read_size
+                f.seek(pos)
+                block = f.read(read_size)
+
+                # The trailing newline closes the last record, it doesn't start one
+                if pos + read_size == end and block.endswith(b"\n"):
+                    block = block[:-1]
+
+                idx = len(block)
+                while True:
+                    idx = block.rfind(b"\n", 0, idx)
+                    if idx == -1:
+                        break
+                    newlines += 1
+                    if newlines == n:
+                        return pos + idx + 1
+
+        return 0
+
+    @staticmethod
+    def _parse(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def migrate_json_arrays(self):
+        """
+        One-shot import of the old JSON array files
+        (conversations.json + conversations_YYYYMMDD.json) into the log.
+        Records already in the log are skipped, so re-running is harmless.
+        """
+        legacy_files = []
+        master_file = os.path.join(self.data_dir, "conversations.json")
+        if os.path.exists(master_file):
+            legacy_files.append(master_file)
+
+        if os.path.exists(self.data_dir):
+            for file in sorted(os.listdir(self.data_dir)):
+                if file.startswith("conversations_") and file.endswith(".json"):
+                    legacy_files.append(os.path.join(self.data_dir, file))
+
+        if not legacy_files:
+            return 0
+
+        seen = set(self._key(r) for r in self.iter(window=False))
+        pending = []
+
+        for path in legacy_files:
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+
+            if not isinstance(data, list):
+                continue
+
+            for record in data:
+                if not isinstance(record, dict):
+                    continue
+                key = self._key(record)
+                if key in seen:
+                    continue
+                seen.add(key)
+                pending.append(record)
+
+        # Daily files and the master overlap - restore chronological order
+        pending.sort(key=lambda r: r.get("timestamp", "") or "")
+
+        if pending:
+            os.makedirs(self.data_dir, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in pending:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        return len(pending)
+
+    @staticmethod
+    def _key(record):
+        return (record.get("timestamp", ""), record.get("role", ""), record.get("content", ""))
+
+
+# Global log instances, one per data directory
+_conversation_logs = {}
+
+def get_conversation_log(data_dir="my_data"):
+    """Get or create the shared log - keeps the record count cached between appends"""
+    log = _conversation_logs.get(data_dir)
+    if log is None:
+        log = ConversationLog(data_dir)
+        _conversation_logs[data_dir] = log
+    return log
+
+
+if __name__ == "__main__":
+    log = ConversationLog()
+    migrated = log.migrate_json_arrays()
+    print(f"✅ Migrated {migrated} conversations into {log.path} ({len(log)} total)")
@@ -0,0 +1,89 @@
+"""
+Background Pattern Extraction
+Runs PatternExtractor off the chat request path on a worker thread.
+Requests coalesce: at most one extraction runs and at most one waits,
+since a single incremental run catches up on everything queued behind it.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from auto_pattern_extractor import PatternExtractor
+
+
+class ExtractionWorker:
+    def __init__(self, data_dir="my_data"):
+        self.data_dir = data_dir
+        self.jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = False
+        self.running = False
+        self.version = 0  # Bumped every time a report finishes
+        self.latest_report = None
+        self.last_error = None
+        self.last_duration = None
+        self.finished_at = None
+
+        self.thread = threading.Thread(target=self._run, name="pattern-extraction", daemon=True)
+        self.thread.start()
+
+    def submit(self, reason="auto"):
+        """Queue an extraction. Returns False if one is already waiting (coalesced)"""
+        with self._lock:
+            if self._queued:
+                return False
+            self._queued = True
+        self.jobs.put(reason)
+        return True
+
+    @property
+    def busy(self):
+        return self.running or self._queued
+
+    def _run(self):
+        while True:
+            reason = self.jobs.get()
+            with self._lock:
+                self._queued = False
+                self.running = True
+
+            started = time.perf_counter()
+            try:
+                report = PatternExtractor(self.data_dir).generate_pattern_report()
+                with self._lock:
+                    if report is not None:
+                        self.latest_report = report
+                    self.last_error = None
+                    self.version += 1
+            except Exception as e:
+                print(f"Pattern extraction failed ({reason}): {e}")
+                self.last_error = str(e)
+            finally:
+                self.last_duration = time.perf_counter() - started
+                self.finished_at = datetime.now()
+                self.running = False
+                self.jobs.task_done()
+
+    def wait(self, timeout=None):
+        """Block until nothing is queued or running (for scripts, not the UI)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.busy:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+
+# Global worker instances - one per data directory, shared by every session
+_extraction_workers = {}
+_workers_lock = threading.Lock()
+
+def get_extraction_worker(data_dir="my_data"):
+    """Get or create the process-wide extraction worker"""
+    with _workers_lock:
+        worker = _extraction_workers.get(data_dir)
+        if worker is None:
+            worker = ExtractionWorker(data_dir)
+            _extraction_workers[data_dir] = worker
+        return worker
@@ -0,0 +1,246 @@
+"""
+Incremental Memory Loader
+Keeps the in-memory view of my_data/ up to date without re-reading it.
+Tracks mtime, size and byte offset per file and merges in only what changed.
+Conversations are also kept in a TimeIndex for date-range queries.
+A refresh that changes anything publishes a new memory dict (new lists and
+index) rather than editing the one sessions may still be reading.
+MemoryService shares one loader per data directory across every session
+and caches derived views until the data version changes.
+"""
+
+import json
+import os
+import threading
+from conversation_log import get_conversation_log
+from time_index import TimeIndex
+
+
+class MemoryLoader:
+    def __init__(self, data_dir="my_data"):
+        self.data_dir = data_dir
+        self.log = get_conversation_log(data_dir)
+        self.files = {}  # path -> {"mtime", "size", "records"}
+        self.log_offset = None
+        self.log_size = 0
+        self.log_records = []
+        self.version = 0  # Bumped whenever a refresh changes anything
+        self.memory = {
+            "conversations": [],
+            "patterns": [],
+            "journal": [],
+            "state_history": [],
+            "learning": {},
+            "time_index": TimeIndex()
+        }
+
+    def refresh(self):
+        """
+        Merge new or changed records into memory and return it. Unchanged data
+        returns the same dict; otherwise a new one, so a session holding the
+        old dict never sees its lists or index change under it.
+        """
+        journal_changed = self._refresh_json_dir("journal", self._journal_records)
+        new_log_records, log_reset = self._refresh_log()
+        patterns_changed = self._refresh_json_dir("patterns", self._pattern_records)
+        learning = self._refresh_learning()
+
+        memory = self.memory
+        changes = {}
+        if journal_changed:
+            changes["journal"] = self._collect("journal")
+        journal = changes.get("journal", memory["journal"])
+
+        if journal_changed or log_reset:
+            changes["conversations"] = journal + self.log_records
+            changes["time_index"] = TimeIndex(changes["conversations"])
+        elif new_log_records:
+            conversations = memory["conversations"] + new_log_records
+            time_index = memory["time_index"].copy()
+            time_index.add_many(new_log_records)
+            overflow = len(conversations) - len(journal) - len(self.log_records)
+            if overflow > 0:
+                start = len(journal)
+                time_index.remove(conversations[start:start + overflow])
+                del conversations[start:start + overflow]
+            changes["conversations"] = conversations
+            changes["time_index"] = time_index
+
+        if patterns_changed:
+            changes["patterns"] = self._collect("patterns")
+        if learning is not None:
+            changes["learning"] = learning
+
+        if changes:
+            self.memory = {**memory, **changes}  # One assignment - readers get the old dict or the new one
+            self.version += 1
+
+        return self.memory
+
+    # === FILE TRACKING ===
+    def _changed(self, path):
+        """Return the file's (mtime, size) if it differs from what we last loaded, else None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        seen = self.files.get(path)
+        if seen and seen["mtime"] == stat.st_mtime and seen["size"] == stat.st_size:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _refresh_json_dir(self, name, parse):
+        """Re-parse only the files in a directory that were added or modified"""
+        directory = os.path.join(self.data_dir, name)
+        prefix = directory + os.sep
+        changed = False
+
+        present = set()
+        if os.path.exists(directory):
+            for file in os.listdir(directory):
+                if not file.endswith(".json"):
+                    continue
+                path = os.path.join(directory, file)
+                present.add(path)
+
+                stat = self._changed(path)
+                if stat is None:
+                    continue
+
+                try:
+                    with open(path) as f:
+                        records = parse(json.load(f))
+                except:
+                    records = []
+
+                self.files[path] = {"mtime": stat[0], "size": stat[1], "records": records}
+                changed = True
+
+        # Forget files that were deleted
+        for path in [p for p in self.files if p.startswith(prefix) and p not in present]:
+            del self.files[path]
+            changed = True
+
+        return changed
+
+    def _collect(self, name):
+        prefix = os.path.join(self.data_dir, name) + os.sep
+        records = []
+        for path in sorted(p for p in self.files if p.startswith(prefix)):
+            records.extend(self.files[path]["records"])
+        return records
+
+    @staticmethod
+    def _journal_records(data):
+        return [entry for entry in data if isinstance(entry, dict)] if isinstance(data, list) else []
+
+    @staticmethod
+    def _pattern_records(data):
+        # Handle both old manual patterns and new auto-extracted reports
+        if isinstance(data, list):
+            return [p for p in data if isinstance(p, dict)]
+        if isinstance(data, dict) and "analysis" in data:
+            return [data]
+        return []
+
+    def _refresh_log(self):
+        """Read only the bytes appended since the last refresh. Returns (new_records, reset)"""
+        if not os.path.exists(self.log.path):
+            # One-shot move from the old JSON arrays to the append-only log
+            self.log.migrate_json_arrays()
+            if not os.path.exists(self.log.path):
+                return [], False
+
+        size = os.path.getsize(self.log.path)
+        reset = self.log_offset is None or size < self.log_size
+        if reset:
+            # First load (or the log was replaced) - start at the retention window
+            self.log_offset = self.log.window_offset()
+            self.log_records = []
+        elif size == self.log_size:
+            return [], False
+
+        new_records = []
+        for _, next_offset, record in self.log.iter_with_offsets(self.log_offset):
+            new_records.append(record)
+            self.log_offset = next_offset
+        self.log_size = size
+
+        self.log_records.extend(new_records)
+        if self.log.retention is not None and len(self.log_records) > self.log.retention:
+            del self.log_records[:len(self.log_records) - self.log.retention]
+
+        return new_records, reset
+
+    def _refresh_learning(self):
+        """The re-read learning dict if the file changed, else None"""
+        path = os.path.join(self.data_dir, "state_learning.json")
+        stat = self._changed(path)
+        if stat is None:
+            return None
+        learning = self.memory["learning"]
+        try:
+            with open(path) as f:
+                learning = json.load(f)
+        except:
+            pass
+        self.files[path] = {"mtime": stat[0], "size": stat[1], "records": []}
+        return learning
+
+
+class MemoryService:
+    """One MemoryLoader shared by every session, plus views cached per data version"""
+
+    def __init__(self, data_dir="my_data"):
+        self.loader = MemoryLoader(data_dir)
+        self._lock = threading.RLock()
+        self._views = {}  # (name, key) -> value, all computed at _views_version
+        self._views_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self):
+        return self.loader.version
+
+    @property
+    def memory(self):
+        return self.loader.memory
+
+    def refresh(self):
+        """Merge in anything new on disk - a few stat calls when nothing changed"""
+        with self._lock:
+            return self.loader.refresh()
+
+    def view(self, name, compute, key=()):
+        """
+        compute(memory) once per data version (and key); later calls get the cached value.
+        Put anything else the value depends on (a date, a report version) in key.
+        """
+        with self._lock:
+            if self._views_version != self.loader.version:
+                self._views.clear()
+                self._views_version = self.loader.version
+            cache_key = (name, key)
+            if cache_key in self._views:
+                self.hits += 1
+                return self._views[cache_key]
+            self.misses += 1
+            value = compute(self.loader.memory)
+            self._views[cache_key] = value
+            return value
+
+
+# Global service instances - one per data directory, shared by every session
+_memory_services = {}
+_services_lock = threading.Lock()
+
+
+def get_memory_service(data_dir="my_data"):
+    """Get or create the process-wide memory service"""
+    with _services_lock:
+        service = _memory_services.get(data_dir)
+        if service is None:
+            service = MemoryService(data_dir)
+            _memory_services[data_dir] = service
+        return service
@@ -0,0 +1,575 @@
+"""
+Memory Store
+Embedded SQLite index over everything Second Brain remembers.
+Conversations, journal entries, pattern reports and state learning live
+behind one small API so date/state/role queries hit an index, not a scan.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from conversation_log import ConversationLog
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    timestamp TEXT,
+    role TEXT,
+    content TEXT,
+    state_emoji TEXT,
+    state_name TEXT,
+    confidence REAL,
+    source TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp);
+CREATE INDEX IF NOT EXISTS idx_conversations_state ON conversations(state_emoji, timestamp);
+CREATE INDEX IF NOT EXISTS idx_conversations_role ON conversations(role, timestamp);
+
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER,
+    conversation_id INTEGER,
+    PRIMARY KEY (term_id, conversation_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS pattern_reports (
+    id INTEGER PRIMARY KEY,
+    generated TEXT UNIQUE,
+    file TEXT,
+    report TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pattern_reports_generated ON pattern_reports(generated);
+
+CREATE TABLE IF NOT EXISTS state_learning (
+    state TEXT PRIMARY KEY,
+    data TEXT
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day TEXT PRIMARY KEY,
+    data TEXT
+);
+"""
+
+
+def tokenize(text):
+    """Unique lowercase whitespace tokens - the same split the keyword search always used"""
+    return set((text or "").lower().split())
+
+
+def normalize_state(entry):
+    """Return (emoji, name, confidence) for any of the state shapes we've stored over time"""
+    state = entry.get("state")
+    if isinstance(state, dict):
+        return state.get("emoji"), state.get("name"), state.get("confidence")
+    if isinstance(state, str) and state:
+        return state, None, None
+    # Early journal entries used detected_state / primary_state instead
+    detected = entry.get("detected_state")
+    if isinstance(detected, dict) and detected.get("emoji"):
+        return detected.get("emoji"), detected.get("name"), detected.get("confidence")
+    primary = entry.get("primary_state")
+    if isinstance(primary, str) and primary:
+        return primary, None, None
+    return None, None, None
+
+
+class MemoryStore:
+    def __init__(self, data_dir="my_data", filename="memory.db"):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, filename)
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.is_new = not os.path.exists(self.path)
+        self._lock = threading.Lock()
+        # Streamlit reruns on different threads - guard the shared connection with a lock
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # === CONVERSATIONS ===
+    @staticmethod
+    def _key(entry):
+        raw = f"{entry.get('timestamp', '')}|{entry.get('role', '')}|{entry.get('content', '')}"
+        if entry.get("source_ref"):
+            # Imported text without timestamps - keep repeated messages distinct
+            raw += f"|{entry['source_ref']}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _row(self, entry, source):
+        emoji, name, confidence = normalize_state(entry)
+        return (
+            self._key(entry),
+            entry.get("timestamp") or "",
+            entry.get("role"),
+            entry.get("content", ""),
+            emoji,
+            name,
+            confidence,
+            source,
+            json.dumps(entry, ensure_ascii=False),
+        )
+
+    def add_conversation(self, entry, source="chat"):
+        """Insert one record (duplicates are ignored). Returns its row id or None"""
+        ids = self.add_many([entry], source)
+        return ids[0] if ids else None
+
+    def add_many(self, entries, source="chat"):
+        """Insert many records in one transaction. Returns the new row ids (None for duplicates)"""
+        ids = []
+        with self._lock, self.conn:
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO conversations "
+                    "(key, timestamp, role, content, state_emoji, state_name, confidence, source, raw) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._row(entry, source)
+                )
+                if cur.rowcount:
+                    self._index_terms(cur.lastrowid, entry.get("content", ""))
+                    ids.append(cur.lastrowid)
+                else:
+                    ids.append(None)
+        return ids
+
+    # === KEYWORD INDEX ===
+    def _index_terms(self, conversation_id, content):
+        """Add postings for one record - caller holds the lock and the transaction"""
+        terms = [(term,) for term in tokenize(content if isinstance(content, str) else "")]
+        if not terms:
+            return
+        self.conn.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", terms)
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO postings (term_id, conversation_id) "
+            "SELECT id, ? FROM terms WHERE term = ?",
+            [(conversation_id, term) for (term,) in terms]
+        )
+
+    def rebuild_keyword_index(self):
+        """Index every stored record - used once for stores created before the index existed"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM postings")
+            rows = self.conn.execute("SELECT id, content FROM conversations").fetchall()
+            for row in rows:
+                self._index_terms(row["id"], row["content"])
+        self.set_meta("keyword_index", True)
+        return len(rows)
+
+    def related(self, text, limit=10, min_length=5):
+        """
+        Most recent records containing any keyword (len >= min_length) from text.
+        Matches the old substring scan: a keyword hits a record when it is a
+        substring of one of its tokens, so we resolve keywords against the
+        vocabulary, then union postings instead of scanning every message.
+        """
+        keywords = [k for k in tokenize(text) if len(k) >= min_length]
+        if not keywords:
+            return []
+
+        with self._lock:
+            term_ids = set()
+            for keyword in keywords:
+                rows = self.conn.execute(
+                    "SELECT id FROM terms WHERE instr(term, ?) > 0", (keyword,)
+                ).fetchall()
+                term_ids.update(row[0] for row in rows)
+
+            if not term_ids:
+                return []
+
+            placeholders = ",".join("?" * len(term_ids))
+            rows = self.conn.execute(
+                f"SELECT raw FROM conversations WHERE id IN ("
+                f"SELECT DISTINCT conversation_id FROM postings WHERE term_id IN ({placeholders}) "
+                f"ORDER BY conversation_id DESC LIMIT ?) ORDER BY id",
+                (*term_ids, limit)
+            ).fetchall()
+
+        return [json.loads(row["raw"]) for row in rows]
+
+    def unlabeled(self, after_id=0, limit=1000):
+        """User records without a full state label (no name/confidence), oldest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, content, state_emoji FROM conversations "
+                "WHERE id > ? AND role = 'user' AND state_name IS NULL ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+        return [(row["id"], row["content"], row["state_emoji"]) for row in rows]
+
+    def update_states(self, updates, checkpoint=None):
+        """
+        Write state labels back. updates: [(id, {"emoji", "name", "confidence"})].
+        An optional (meta_name, value) checkpoint commits in the same transaction.
+        """
+        with self._lock, self.conn:
+            for row_id, state in updates:
+                row = self.conn.execute("SELECT raw FROM conversations WHERE id = ?", (row_id,)).fetchone()
+                if row is None:
+                    continue
+                record = json.loads(row["raw"])
+                record["state"] = state
+                self.conn.execute(
+                    "UPDATE conversations SET state_emoji = ?, state_name = ?, confidence = ?, raw = ? WHERE id = ?",
+                    (state["emoji"], state["name"], state["confidence"],
+                     json.dumps(record, ensure_ascii=False), row_id)
+                )
+            # Relabeled days have to be rolled up again
+            ids = [row_id for row_id, _ in updates]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self.conn.execute(
+                    "UPDATE daily_rollups SET data = NULL WHERE day IN "
+                    f"(SELECT substr(timestamp, 1, 10) FROM conversations WHERE id IN ({','.join('?' * len(chunk))}))",
+                    chunk
+                )
+            # Saved pattern aggregates that may have folded a relabeled row in are stale now
+            meta = dict(self.conn.execute(
+                "SELECT name, value FROM meta WHERE name IN ('pattern_last_id', 'pattern_generation')"
+            ).fetchall())
+            if ids and min(ids) <= json.loads(meta.get("pattern_last_id", "0")):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('pattern_generation', ?)",
+                    (json.dumps(json.loads(meta.get("pattern_generation", "0")) + 1),)
+                )
+            if checkpoint is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    (checkpoint[0], json.dumps(checkpoint[1]))
+                )
+
+    def _records(self, sql, params=()):
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row["raw"]) for row in rows]
+
+    def conversations_between(self, start, end=None, source=None):
+        """Records with start <= timestamp < end, oldest first"""
+        sql = "SELECT raw FROM conversations WHERE timestamp >= ?"
+        params = [start.isoformat()]
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params.append(end.isoformat())
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+        return self._records(sql + " ORDER BY timestamp, id", params)
+
+    def conversations_since(self, cutoff, source=None):
+        return self.conversations_between(cutoff, source=source)
+
+    def iter_conversations(self, source=None, after_id=0, until_id=None, page_size=1000):
+        """Yield (id, record) in insertion order for after_id < id <= until_id.
+        Rows are fetched a page at a time so full-history scans stay bounded in memory."""
+        sql = "SELECT id, raw FROM conversations WHERE id > ?"
+        extra = []
+        if until_id is not None:
+            sql += " AND id <= ?"
+            extra.append(until_id)
+        if source:
+            sql += " AND source = ?"
+            extra.append(source)
+        sql += " ORDER BY id LIMIT ?"
+        cursor = after_id
+        while True:
+            params = [cursor] + extra + [page_size]
+            with self._lock:
+                rows = self.conn.execute(sql, params).fetchall()
+            for row in rows:
+                yield row["id"], json.loads(row["raw"])
+            if len(rows) < page_size:
+                return
+            cursor = rows[-1]["id"]
+
+    def shard_bounds(self, after_id=0, max_rows=50000):
+        """Split rows after after_id into consecutive (after_id, until_id) ranges of at most max_rows"""
+        bounds = []
+        cursor = after_id
+        with self._lock:
+            while True:
+                row = self.conn.execute(
+                    "SELECT id FROM conversations WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                    (cursor, max_rows - 1)
+                ).fetchone()
+                if row is None:
+                    last = self.conn.execute(
+                        "SELECT MAX(id) FROM conversations WHERE id > ?", (cursor,)
+                    ).fetchone()[0]
+                    if last is not None:
+                        bounds.append((cursor, last))
+                    return bounds
+                bounds.append((cursor, row[0]))
+                cursor = row[0]
+
+    def get_many(self, ids):
+        """Fetch records by row id. Returns {id: record}"""
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, raw FROM conversations WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {row["id"]: json.loads(row["raw"]) for row in rows}
+
+    def count_on(self, day=None):
+        """Number of records on a calendar day (default: today)"""
+        day = day or datetime.now().date()
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM conversations WHERE timestamp >= ? AND timestamp < ?",
+                (start.isoformat(), end.isoformat())
+            ).fetchone()
+        return row[0]
+
+    def conversations_on(self, day):
+        """Records whose timestamp falls on a calendar day ('YYYY-MM-DD' or date), oldest first"""
+        day = day if isinstance(day, str) else day.isoformat()
+        end = (datetime.fromisoformat(day) + timedelta(days=1)).date().isoformat()
+        return self._records(
+            "SELECT raw FROM conversations WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+            (day, end)
+        )
+
+    def last_row_id(self):
+        """Highest conversation row id (0 for an empty store)"""
+        with self._lock:
+            return self.conn.execute("SELECT MAX(id) FROM conversations").fetchone()[0] or 0
+
+    def count(self, source=None):
+        sql = "SELECT COUNT(*) FROM conversations"
+        params = ()
+        if source:
+            sql += " WHERE source = ?"
+            params = (source,)
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def state_distribution(self, last=100):
+        """State counts over the most recent N records"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT state_emoji, COUNT(*) AS n FROM "
+                "(SELECT state_emoji FROM conversations ORDER BY id DESC LIMIT ?) "
+                "WHERE state_emoji IS NOT NULL GROUP BY state_emoji",
+                (last,)
+            ).fetchall()
+        return Counter({row["state_emoji"]: row["n"] for row in rows})
+
+    def by_role(self, role, limit=50):
+        """Most recent records for a role, oldest first"""
+        records = self._records(
+            "SELECT raw FROM conversations WHERE role = ? ORDER BY timestamp DESC LIMIT ?",
+            (role, limit)
+        )
+        return records[::-1]
+
+    # === PATTERN REPORTS ===
+    def add_pattern_report(self, report, file=None):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pattern_reports (generated, file, report) VALUES (?, ?, ?)",
+                (report.get("generated", datetime.now().isoformat()), file,
+                 json.dumps(report, ensure_ascii=False))
+            )
+
+    def latest_pattern_report(self):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT report FROM pattern_reports ORDER BY generated DESC LIMIT 1"
+            ).fetchone()
+        return json.loads(row["report"]) if row else None
+
+    # === STATE LEARNING ===
+    def set_state_learning(self, learning):
+        with self._lock, self.conn:
+            for state, data in learning.items():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO state_learning (state, data) VALUES (?, ?)",
+                    (state, json.dumps(data, ensure_ascii=False))
+                )
+
+    def get_state_learning(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT state, data FROM state_learning").fetchall()
+        return {row["state"]: json.loads(row["data"]) for row in rows}
+
+    # === META ===
+    def get_meta(self, name, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, name, value):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                (name, json.dumps(value))
+            )
+
+    # === DAILY ROLLUPS ===
+    def days_touched(self, after_id=0):
+        """(days with rows added after a row id, highest row id seen)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT substr(timestamp, 1, 10) AS day FROM conversations "
+                "WHERE id > ? AND timestamp != ''",
+                (after_id,)
+            ).fetchall()
+            last_id = self.conn.execute(
+                "SELECT MAX(id) FROM conversations WHERE id > ?", (after_id,)
+            ).fetchone()[0]
+        return {row["day"] for row in rows}, last_id or after_id
+
+    def stale_rollup_days(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT day FROM daily_rollups WHERE data IS NULL").fetchall()
+        return {row["day"] for row in rows}
+
+    def set_rollup(self, day, data):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO daily_rollups (day, data) VALUES (?, ?)",
+                (day, json.dumps(data, ensure_ascii=False))
+            )
+
+    def rollups_between(self, start_day, end_day=None):
+        """[(day, rollup)] for start_day <= day <= end_day, oldest first"""
+        sql = "SELECT day, data FROM daily_rollups WHERE day >= ? AND data IS NOT NULL"
+        params = [str(start_day)]
+        if end_day is not None:
+            sql += " AND day <= ?"
+            params.append(str(end_day))
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY day", params).fetchall()
+        return [(row["day"], json.loads(row["data"])) for row in rows]
+
+    # === IMPORT ===
+    def import_data_dir(self):
+        """
+        Backfill from the my_data/ tree. Safe to re-run: records are keyed
+        by timestamp+role+content and the log is read from the last offset.
+        """
+        counts = Counter()
+
+        # Journal first so row order matches load_all_memory
+        journal_dir = os.path.join(self.data_dir, "journal")
+        if os.path.exists(journal_dir):
+            for file in sorted(os.listdir(journal_dir)):
+                if not file.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(journal_dir, file)) as f:
+                        entries = json.load(f)
+                except Exception as e:
+                    print(f"Skipping {file}: {e}")
+                    continue
+                if isinstance(entries, list):
+                    counts["journal"] += sum(1 for i in self.add_many(entries, "journal") if i)
+
+        counts["conversations"] += self.sync_log()
+
+        pattern_dir = os.path.join(self.data_dir, "patterns")
+        if os.path.exists(pattern_dir):
+            for file in sorted(os.listdir(pattern_dir)):
+                if not file.startswith("auto_extracted_") or not file.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(pattern_dir, file)) as f:
+                        report = json.load(f)
+                except Exception as e:
+                    print(f"Skipping {file}: {e}")
+                    continue
+                if isinstance(report, dict) and "analysis" in report:
+                    self.add_pattern_report(report, file)
+                    counts["pattern_reports"] += 1
+
+        learning_file = os.path.join(self.data_dir, "state_learning.json")
+        if os.path.exists(learning_file):
+            try:
+                with open(learning_file) as f:
+                    learning = json.load(f)
+                if isinstance(learning, dict):
+                    self.set_state_learning(learning)
+                    counts["state_learning"] += len(learning)
+            except Exception as e:
+                print(f"Skipping state_learning.json: {e}")
+
+        return dict(counts)
+
+    def sync_log(self):
+        """Copy records appended to the conversation log since the last sync"""
+        log = ConversationLog(self.data_dir)
+        if not os.path.exists(log.path):
+            log.migrate_json_arrays()
+
+        offset = self.get_meta("log_offset", 0)
+        if os.path.exists(log.path) and os.path.getsize(log.path) < offset:
+            offset = 0  # Log was replaced
+
+        batch = []
+        added = 0
+        for _, offset, record in log.iter_with_offsets(offset):
+            batch.append(record)
+            if len(batch) >= 1000:
+                added += sum(1 for i in self.add_many(batch) if i)
+                batch = []
+        if batch:
+            added += sum(1 for i in self.add_many(batch) if i)
+
+        self.set_meta("log_offset", offset)
+        return added
+
+
+# Global store instances, one per data directory
+_memory_stores = {}
+_memory_stores_lock = threading.Lock()
+
+
+def get_memory_store(data_dir="my_data"):
+    """Get or create the store singleton, backfilling on first creation"""
+    with _memory_stores_lock:
+        store = _memory_stores.get(data_dir)
+        if store is None:
+            store = MemoryStore(data_dir)
+            if store.is_new:
+                store.set_meta("keyword_index", True)
+                store.import_data_dir()
+            elif not store.get_meta("keyword_index"):
+                store.rebuild_keyword_index()
+            _memory_stores[data_dir] = store
+        return store
+
+
+if __name__ == "__main__":
+    store = MemoryStore()
+    print("📥 Importing my_data/ into the memory store...")
+    counts = store.import_data_dir()
+    for name, count in counts.items():
+        print(f"  {name}: {count}")
+    print(f"✅ {store.count()} records in {store.path}")
@@ -0,0 +1,253 @@
+"""
+Ollama Client
+One pooled keep-alive requests.Session per Ollama server, shared by chat and voice.
+Connection failures and 5xx responses are retried with backoff; a read
+timeout (Ollama hung) fails the call at once. Every call's latency is
+recorded, and a circuit breaker makes a dead server fail fast instead of
+hanging each turn until the timeout.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "http://localhost:11434"
+DEFAULT_MODEL = "qwen2.5:7b"
+
+
+class OllamaError(Exception):
+    """The request failed (after retries) or Ollama returned an error"""
+
+
+class OllamaUnavailable(OllamaError):
+    """Circuit is open - Ollama failed recently, the call was not attempted"""
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open trial after reset_timeout"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """True if a call may go through. Half-open lets exactly one trial call out"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class LatencyStats:
+    """Rolling window of call latencies in milliseconds"""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds * 1000)
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {"count": 0}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 1)
+
+        return {"count": len(samples), "p50": pct(50), "p95": pct(95), "max": round(samples[-1], 1)}
+
+
+class OllamaClient:
+    def __init__(self, base_url=DEFAULT_URL, model=DEFAULT_MODEL, retries=2, backoff=0.5,
+                 connect_timeout=3.0, read_timeout=60.0, pool_size=4,
+                 failure_threshold=3, reset_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.retries = retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # Keep-alive pool - repeat calls reuse the same TCP connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyStats()  # Whole call (non-streaming) or whole stream
+        self.first_token = LatencyStats()  # Streaming: request sent -> first content
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.short_circuits = 0
+
+    # === TRANSPORT ===
+    def _post(self, path, payload, timeout=None, stream=False):
+        """POST with retries on connection errors/5xx. Returns an open 200 response"""
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            raise OllamaUnavailable("Ollama unavailable - skipping call (circuit open)")
+
+        self.calls += 1
+        timeout = (self.connect_timeout, timeout or self.read_timeout)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = self.session.post(self.base_url + path, json=payload, timeout=timeout, stream=stream)
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout - the request never reached Ollama, so retrying is safe
+                last_error = e
+                continue
+            except requests.Timeout as e:
+                # Connected but no answer within the read timeout - a hung server, don't wait on it again
+                self.failures += 1
+                self.breaker.record_failure()
+                raise OllamaError(f"Ollama timed out: {e}")
+
+            if response.status_code < 500:
+                break
+            last_error = f"HTTP {response.status_code}"
+            response.close()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise OllamaError(f"Ollama connection failed: {last_error}")
+
+        if response.status_code != 200:
+            # 4xx (unknown model, bad request) - Ollama is up, so the breaker stays closed
+            self.breaker.record_success()
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            response.close()
+            raise OllamaError(f"Ollama error {response.status_code}: {str(message)[:100]}")
+
+        return response
+
+    def _payload(self, messages, model, options, stream):
+        payload = {"model": model or self.model, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+        return payload
+
+    # === API ===
+    def chat(self, messages, model=None, options=None, timeout=None):
+        """Full response text for a chat request"""
+        started = time.perf_counter()
+        response = self._post("/api/chat", self._payload(messages, model, options, False), timeout)
+        try:
+            content = response.json()["message"]["content"]
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise OllamaError(f"Bad response from Ollama: {e}")
+        self.breaker.record_success()
+        self.latency.add(time.perf_counter() - started)
+        return content
+
+    def stream_chat(self, messages, model=None, options=None, timeout=None):
+        """
+        Yield content pieces as Ollama generates them (NDJSON, one chunk per line).
+        timeout is the longest gap allowed between chunks.
+        """
+        started = time.perf_counter()
+        response = self._post("/api/chat", self._payload(messages, model, options, True), timeout, stream=True)
+        first = True
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise OllamaError(f"Ollama error: {str(chunk['error'])[:100]}")
+                piece = chunk.get("message", {}).get("content", "")
+                if piece:
+                    if first:
+                        self.first_token.add(time.perf_counter() - started)
+                        first = False
+                    yield piece
+                if chunk.get("done"):
+                    break
+        except GeneratorExit:
+            # Caller stopped reading early - Ollama did answer, so settle a half-open trial
+            self.breaker.record_success()
+            raise
+        except OllamaError:
+            self.breaker.record_success()  # Ollama is up, it reported an error in the stream
+            raise
+        except Exception as e:
+            # Dropped mid-stream - not retried, the caller already has part of the answer
+            self.failures += 1
+            self.breaker.record_failure()
+            raise OllamaError(f"Ollama stream failed: {e}")
+        finally:
+            response.close()
+        self.breaker.record_success()
+        self.latency.add(time.perf_counter() - started)
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retried,
+            "short_circuits": self.short_circuits,
+            "latency_ms": self.latency.summary(),
+            "first_token_ms": self.first_token.summary()
+        }
+
+
+# Global client instances - one per Ollama server, shared by every session
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url=DEFAULT_URL):
+    """Get or create the process-wide Ollama client"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = OllamaClient(base_url)
+            _clients[base_url] = client
+        return client
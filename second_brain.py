@@ -1,17 +1,28 @@
 import streamlit as st
-import requests
 import json
 import os
 import subprocess
 import re
+import time
+import functools
 import pandas as pd
 import altair as alt
 from voice_handler import speak, get_voice_handler
 from voice_conversation import VoiceConversationHandler
+from voice_prompts import VoicePrompts
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import Counter
-from auto_pattern_extractor import PatternExtractor
+from extraction_worker import get_extraction_worker
+from state_detection import analyze_mental_state
+from conversation_log import get_conversation_log
+from memory_loader import get_memory_service
+from memory_store import get_memory_store
+from bm25_index import get_memory_retriever
+from vector_index import get_semantic_recall
+from weekly_report import get_daily_rollups, get_report_runner
+from ollama_client import get_ollama_client, OllamaUnavailable
+from tracing import get_tracer, trace, traced
 
 st.set_page_config(
     page_title="Second Brain", 
@@ -21,261 +32,62 @@ st.set_page_config(
 
 # === MEMORY SYSTEM ===
 def load_all_memory():
-    """Load EVERYTHING - all conversations, patterns, journal entries"""
-    memory = {
-        "conversations": [],
-        "patterns": [],
-        "journal": [],
-        "state_history": [],
-        "learning": {}
-    }
-    
-    # Load all journal entries
-    if os.path.exists("my_data/journal"):
-        for file in sorted(os.listdir("my_data/journal")):
-            if file.endswith('.json'):
-                try:
-                    with open(os.path.join("my_data/journal", file)) as f:
-                        entries = json.load(f)
-                        for entry in entries:
-                            if isinstance(entry, dict):
-                                memory["journal"].append(entry)
-                                memory["conversations"].append(entry)
-                except:
-                    pass
-    
-    # Load all conversations from persistent storage
-    if os.path.exists("my_data/conversations.json"):
-        try:
-            with open("my_data/conversations.json") as f:
-                convos = json.load(f)
-                for convo in convos:
-                    if isinstance(convo, dict):
-                        memory["conversations"].append(convo)
-        except:
-            pass
-    
-    # Load patterns (including auto-extracted)
-    if os.path.exists("my_data/patterns"):
-        for file in os.listdir("my_data/patterns"):
-            if file.endswith('.json'):
-                try:
-                    with open(os.path.join("my_data/patterns", file)) as f:
-                        data = json.load(f)
-                        # Handle both old manual patterns and new auto-extracted reports
-                        if isinstance(data, list):
-                            memory["patterns"].extend([p for p in data if isinstance(p, dict)])
-                        elif isinstance(data, dict) and "analysis" in data:
-                            # This is an auto-extracted pattern report
-                            memory["patterns"].append(data)
-                except:
-                    pass
-    
-    # Load state learning
-    if os.path.exists("my_data/state_learning.json"):
-        try:
-            with open("my_data/state_learning.json") as f:
-                memory["learning"] = json.load(f)
-        except:
-            pass
-    
-    return memory
+    """Load EVERYTHING - all conversations, patterns, journal entries.
+    One copy per process shared by every session; only changed files are read again."""
+    return get_memory_service().refresh()
 
+@traced("save_conversation")
 def save_conversation(entry):
     """Save every single interaction persistently"""
-    os.makedirs("my_data", exist_ok=True)
-    
-    # Only save to master file - no more daily files
-    master_file = "my_data/conversations.json"
-    all_convos = []
-    
-    if os.path.exists(master_file):
-        try:
-            with open(master_file) as f:
-                all_convos = json.load(f)
-        except:
-            all_convos = []
-    
-    all_convos.append(entry)
-    
-    # Keep last 10000 messages
-    if len(all_convos) > 10000:
-        all_convos = all_convos[-10000:]
-    
-    with open(master_file, 'w') as f:
-        json.dump(all_convos, f, indent=2)
-    
-    # AUTO-PATTERN EXTRACTION: Run every 10 conversations (but only once)
-    if len(all_convos) % 10 == 0 and len(all_convos) > 0:
-        last_extract_count = st.session_state.get("last_pattern_extract", 0)
-        if len(all_convos) != last_extract_count:
-            st.session_state.last_pattern_extract = len(all_convos)
-
-            try:
-                extractor = PatternExtractor()
-                extractor.generate_pattern_report()
-                st.session_state.memory = load_all_memory()
-            except Exception as e:
-                print(f"Pattern extraction failed: {e}")
-    
-    # Save to daily file
-    filename = f"my_data/conversations_{datetime.now().strftime('%Y%m%d')}.json"
-    entries = []
-    if os.path.exists(filename):
-        try:
-            with open(filename) as f:
-                entries = json.load(f)
-        except:
-            entries = []
-    
-    entries.append(entry)
-    with open(filename, 'w') as f:
-        json.dump(entries, f, indent=2)
-    
-    # Also append to master conversation file
-    all_convos = []
-    master_file = "my_data/conversations.json"
-    if os.path.exists(master_file):
-        try:
-            with open(master_file) as f:
-                all_convos = json.load(f)
-        except:
-            all_convos = []
-    
-    all_convos.append(entry)
-    
-    # Keep last 10000 messages in master file
-    if len(all_convos) > 10000:
-        all_convos = all_convos[-10000:]
-    
-    # AUTO-PATTERN EXTRACTION: Run every 10 conversations (but only once)
-    if len(all_convos) % 10 == 0 and len(all_convos) > 0:
-        # Check if we already extracted for this batch
-        last_extract_count = st.session_state.get("last_pattern_extract", 0)
-        if len(all_convos) != last_extract_count:
-            st.session_state.last_pattern_extract = len(all_convos)
-            try:
-                extractor = PatternExtractor()
-                extractor.generate_pattern_report()
-                # Reload memory to get new patterns
-                st.session_state.memory = load_all_memory()
-            except Exception as e:
-                print(f"Pattern extraction failed: {e}")
-    
-    # AUTO-PATTERN EXTRACTION: Run every 10 conversations
-    if len(all_convos) % 10 == 0:
-        try:
-            extractor = PatternExtractor()
-            extractor.generate_pattern_report()
-            # Reload memory to get new patterns
-            st.session_state.memory = load_all_memory()
-        except Exception as e:
-            print(f"Pattern extraction failed: {e}")
-
+    # One append per message - the log keeps the last 10000 as its window
+    with trace("save.log_append"):
+        total = get_conversation_log().append(entry)
+    with trace("save.index_sync"):
+        get_memory_store().sync_log()
+    with trace("save.rollups"):
+        get_daily_rollups().refresh()  # Re-rolls today only
+    with trace("save.memory_refresh"):
+        get_memory_service().refresh()  # New version - cached views recompute on next read
+    
+    # AUTO-PATTERN EXTRACTION: Every 10 conversations, on a background thread
+    if total % 10 == 0:
+        with trace("save.pattern_extraction_submit"):
+            get_extraction_worker().submit()
+
+@traced("get_latest_patterns")
 def get_latest_patterns():
-    """Get the most recent auto-extracted pattern report"""
-    pattern_dir = "my_data/patterns"
-    if not os.path.exists(pattern_dir):
-        return None
-    
-    pattern_files = [f for f in os.listdir(pattern_dir) if f.startswith("auto_extracted_")]
-    if not pattern_files:
-        return None
-    
-    latest = sorted(pattern_files)[-1]
-    
-    try:
-        with open(os.path.join(pattern_dir, latest)) as f:
-            return json.load(f)
-    except:
-        return None
-
-# === STATE DETECTION ENGINE ===
-def analyze_mental_state(text, memory):
-    """Analyze text using patterns learned from user's history"""
-    
-    states = {
-        "🧠": {"name": "logic", "patterns": ["therefore", "because", "analyze", "consider", "think", "reason", "evidence", "data", "fact", "objective", "if then", "hypothesis"], "structure": "clear"},
-        "🌀": {"name": "spiral", "patterns": ["keep thinking", "over and over", "can't stop", "stuck", "loop", "again", "why", "but what if", "round and round", "obsessing", "ruminating"], "structure": "repetitive"},
-        "⚡": {"name": "flow", "patterns": ["got it", "flowing", "yes", "boom", "crushing it", "zone", "flying", "clicking", "everything makes sense", "connected", "aha"], "structure": "energetic"},
-        "🪞": {"name": "reflection", "patterns": ["realize", "notice", "pattern", "hmm", "interesting", "i see", "looking back", "meta", "observe", "aware", "noticing"], "structure": "contemplative"},
-        "📘": {"name": "teaching", "patterns": ["let me explain", "so basically", "the way it works", "for example", "think of it like", "here's how", "imagine", "essentially"], "structure": "explanatory"},
-        "😤": {"name": "frustrated", "patterns": ["fuck", "shit", "ugh", "annoyed", "frustrated", "irritated", "why isn't", "broken", "stupid", "hate", "pissed"], "structure": "tense"},
-        "🎯": {"name": "determined", "patterns": ["will", "must", "going to", "let's do", "need to", "have to", "focused", "locked in", "get this done", "no excuses"], "structure": "decisive"}
-    }
-    
-    # Check user's personal learned patterns
-    if memory.get("learning"):
-        for state, data in memory["learning"].items():
-            if state in states and isinstance(data, dict) and "patterns" in data:
-                states[state]["patterns"].extend(data["patterns"])
-    
-    confidence_scores = {}
-    text_lower = text.lower()
-    
-    for emoji, config in states.items():
-        score = 0
-        matches = []
-        
-        # Check patterns
-        for pattern in config["patterns"]:
-            if pattern in text_lower:
-                score += 10
-                matches.append(pattern)
-        
-        # Analyze structure
-        sentences = text.split('.')
-        if config["structure"] == "clear" and len(sentences) > 1:
-            score += 5
-        elif config["structure"] == "repetitive" and ("?" in text or "..." in text):
-            score += 7
-        elif config["structure"] == "energetic" and ("!" in text):
-            score += 5
-        elif config["structure"] == "tense" and any(word.isupper() for word in text.split() if len(word) > 3):
-            score += 8
-        
-        confidence_scores[emoji] = {
-            "score": score,
-            "confidence": min(score * 2, 95),
-            "matches": matches,
-            "name": config["name"]
-        }
-    
-    sorted_states = sorted(confidence_scores.items(), key=lambda x: x[1]["score"], reverse=True)
-    primary = sorted_states[0] if sorted_states[0][1]["score"] > 0 else ("🧠", {"score": 0, "confidence": 30, "name": "logic"})
-    
-    return {
-        "primary": primary,
-        "all_scores": confidence_scores
-    }
-
-def create_state_timeline(conversations, days=7):
-    """Create visual timeline of mental states over last N days"""
+    """Get the most recent auto-extracted pattern report (cached until data or report changes)"""
+    return get_memory_service().view(
+        "latest_patterns",
+        lambda memory: get_memory_store().latest_pattern_report(),
+        key=get_extraction_worker().version
+    )
+
+def create_state_timeline(time_index, start=None, end=None, days=7):
+    """Create visual timeline of mental states from start to end (default: last N days)"""
     from datetime import timedelta
     
-    # Filter to last N days
-    cutoff = datetime.now() - timedelta(days=days)
-    recent = []
+    if start is None:
+        period = f"Last {days} Days"
+        start = datetime.now() - timedelta(days=days)
+    else:
+        last_day = end - timedelta(days=1) if end else datetime.now()
+        period = f"{start:%b %d} – {last_day:%b %d}"
     
-    for conv in conversations:
-        if not isinstance(conv, dict):
-            continue
-        
-        timestamp = conv.get("timestamp", "")
+    # Bisect to the window - nothing outside it gets parsed
+    recent = []
+    for conv in time_index.range(start, end):
         state = conv.get("state", {})
-        
-        if not timestamp or not isinstance(state, dict):
+        if not isinstance(state, dict):
             continue
         
         try:
-            dt = datetime.fromisoformat(timestamp)
-            if dt >= cutoff:
-                recent.append({
-                    "timestamp": dt,
-                    "state": state.get("emoji", "?"),
-                    "state_name": state.get("name", "unknown"),
-                    "confidence": state.get("confidence", 0)
-                })
+            recent.append({
+                "timestamp": datetime.fromisoformat(conv["timestamp"]),
+                "state": state.get("emoji", "?"),
+                "state_name": state.get("name", "unknown"),
+                "confidence": state.get("confidence", 0)
+            })
         except:
             continue
     
@@ -321,36 +133,31 @@ def create_state_timeline(conversations, days=7):
     ).properties(
         width=600,
         height=300,
-        title=f'Mental State Timeline (Last {days} Days)'
+        title=f'Mental State Timeline ({period})'
     ).interactive()
     
     return chart
 
 
-def get_state_stats(conversations, days=7):
+def get_state_stats(time_index, start=None, end=None, days=7):
     """Get statistics about state distribution"""
     from datetime import timedelta
     
-    cutoff = datetime.now() - timedelta(days=days)
+    start = start or datetime.now() - timedelta(days=days)
     state_counts = Counter()
     state_durations = defaultdict(list)
     last_state = None
     last_time = None
     
-    for conv in sorted(conversations, key=lambda x: x.get("timestamp", "")):
-        if not isinstance(conv, dict):
-            continue
-        
-        timestamp = conv.get("timestamp", "")
+    # Already in time order - only the window's records are touched
+    for conv in time_index.range(start, end):
         state = conv.get("state", {})
         
-        if not timestamp or not isinstance(state, dict):
+        if not isinstance(state, dict):
             continue
         
         try:
-            dt = datetime.fromisoformat(timestamp)
-            if dt < cutoff:
-                continue
+            dt = datetime.fromisoformat(conv["timestamp"])
             
             emoji = state.get("emoji", "?")
             state_counts[emoji] += 1
@@ -378,6 +185,29 @@ def get_state_stats(conversations, days=7):
         "total": sum(state_counts.values())
     }
 
+# === LLM ===
+def stream_chat(messages):
+    """Yield response text as Ollama generates it"""
+    started = time.perf_counter()
+    first = True
+    try:
+        for piece in get_ollama_client().stream_chat(
+            messages,
+            options={
+                "temperature": 0.7,
+                "num_predict": 500
+            },
+            timeout=60  # Max gap between chunks
+        ):
+            if first:
+                get_tracer().record("ollama.first_token", (time.perf_counter() - started) * 1000)
+                first = False
+            yield piece
+    except OllamaUnavailable:
+        yield "Ollama connection failed. Is it running?"
+    except Exception as e:
+        yield f"Error: {str(e)[:100]}"
+
 # === LOAD CORE DATA ===
 def load_personality():
     if os.path.exists("my_data/personality_profile.json"):
@@ -423,9 +253,16 @@ def save_to_github():
     except Exception as e:
         return False, str(e)[:50]
 
+@st.fragment(run_every=1.0)
+def poll_weekly_report():
+    """Re-checks the report job every second without rerunning the page"""
+    if st.session_state.weekly_report.done():
+        st.rerun()  # Whole page - shows the report and stops polling
+    st.caption("⏳ Building weekly report...")
+
 # === INITIALIZE ===
-if "memory" not in st.session_state:
-    st.session_state.memory = load_all_memory()
+# Shared across sessions - a rerun with nothing new on disk is a few stat calls
+st.session_state.memory = load_all_memory()
 if "personality" not in st.session_state:
     st.session_state.personality = load_personality()
 if "mental_states" not in st.session_state:
@@ -441,6 +278,19 @@ if "voice_conversation_count" not in st.session_state:
 if "voice_handler" not in st.session_state:
     st.session_state.voice_handler = VoiceConversationHandler()    
 
+# Fixed voice lines are synthesized once, in the background, then played from disk
+get_voice_handler().prerender(
+    VoicePrompts.all_phrases() + VoiceConversationHandler.OPENINGS + VoiceConversationHandler.FALLBACKS
+)
+
+# Pattern reports the background worker finishes are picked up by the refresh above
+extraction_worker = get_extraction_worker()
+memory_service = get_memory_service()
+
+# BM25 and vector indexes load (or build) in the background - chat works without them until they're ready
+get_memory_retriever(get_memory_store())
+get_semantic_recall(get_memory_store())
+
 # === HEADER ===
 col1, col2, col3 = st.columns([2, 3, 2])
 
@@ -471,6 +321,8 @@ with col3:
                  use_container_width=True):
         st.session_state.voice_mode = not st.session_state.voice_mode
         st.session_state.voice_conversation_count = 0
+        st.session_state.voice_handler.reset()
+        get_voice_handler().cancel()
         st.rerun()    
 
 st.divider()
@@ -495,6 +347,14 @@ if st.session_state.voice_mode:
     # Voice mode - show different UI
     st.markdown("### 🎤 Voice Mode Active")
     st.caption("Speak naturally. AI will respond with short questions.")
+    voice_latency = get_voice_handler().latency_stats()
+    if voice_latency["turns"]:
+        st.caption(f"🔊 First audio: {voice_latency['last_first_audio_ms']:.0f} ms "
+                   f"(p50 {voice_latency['p50_first_audio_ms']:.0f} ms over {voice_latency['turns']} turns)")
+    speculation = st.session_state.voice_handler.speculation_stats()
+    if speculation["hits"] + speculation["misses"]:
+        st.caption(f"⚡ Prepared follow-ups: {speculation['hit_rate']:.0%} hit rate, "
+                   f"{speculation['latency_saved_ms'] / 1000:.1f}s saved")
     
     # Use text input for now (voice recording coming next)
     user_input = st.chat_input("Or type here (voice optimized)...")
@@ -504,8 +364,15 @@ else:
     user_input = st.chat_input("Think, dump, question, reflect - I remember everything...")
 
 if user_input:
+    turn_started = time.perf_counter()
+    trace_turn = get_tracer().begin_turn("voice" if st.session_state.voice_mode else "chat")
+    
+    # Barge-in: new input cuts off whatever is still being spoken
+    get_voice_handler().cancel()
+    
     # Analyze state
-    state_analysis = analyze_mental_state(user_input, st.session_state.memory)
+    with trace("analyze_mental_state"):
+        state_analysis = analyze_mental_state(user_input, st.session_state.memory)
     primary_state = state_analysis["primary"]
     
     st.session_state.detected_state = primary_state
@@ -531,20 +398,40 @@ if user_input:
     # Get relevant memories (last 50 + search for related)
     recent_convos = [c for c in memory_context.get("conversations", []) if isinstance(c, dict)][-50:]
     
-    # Search for related memories based on keywords
-    keywords = set(user_input.lower().split())
-    related_memories = []
-    for mem in memory_context.get("conversations", []):
-        if isinstance(mem, dict) and any(keyword in mem.get("content", "").lower() for keyword in keywords if len(keyword) > 4):
-            related_memories.append(mem)
+    # Rank related memories with BM25 - fall back to plain keyword hits if no term overlaps
+    # (or the index is still loading)
+    store = get_memory_store()
+    with trace("related_memories.bm25"):
+        related_memories = [
+            mem for mem in get_memory_retriever(store).search(user_input, k=6)
+            if mem.get("timestamp") != user_msg["timestamp"]  # Skip the message we just saved
+        ][:5]
+        if not related_memories:
+            related_memories = [
+                mem for mem in store.related(user_input, limit=6)
+                if mem.get("timestamp") != user_msg["timestamp"]
+            ][-5:]
+    
+    # Semantic recall - similar moments even when no words are shared (none while the index loads)
+    with trace("related_memories.semantic"):
+        similar_memories = [
+            mem for mem in get_semantic_recall(store).search(user_input, k=4)
+            if mem.get("timestamp") != user_msg["timestamp"] and mem not in related_memories
+        ][:3]
     
     # Build comprehensive context
     context_str = ""
     if related_memories:
         context_str += f"\nRELATED MEMORIES:\n"
-        for mem in related_memories[-10:]:
+        for mem in related_memories:
             if isinstance(mem, dict):
-                context_str += f"- {mem.get('timestamp', '')[:10]}: {mem.get('content', '')[:100]}...\n"
+                when = mem.get('timestamp', '')[:10] or mem.get('source', 'raw')
+                context_str += f"- {when}: {mem.get('content', '')[:100]}...\n"
+    
+    if similar_memories:
+        context_str += f"\nSIMILAR MOMENTS:\n"
+        for mem in similar_memories:
+            context_str += f"- {mem.get('timestamp', '')[:10]}: {mem.get('content', '')[:100]}...\n"
     
     # Recent conversation flow
     recent_states = []
@@ -607,72 +494,74 @@ Remember: You ARE them, but better. You think faster, see clearer, remember ever
     
     # Get response
     with st.chat_message("assistant"):
-        with st.spinner("Processing through neural pathways..."):
-            # Include recent conversation for context
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Add last 10 messages for conversation context
-            for msg in st.session_state.conversation[-10:]:
-                if isinstance(msg, dict):
-                    messages.append({
-                        "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
-                    })
-            
-# Check if voice mode - use different response generation
-            if st.session_state.voice_mode:
-                # Voice mode: LLM-generated contextual follow-up
-                if st.session_state.voice_conversation_count == 0:
-                    # First message - use opening
-                    content = st.session_state.voice_handler.get_opening_prompt()
+        # Include recent conversation for context
+        messages = [
+            {"role": "system", "content": system_prompt}
+        ]
+        
+        # Add last 10 messages for conversation context
+        for msg in st.session_state.conversation[-10:]:
+            if isinstance(msg, dict):
+                messages.append({
+                    "role": msg.get("role", "user"),
+                    "content": msg.get("content", "")
+                })
+        
+        # Check if voice mode - use different response generation
+        if st.session_state.voice_mode:
+            # Voice mode: LLM-generated contextual follow-up
+            if st.session_state.voice_conversation_count == 0:
+                # First message - use opening
+                content = st.session_state.voice_handler.get_opening_prompt()
+                st.write(content)
+                
+                # Queued on the TTS thread - the rerun happens while it plays
+                with trace("tts.queue"):
+                    speak(content)
+            else:
+                # Prepared while the last reply played? Then there is nothing to wait for
+                with trace("voice.take_speculation"):
+                    speculated = st.session_state.voice_handler.take_speculation(user_input)
+                if speculated:
+                    follow_up = [speculated]
                 else:
-                    # Generate contextual follow-up
-                    content = st.session_state.voice_handler.generate_follow_up(
+                    # Generate contextual follow-up - each clause is spoken as soon as it streams in
+                    follow_up = st.session_state.voice_handler.stream_follow_up(
                         user_input,
                         st.session_state.conversation[-5:]  # Last 5 messages for context
                     )
-                
-                st.session_state.voice_conversation_count += 1
-                
-                # Speak the response (blocking so it finishes before rerun)
-                speak(content, blocking=True)
-                
-            else:
-                # Normal mode: full LLM response
-                try:
-                    response = requests.post(
-                        "http://localhost:11434/api/chat",
-                        json={
-                            "model": "qwen2.5:7b",
-                            "messages": messages,
-                            "stream": False,
-                            "options": {
-                                "temperature": 0.7,
-                                "num_predict": 500
-                            }
-                        },
-                        timeout=60
-                    )
-                    
-                    if response.status_code == 200:
-                        content = response.json()["message"]["content"]
-                    else:
-                        content = "Ollama connection failed. Is it running?"
-                except Exception as e:
-                    content = f"Error: {str(e)[:100]}"
+                # Recorded by the TTS thread when playback starts - even if that's after the turn is saved
+                on_first_audio = functools.partial(get_tracer().record, "tts.first_audio", turn=trace_turn)
+                with trace("ollama.voice_follow_up"):
+                    content = st.write_stream(get_voice_handler().speak_stream(
+                        follow_up, started=turn_started, on_first_audio=on_first_audio
+                    ))
             
-            assistant_msg = {
-                "role": "assistant",
-                "content": content,
-                "timestamp": datetime.now().isoformat()
-            }
+            st.session_state.voice_conversation_count += 1
             
-            st.write(content)
-            st.session_state.conversation.append(assistant_msg)
-            save_conversation(assistant_msg)
+        else:
+            # Normal mode: render tokens as they arrive, returns the full text at the end
+            with trace("ollama.chat"):
+                content = st.write_stream(stream_chat(messages))
+        
+        assistant_msg = {
+            "role": "assistant",
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        st.session_state.conversation.append(assistant_msg)
+        save_conversation(assistant_msg)
+        
+        if st.session_state.voice_mode:
+            # Get the likeliest next follow-ups (and their audio) ready while this one plays
+            with trace("voice.speculate"):
+                st.session_state.voice_handler.speculate(
+                    st.session_state.conversation[-6:],
+                    warm=get_voice_handler().warm
+                )
     
+    get_tracer().end_turn()
     st.rerun()
 
 # === SIDEBAR ===
@@ -689,10 +578,8 @@ with st.sidebar:
         st.metric("Total Memories", len(memory.get("conversations", [])))
         st.metric("Patterns", len(memory.get("patterns", [])))
     with col2:
-        today_count = len([
-            m for m in memory.get("conversations", []) 
-            if isinstance(m, dict) and m.get("timestamp", "").startswith(datetime.now().strftime("%Y-%m-%d"))
-        ])
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        today_count = memory_service.view("today_count", lambda m: m["time_index"].count(today), key=today)
         st.metric("Today", today_count)
         st.metric("States", len(st.session_state.mental_states))
     
@@ -735,17 +622,33 @@ with st.sidebar:
     st.divider()
 
     # Mental State Timeline
-    st.markdown("**📊 State Timeline (7 days):**")
+    st.markdown("**📊 State Timeline:**")
+    
+    today = datetime.now().date()
+    timeline_range = st.date_input("From / to", value=(today - timedelta(days=7), today), max_value=today)
+    timeline_start = timeline_end = None
+    if isinstance(timeline_range, (list, tuple)) and len(timeline_range) == 2:
+        timeline_start = datetime.combine(timeline_range[0], datetime.min.time())
+        timeline_end = datetime.combine(timeline_range[1], datetime.min.time()) + timedelta(days=1)
     
-    conversations = memory.get("conversations", [])
-    if len(conversations) > 5:
+    time_index = memory["time_index"]
+    if len(time_index) > 5:
         try:
-            chart = create_state_timeline(conversations, days=7)
+            # Same data version and range -> reuse the chart and stats from any session
+            chart = memory_service.view(
+                "state_timeline",
+                lambda m: create_state_timeline(m["time_index"], timeline_start, timeline_end),
+                key=(timeline_start, timeline_end)
+            )
             if chart:
                 st.altair_chart(chart, use_container_width=True)
             
             # State statistics
-            stats = get_state_stats(conversations, days=7)
+            stats = memory_service.view(
+                "state_stats",
+                lambda m: get_state_stats(m["time_index"], timeline_start, timeline_end),
+                key=(timeline_start, timeline_end)
+            )
             if stats["total"] > 0:
                 col1, col2 = st.columns(2)
                 
@@ -771,15 +674,10 @@ with st.sidebar:
     # State distribution
     if memory.get("conversations"):
         st.markdown("**State Distribution:**")
-        state_counts = Counter()
-        
-        for c in memory["conversations"][-100:]:
-            if isinstance(c, dict) and c.get("state"):
-                state = c["state"]
-                if isinstance(state, dict):
-                    emoji = state.get("emoji")
-                    if emoji:
-                        state_counts[emoji] += 1
+        state_counts = memory_service.view(
+            "state_distribution",
+            lambda m: get_memory_store().state_distribution(last=100)
+        )
         
         for state, count in state_counts.most_common(3):
             name = st.session_state.mental_states.get(state, {}).get("name", state)
@@ -796,41 +694,54 @@ with st.sidebar:
             else:
                 st.error(msg)
     
+    if extraction_worker.busy:
+        st.caption("🔍 Extracting patterns in background...")
+    elif extraction_worker.last_error:
+        st.caption(f"Pattern extraction failed: {extraction_worker.last_error[:50]}")
+    
+    ollama = get_ollama_client().stats()
+    if ollama["state"] != "closed":
+        st.caption(f"⚠️ Ollama unreachable - failing fast ({ollama['failures']} failed calls)")
+    
     if st.button("🔄 Extract Patterns Now", use_container_width=True):
-        with st.spinner("Analyzing patterns..."):
-            try:
-                extractor = PatternExtractor()
-                extractor.generate_pattern_report()
-                st.session_state.memory = load_all_memory()
-                st.success("Patterns extracted!")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {str(e)[:50]}")
+        if extraction_worker.submit(reason="manual"):
+            st.success("Pattern extraction started - insights update when it finishes")
+        else:
+            st.info("Pattern extraction already queued")
 
     if st.button("📊 Generate Weekly Report", use_container_width=True):
-        with st.spinner("Analyzing patterns..."):
-            try:
-                import subprocess
-                result = subprocess.run(
-                    ["python", "weekly_report.py"],
-                    capture_output=True,
-                    text=True,
-                    cwd=os.path.expanduser("~/secondbrain")
-                )
-                if result.returncode == 0:
-                    # Find the report file
-                    report_file = f"my_data/reports/week_{datetime.now().strftime('%Y%m%d')}.md"
-                    if os.path.exists(report_file):
-                        st.success("Report generated!")
-                        with st.expander("📄 View Report"):
-                            with open(report_file) as f:
-                                st.markdown(f.read())
-                    else:
-                        st.error("Report file not found")
-                else:
-                    st.error(f"Error: {result.stderr[:100]}")
-            except Exception as e:
-                st.error(f"Error: {str(e)[:50]}")
+        # In-process on a background thread; unchanged data comes straight from the cache
+        st.session_state.weekly_report = get_report_runner().submit(days=7)
+    
+    report_job = st.session_state.get("weekly_report")
+    if report_job is not None and not report_job.done():
+        poll_weekly_report()
+    elif report_job is not None:
+        try:
+            result = report_job.result()
+            if result:
+                report_file, report_markdown = result
+                st.success("Report generated!")
+                with st.expander("📄 View Report"):
+                    st.markdown(report_markdown)
+            else:
+                st.warning("Not enough data for a weekly report yet")
+        except Exception as e:
+            st.error(f"Error: {str(e)[:50]}")
+    
+    # Where turns spend their time
+    tracer = get_tracer()
+    with st.expander("⏱️ Turn Latency"):
+        tracer.enabled = st.toggle("Trace chat turns", value=tracer.enabled)
+        stage_stats = tracer.stage_stats(last=50)
+        if stage_stats:
+            st.caption(f"ms per stage, last {min(50, len(tracer.turns))} turns")
+            st.dataframe(
+                pd.DataFrame.from_dict(stage_stats, orient="index")[["p50", "p95", "p99", "count"]],
+                use_container_width=True
+            )
+        else:
+            st.caption("No traced turns yet")
     
     if st.button("🧹 Clear View", use_container_width=True):
         st.session_state.conversation = []
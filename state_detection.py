@@ -0,0 +1,164 @@
+"""
+State Detection Engine
+Scores text against every mental state's patterns with one compiled matcher.
+The matcher is built once and only rebuilt when learned patterns change.
+"""
+
+from collections import deque
+
+STATES = {
+    "🧠": {"name": "logic", "patterns": ("therefore", "because", "analyze", "consider", "think", "reason", "evidence", "data", "fact", "objective", "if then", "hypothesis"), "structure": "clear"},
+    "🌀": {"name": "spiral", "patterns": ("keep thinking", "over and over", "can't stop", "stuck", "loop", "again", "why", "but what if", "round and round", "obsessing", "ruminating"), "structure": "repetitive"},
+    "⚡": {"name": "flow", "patterns": ("got it", "flowing", "yes", "boom", "crushing it", "zone", "flying", "clicking", "everything makes sense", "connected", "aha"), "structure": "energetic"},
+    "🪞": {"name": "reflection", "patterns": ("realize", "notice", "pattern", "hmm", "interesting", "i see", "looking back", "meta", "observe", "aware", "noticing"), "structure": "contemplative"},
+    "📘": {"name": "teaching", "patterns": ("let me explain", "so basically", "the way it works", "for example", "think of it like", "here's how", "imagine", "essentially"), "structure": "explanatory"},
+    "😤": {"name": "frustrated", "patterns": ("fuck", "shit", "ugh", "annoyed", "frustrated", "irritated", "why isn't", "broken", "stupid", "hate", "pissed"), "structure": "tense"},
+    "🎯": {"name": "determined", "patterns": ("will", "must", "going to", "let's do", "need to", "have to", "focused", "locked in", "get this done", "no excuses"), "structure": "decisive"}
+}
+
+# Past this many distinct patterns one automaton pass beats a C-level scan per pattern
+AUTOMATON_THRESHOLD = 200
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher - one pass over the text finds every pattern present"""
+
+    def __init__(self, patterns):
+        goto = [{}]
+        outputs = [[]]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][ch] = nxt
+                state = nxt
+            outputs[state].append(index)
+
+        # Breadth-first: failure links, merged outputs and a full transition table
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            fallback = delta[fail[state]]
+            delta[state] = {**fallback, **goto[state]}
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = fallback.get(ch, 0)
+                queue.append(nxt)
+
+        self.delta = delta
+        self.outputs = [tuple(o) for o in outputs]
+
+    def find(self, text):
+        """Indices of every pattern that occurs in text"""
+        delta = self.delta
+        outputs = self.outputs
+        found = set(outputs[0])  # Empty patterns match everything
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class StateMatcher:
+    def __init__(self, learning=None):
+        self.learning = learning
+        self.signature = self._signature(learning)
+
+        # Every distinct pattern is checked once, however many states list it
+        self.patterns = []
+        self.owners = []  # pattern index -> [(emoji, position in that state's list)]
+        index_of = {}
+
+        for emoji, config in STATES.items():
+            patterns = list(config["patterns"])
+            if learning:
+                data = learning.get(emoji)
+                if isinstance(data, dict) and "patterns" in data:
+                    patterns.extend(p for p in data["patterns"] if isinstance(p, str))
+
+            for position, pattern in enumerate(patterns):
+                index = index_of.get(pattern)
+                if index is None:
+                    index = index_of[pattern] = len(self.patterns)
+                    self.patterns.append(pattern)
+                    self.owners.append([])
+                self.owners[index].append((emoji, position))
+
+        self.automaton = AhoCorasick(self.patterns) if len(self.patterns) >= AUTOMATON_THRESHOLD else None
+
+    @staticmethod
+    def _signature(learning):
+        if not learning:
+            return ()
+        return tuple(
+            (state, tuple(data["patterns"]))
+            for state, data in learning.items()
+            if state in STATES and isinstance(data, dict) and isinstance(data.get("patterns"), list)
+        )
+
+    def find(self, text_lower):
+        if self.automaton is not None:
+            return self.automaton.find(text_lower)
+        return {i for i, pattern in enumerate(self.patterns) if pattern in text_lower}
+
+    def analyze(self, text):
+        """Same scoring as always: +10 per pattern hit plus a structure bonus"""
+        hits = {emoji: [] for emoji in STATES}
+        for index in self.find(text.lower()):
+            for emoji, position in self.owners[index]:
+                hits[emoji].append((position, self.patterns[index]))
+
+        # Structure features don't depend on the state - compute them once
+        bonus = {
+            "clear": 5 if "." in text else 0,  # Same as len(text.split('.')) > 1
+            "repetitive": 7 if ("?" in text or "..." in text) else 0,
+            "energetic": 5 if "!" in text else 0,
+            "tense": 8 if any(word.isupper() for word in text.split() if len(word) > 3) else 0,
+        }
+
+        confidence_scores = {}
+        for emoji, config in STATES.items():
+            matches = [pattern for _, pattern in sorted(hits[emoji])]
+            score = len(matches) * 10 + bonus.get(config["structure"], 0)
+            confidence_scores[emoji] = {
+                "score": score,
+                "confidence": min(score * 2, 95),
+                "matches": matches,
+                "name": config["name"]
+            }
+
+        sorted_states = sorted(confidence_scores.items(), key=lambda x: x[1]["score"], reverse=True)
+        primary = sorted_states[0] if sorted_states[0][1]["score"] > 0 else ("🧠", {"score": 0, "confidence": 30, "name": "logic"})
+
+        return {
+            "primary": primary,
+            "all_scores": confidence_scores
+        }
+
+
+# Cached matcher - rebuilt only when the learned patterns change
+_state_matcher = None
+
+def get_state_matcher(learning=None):
+    global _state_matcher
+    matcher = _state_matcher
+    if matcher is not None and (matcher.learning is learning or matcher.signature == StateMatcher._signature(learning)):
+        return matcher
+    _state_matcher = StateMatcher(learning)
+    return _state_matcher
+
+
+def analyze_mental_state(text, memory):
+    """Analyze text using patterns learned from user's history"""
+    return get_state_matcher(memory.get("learning")).analyze(text)
@@ -0,0 +1,210 @@
+"""
+State Sequence Analytics
+A conversation history encoded once as a compact int8 state array plus an
+int64 epoch array. Run-length encoding, transition counts, runs of any
+state, breakthroughs and time-in-state are vectorized NumPy operations,
+shared by the pattern extractor and the weekly report.
+"""
+
+import warnings
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
+from state_detection import STATES
+
+NO_STATE = 0  # Record has no state dict - breaks runs, never pairs up
+UNLABELED = 1  # State dict without an emoji
+NAT = np.iinfo(np.int64).min  # Missing or unparseable timestamp (same bits as NaT)
+
+
+def parse_epochs(timestamps):
+    """ISO timestamps -> int64 microseconds since the epoch (NAT where missing/invalid)"""
+    if not timestamps:
+        return np.zeros(0, dtype=np.int64)
+    try:
+        # One C-level parse for the common case; anything unusual takes the slow path
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return np.array([t or "" for t in timestamps], dtype="datetime64[us]").view(np.int64)
+    except Exception:
+        pass
+
+    epochs = np.full(len(timestamps), NAT, dtype=np.int64)
+    for i, timestamp in enumerate(timestamps):
+        try:
+            dt = datetime.fromisoformat(timestamp)
+        except:
+            continue
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        epochs[i] = np.datetime64(dt, "us").view(np.int64)
+    return epochs
+
+
+class StateSequence:
+    def __init__(self, codes, timestamps, symbols):
+        self.codes = codes  # int8 per record
+        self.timestamps = timestamps  # Original strings, for reporting
+        self.symbols = symbols  # code -> emoji (None for NO_STATE / UNLABELED)
+        self._epochs = None
+
+    @classmethod
+    def from_states(cls, states, timestamps):
+        """states: per record, an emoji, None (state dict without one) or False (no state dict)"""
+        symbols = [None, None] + list(STATES)
+        code_of = {emoji: code for code, emoji in enumerate(symbols) if emoji}
+        codes = np.empty(len(states), dtype=np.int8)
+        for i, emoji in enumerate(states):
+            if emoji is False:
+                codes[i] = NO_STATE
+            elif not emoji:
+                codes[i] = UNLABELED
+            else:
+                code = code_of.get(emoji)
+                if code is None:
+                    # Emoji we don't know about - still its own state
+                    code = code_of[emoji] = len(symbols)
+                    symbols.append(emoji)
+                codes[i] = code
+        return cls(codes, list(timestamps), symbols)
+
+    @classmethod
+    def from_conversations(cls, conversations):
+        states, timestamps = [], []
+        for conv in conversations:
+            state = conv.get("state", {})
+            states.append(state.get("emoji") if isinstance(state, dict) else False)
+            timestamps.append(conv.get("timestamp", ""))
+        return cls.from_states(states, timestamps)
+
+    @classmethod
+    def from_records(cls, records):
+        """From auto_pattern_extractor.Record objects"""
+        return cls.from_states(
+            [r.emoji if r.has_state else False for r in records],
+            [r.timestamp for r in records]
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code(self, emoji):
+        try:
+            return self.symbols.index(emoji, 2)
+        except ValueError:
+            return -1  # Not in this sequence - matches nothing
+
+    @property
+    def epochs(self):
+        if self._epochs is None:
+            self._epochs = parse_epochs(self.timestamps)
+        return self._epochs
+
+    # === PRIMITIVES ===
+    @staticmethod
+    def run_lengths(values):
+        """Run-length encode an array -> (run values, start positions, lengths)"""
+        n = len(values)
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return values[:0], empty, empty
+        starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+        lengths = np.diff(np.append(starts, n))
+        return values[starts], starts, lengths
+
+    def _ordered_counter(self, keys):
+        """Counter over int keys with first-occurrence order (what a Python loop would produce)"""
+        if len(keys) == 0:
+            return Counter()
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return Counter({int(unique[i]): int(counts[i]) for i in order})
+
+    # === ANALYTICS ===
+    def transitions(self):
+        """Counter of (from emoji, to emoji) over adjacent labeled records that differ"""
+        c = self.codes
+        if len(c) < 2:
+            return Counter()
+        prev, curr = c[:-1], c[1:]
+        mask = (prev > UNLABELED) & (curr > UNLABELED) & (prev != curr)
+        width = len(self.symbols)
+        pairs = prev[mask].astype(np.int64) * width + curr[mask]
+        return Counter({
+            (self.symbols[key // width], self.symbols[key % width]): n
+            for key, n in self._ordered_counter(pairs).items()
+        })
+
+    def transition_matrix(self):
+        """len(symbols) x len(symbols) count matrix of the same transitions"""
+        width = len(self.symbols)
+        matrix = np.zeros((width, width), dtype=np.int64)
+        c = self.codes
+        if len(c) >= 2:
+            prev, curr = c[:-1], c[1:]
+            mask = (prev > UNLABELED) & (curr > UNLABELED) & (prev != curr)
+            np.add.at(matrix, (prev[mask], curr[mask]), 1)
+        return matrix
+
+    def state_runs(self, emoji, min_length=1):
+        """
+        Runs of one state over records that carry a state dict (others are skipped).
+        Returns [(first index, last index, length, closed)] in record order;
+        closed is False for a run still open at the end of the sequence.
+        """
+        positions = np.flatnonzero(self.codes != NO_STATE)
+        values, starts, lengths = self.run_lengths(self.codes[positions])
+        keep = np.flatnonzero((values == self.code(emoji)) & (lengths >= min_length))
+        total = len(positions)
+        return [
+            (int(positions[starts[i]]), int(positions[starts[i] + lengths[i] - 1]),
+             int(lengths[i]), bool(starts[i] + lengths[i] < total))
+            for i in keep
+        ]
+
+    def adjacent_pairs(self):
+        """Indices i >= 1 where records i-1 and i both carry a state dict"""
+        c = self.codes
+        if len(c) < 2:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero((c[:-1] != NO_STATE) & (c[1:] != NO_STATE)) + 1
+
+    def changes(self):
+        """Indices i where the state differs from record i-1 (both with state dicts)"""
+        i = self.adjacent_pairs()
+        return i[self.codes[i - 1] != self.codes[i]]
+
+    def shifts(self, from_emoji, to_emojis):
+        """Indices i where record i-1 is from_emoji and record i is one of to_emojis"""
+        i = self.adjacent_pairs()
+        targets = [self.code(e) for e in to_emojis]
+        return i[(self.codes[i - 1] == self.code(from_emoji)) & np.isin(self.codes[i], targets)]
+
+    def _labeled_order(self):
+        """Indices of labeled records with valid timestamps, in time order"""
+        epochs = self.epochs
+        mask = np.flatnonzero((self.codes > UNLABELED) & (epochs != NAT))
+        return mask[np.argsort(epochs[mask], kind="stable")]
+
+    def labeled_bounds(self):
+        """[(emoji, epoch), (emoji, epoch)] for the earliest and latest labeled record, or None"""
+        order = self._labeled_order()
+        if len(order) == 0:
+            return None
+        return [(self.symbols[self.codes[i]], int(self.epochs[i])) for i in (order[0], order[-1])]
+
+    def time_in_state(self):
+        """
+        (Counter of labeled records with valid timestamps, {emoji: hours}).
+        Records are ordered by time; each gap is credited to the earlier state.
+        """
+        order = self._labeled_order()
+        if len(order) == 0:
+            return Counter(), {}
+        epochs = self.epochs
+        codes = self.codes[order]
+
+        counts = Counter({self.symbols[code]: n for code, n in self._ordered_counter(codes).items()})
+        hours = np.bincount(codes[:-1], weights=np.diff(epochs[order]) / 3.6e9, minlength=len(self.symbols))
+        time_in_state = {self.symbols[code]: float(hours[code]) for code in np.unique(codes[:-1])}
+        return counts, time_in_state
@@ -0,0 +1,99 @@
+"""Incremental pattern extraction compared with a full pass over the same store"""
+
+import random
+from datetime import datetime, timedelta
+from auto_pattern_extractor import PatternExtractor
+from memory_store import get_memory_store
+
+STATES = [("🌀", "spiral"), ("⚡", "flow"), ("🪞", "reflection"), ("🧠", "thinking")]
+WORDS = "i always stuck again loop why flowing clicking because never works realize".split()
+
+
+def add_messages(store, rng, start, count):
+    """count user messages seven minutes apart, about half of them labeled"""
+    entries = []
+    for i in range(count):
+        entry = {
+            "role": "user",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(2, 8))),
+            "timestamp": (start + timedelta(minutes=7 * i)).isoformat()
+        }
+        if rng.random() < 0.5:
+            emoji, name = rng.choice(STATES)
+            entry["state"] = {"emoji": emoji, "name": name, "confidence": 0.9}
+        entries.append(entry)
+    store.add_many(entries)
+
+
+def analysis(extractor, rebuild=False):
+    """(messages counted, report analysis) - from the saved aggregates unless rebuild"""
+    aggregates, _ = extractor.update_aggregates(rebuild=rebuild, save=not rebuild)
+    return aggregates.total, extractor.report_from_aggregates(aggregates)["analysis"]
+
+
+def test_relabeling_folded_rows_triggers_rebuild(tmp_path):
+    rng = random.Random(0)
+    store = get_memory_store(str(tmp_path))
+    extractor = PatternExtractor(str(tmp_path))
+
+    add_messages(store, rng, datetime(2025, 1, 1), 200)
+    assert analysis(extractor) == analysis(extractor, rebuild=True)
+
+    # batch_classify.py labels rows the first run already counted as unlabeled
+    updates = []
+    for row_id, _, _ in store.unlabeled(limit=1000):
+        emoji, name = rng.choice(STATES)
+        updates.append((row_id, {"emoji": emoji, "name": name, "confidence": 0.8}))
+    store.update_states(updates)
+    add_messages(store, rng, datetime(2025, 1, 4), 50)
+
+    assert analysis(extractor) == analysis(extractor, rebuild=True)
+
+
+def test_relabeling_new_rows_stays_incremental(tmp_path):
+    rng = random.Random(1)
+    store = get_memory_store(str(tmp_path))
+    extractor = PatternExtractor(str(tmp_path))
+
+    add_messages(store, rng, datetime(2025, 1, 1), 100)
+    extractor.update_aggregates()
+    generation = store.get_meta("pattern_generation", 0)
+
+    # Rows added after the last run are labeled before any run reads them
+    last_seen = store.last_row_id()
+    add_messages(store, rng, datetime(2025, 1, 2), 50)
+    store.update_states([
+        (row_id, {"emoji": "⚡", "name": "flow", "confidence": 0.8})
+        for row_id, _, _ in store.unlabeled(after_id=last_seen)
+    ])
+
+    assert store.get_meta("pattern_generation", 0) == generation
+    _, new_messages = extractor.update_aggregates()
+    assert new_messages == 50
+
+
+def test_imports_without_timestamps_stay_out_of_sequences(tmp_path):
+    store = get_memory_store(str(tmp_path))
+    flow = {"emoji": "⚡", "name": "flow", "confidence": 0.9}
+    spiral = {"emoji": "🌀", "name": "spiral", "confidence": 0.9}
+    store.add_many([
+        {"role": "user", "content": f"working on it {i}", "timestamp": f"2025-01-01T10:{i:02d}:00", "state": flow}
+        for i in range(6)
+    ])
+    # Labeled WhatsApp import - no timestamps, so its row order says nothing about time
+    store.add_many([
+        {"role": "user", "content": f"why again {i}", "timestamp": "", "source_ref": f"whatsapp:{i}", "state": spiral}
+        for i in range(6)
+    ], source="whatsapp")
+    store.add_many([
+        {"role": "user", "content": f"still going {i}", "timestamp": f"2025-01-01T11:{i:02d}:00", "state": flow}
+        for i in range(6)
+    ])
+
+    total, result = analysis(PatternExtractor(str(tmp_path)))
+
+    assert total == 18
+    assert result["state_transitions"]["total"] == 0
+    assert result["loops_detected"]["total"] == 0
+    assert set(result["time_patterns"]) == {"⚡"}
+    assert "🌀" in result["language_fingerprints"]
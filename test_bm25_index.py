@@ -0,0 +1,82 @@
+"""BM25 index and retriever: pruned search, postings upkeep, saved index"""
+
+import itertools
+import math
+import random
+from bm25_index import BM25Index, MemoryRetriever, tokenize
+from memory_store import get_memory_store
+
+VOCAB = [f"w{r}" for r in range(2000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (r + 1) ** 1.05 for r in range(len(VOCAB))))
+
+
+def zipf_text(rng, low=1, high=40):
+    return " ".join(rng.choices(VOCAB, cum_weights=CUM_WEIGHTS, k=rng.randint(low, high)))
+
+
+def full_scores(index, query, k):
+    """Top-k scores the slow way, every document scored - what top() must agree with"""
+    n = len(index.doc_lengths)
+    avg_length = index.total_length / n
+    k1, b = index.k1, index.b
+    scores = []
+    for doc_id, frequencies in index.doc_terms.items():
+        norm = k1 * (1 - b + b * index.doc_lengths[doc_id] / avg_length)
+        score = sum(
+            index.idf(term) * frequencies[term] * (k1 + 1) / (frequencies[term] + norm)
+            for term in set(tokenize(query)) if term in frequencies
+        )
+        if score > 0:
+            scores.append(score)
+    return sorted(scores, reverse=True)[:k]
+
+
+def test_top_matches_full_scoring():
+    rng = random.Random(0)
+    index = BM25Index()
+    for doc_id in range(3000):
+        index.add(doc_id, zipf_text(rng))
+    for doc_id in rng.sample(range(3000), 300):  # Exercise removal too
+        index.remove(doc_id)
+
+    for _ in range(300):
+        query = zipf_text(rng, 1, 6)
+        k = rng.choice([1, 5, 10])
+        scores = [score for score, _ in index.top(query, k)]
+        expected = full_scores(index, query, k)
+        assert len(scores) == len(expected), query
+        assert all(math.isclose(a, b, rel_tol=1e-9) for a, b in zip(scores, expected)), query
+
+
+def test_replacing_a_document_updates_postings():
+    index = BM25Index()
+    index.add(1, "stuck again stuck")
+    index.add(2, "flowing today")
+    index.add(1, "flowing")
+
+    assert index.df == {"flowing": 2, "today": 1}
+    assert "stuck" not in index.postings
+    assert [doc_id for _, doc_id in index.top("flowing", 5)] == [1, 2]
+
+
+def test_retriever_reloads_saved_index(tmp_path):
+    rng = random.Random(1)
+    data_dir = str(tmp_path)
+    store = get_memory_store(data_dir)
+    store.add_many([
+        {"role": "user", "content": zipf_text(rng), "timestamp": f"2025-01-01T10:{i // 60:02d}:{i % 60:02d}"}
+        for i in range(500)
+    ])
+
+    built = MemoryRetriever(store, data_dir)
+    assert built.ready.wait(10)
+    ranking = built.index.top("w3 w40 w700", 5)
+
+    loaded = MemoryRetriever(store, data_dir)
+    assert loaded.ready.wait(10)
+    assert len(loaded.index) == len(built.index)
+    assert loaded.index.top("w3 w40 w700", 5) == ranking
+
+    # Rows added after the save are caught up on the next search
+    store.add_many([{"role": "user", "content": "zebra crossing", "timestamp": "2025-01-02T09:00:00"}])
+    assert loaded.search("zebra")[0]["content"] == "zebra crossing"
@@ -0,0 +1,50 @@
+"""Memory loader: refreshes publish new data instead of editing what sessions hold"""
+
+import json
+import os
+from conversation_log import get_conversation_log
+from memory_loader import MemoryLoader
+
+
+def message(i):
+    return {"role": "user", "content": f"message {i}", "timestamp": f"2025-03-01T09:{i // 60:02d}:{i % 60:02d}"}
+
+
+def test_refresh_leaves_held_memory_untouched(tmp_path):
+    data_dir = str(tmp_path)
+    log = get_conversation_log(data_dir)
+    for i in range(5):
+        log.append(message(i))
+
+    loader = MemoryLoader(data_dir)
+    held = loader.refresh()
+    assert loader.refresh() is held  # Nothing new on disk
+
+    log.append(message(5))
+    fresh = loader.refresh()
+
+    assert fresh is not held
+    assert len(held["conversations"]) == len(held["time_index"]) == 5
+    assert len(fresh["conversations"]) == len(fresh["time_index"]) == 6
+    assert fresh["time_index"].range()[-1]["content"] == "message 5"
+
+
+def test_retention_trims_the_new_copy(tmp_path):
+    data_dir = str(tmp_path)
+    log = get_conversation_log(data_dir)
+    log.retention = 4
+    os.makedirs(os.path.join(data_dir, "journal"))
+    with open(os.path.join(data_dir, "journal", "day.json"), "w") as f:
+        json.dump([{"role": "user", "content": "journal", "timestamp": "2025-02-01T08:00:00"}], f)
+    for i in range(4):
+        log.append(message(i))
+
+    loader = MemoryLoader(data_dir)
+    held = loader.refresh()
+    for i in range(4, 7):
+        log.append(message(i))
+    fresh = loader.refresh()
+
+    assert [c["content"] for c in held["conversations"]] == ["journal"] + [f"message {i}" for i in range(4)]
+    assert [c["content"] for c in fresh["conversations"]] == ["journal"] + [f"message {i}" for i in range(3, 7)]
+    assert fresh["time_index"].range() == fresh["conversations"]
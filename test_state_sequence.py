@@ -0,0 +1,86 @@
+"""StateSequence analytics checked against plain loops over the same messages"""
+
+import random
+from collections import Counter
+from state_sequence import StateSequence
+from weekly_report import WeeklyReportGenerator
+
+EMOJIS = ["🌀", "⚡", "🪞", "🧠", "🦄"]  # 🦄 isn't in STATES
+
+
+def messages(seed, count=400):
+    """User messages in every state shape the history has, with assistant replies in between"""
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(count):
+        roll = rng.random()
+        timestamp = f"2025-01-01T{i // 60 % 24:02d}:{i % 60:02d}:00"
+        conv = {"role": "user", "content": "clicking because always stuck again", "timestamp": timestamp}
+        if roll < 0.2:
+            conv = {"role": "assistant", "content": "tell me more", "timestamp": timestamp}
+        elif roll < 0.25:
+            conv["state"] = {"name": "unlabeled"}
+        elif roll < 0.28:
+            conv["state"] = "🌀"  # Bare emoji from old journal entries - not a state dict
+        elif roll < 0.3:
+            conv["timestamp"] = "not a date"
+            conv["state"] = {"emoji": rng.choice(EMOJIS)}
+        else:
+            conv["state"] = {"emoji": rng.choice(EMOJIS), "name": "x"}
+        conversations.append(conv)
+    return conversations
+
+
+def state_of(conv):
+    state = conv.get("state", {})
+    return state.get("emoji") if isinstance(state, dict) else False
+
+
+def test_transitions_and_runs_match_loops():
+    for seed in range(20):
+        conversations = messages(seed)
+        sequence = StateSequence.from_conversations(conversations)
+        states = [state_of(conv) for conv in conversations]
+
+        expected = Counter(
+            (a, b) for a, b in zip(states, states[1:]) if a and b and a != b
+        )
+        assert sequence.transitions() == expected
+
+        runs, current = [], []
+        for i, emoji in enumerate(states):
+            if emoji is False:
+                continue
+            if emoji == "🌀":
+                current.append(i)
+            elif current:
+                runs.append((current[0], current[-1], len(current), True))
+                current = []
+        if current:
+            runs.append((current[0], current[-1], len(current), False))
+        assert sequence.state_runs("🌀") == runs
+
+
+def test_changes_and_shifts_skip_messages_without_a_state_dict():
+    conversations = messages(7)
+    sequence = StateSequence.from_conversations(conversations)
+    states = [state_of(conv) for conv in conversations]
+
+    pairs = [i for i in range(1, len(states)) if states[i - 1] is not False and states[i] is not False]
+    assert sequence.changes().tolist() == [i for i in pairs if states[i - 1] != states[i]]
+    assert sequence.shifts("🌀", ["⚡", "🪞"]).tolist() == [
+        i for i in pairs if states[i - 1] == "🌀" and states[i] in ("⚡", "🪞")
+    ]
+
+
+def test_triggers_over_assistant_replies():
+    conversations = [
+        {"role": "user", "content": "stuck stuck again", "state": {"emoji": "🌀"}, "timestamp": "2025-01-01T10:00:00"},
+        {"role": "assistant", "content": "what happened right before", "timestamp": "2025-01-01T10:00:05"},
+        {"role": "user", "content": "clicking finally", "state": {"emoji": "⚡"}, "timestamp": "2025-01-01T10:05:00"}
+    ]
+    # The reply changes unlabeled -> labeled too; it counts under no state, as it did before sequences
+    assert WeeklyReportGenerator().get_top_triggers(conversations) == {
+        None: ["happened", "right", "before"],
+        "⚡": ["clicking", "finally"]
+    }
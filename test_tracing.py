@@ -0,0 +1,38 @@
+"""Turn tracing: stages recorded from another thread after the turn was saved"""
+
+import threading
+from tracing import Tracer
+from voice_handler import NullBackend, VoiceHandler
+
+
+def test_late_first_audio_amends_the_saved_turn(tmp_path):
+    tracer = Tracer(str(tmp_path))
+    turn = tracer.begin_turn("voice")
+    with tracer.span("ollama.voice_follow_up"):
+        pass
+    tracer.end_turn()
+
+    recorder = threading.Thread(target=tracer.record, args=("tts.first_audio", 850.0), kwargs={"turn": turn})
+    recorder.start()
+    recorder.join()
+
+    assert tracer.stage_stats()["tts.first_audio"]["p50"] == 850.0
+    reloaded = Tracer(str(tmp_path))
+    assert len(reloaded.turns) == 1
+    assert [span["name"] for span in reloaded.turns[0]["spans"]] == ["ollama.voice_follow_up", "tts.first_audio"]
+
+
+def test_speak_stream_reports_first_audio_after_the_stream(tmp_path):
+    tracer = Tracer(str(tmp_path))
+    handler = VoiceHandler(NullBackend(seconds_per_word=0.05))
+    handler.speak("still talking from the last turn")  # Holds the new reply back past the stream
+
+    turn = tracer.begin_turn("voice")
+    list(handler.speak_stream(["Right. ", "Go on."],
+                              on_first_audio=lambda ms: tracer.record("tts.first_audio", ms, turn=turn)))
+    tracer.end_turn()
+    assert "tts.first_audio" not in tracer.stage_stats()
+
+    assert handler.wait(5)
+    assert tracer.stage_stats()["tts.first_audio"]["count"] == 1
+    assert "tts.first_audio" in [span["name"] for span in Tracer(str(tmp_path)).turns[0]["spans"]]
@@ -0,0 +1,87 @@
+"""Vector index search checked against brute-force cosine similarity in NumPy"""
+
+import random
+import numpy as np
+from memory_store import MemoryStore
+from vector_index import SemanticRecall, VectorIndex
+
+TOPICS = [
+    "work deadline boss meeting email",
+    "sleep tired night insomnia dream",
+    "gym run workout legs breath",
+    "code bug python deploy test",
+    "family dinner mom call weekend",
+    "money rent budget savings bills",
+]
+
+
+def sentences(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = rng.choice(TOPICS).split() + rng.choice(TOPICS).split()[:2]
+        texts.append(" ".join(rng.sample(words, rng.randint(3, len(words)))))
+    return texts
+
+
+def exact_top(index, texts, query, k):
+    matrix = index.embedder.embed_many(texts)
+    scores = matrix @ index.embedder.embed(query)
+    return sorted(scores[scores > 0], reverse=True)[:k]
+
+
+def test_brute_force_search_matches_numpy(tmp_path):
+    texts = sentences(3000)
+    index = VectorIndex(str(tmp_path), ivf_threshold=10 ** 9)
+    index.add_many(list(range(1, len(texts) + 1)), texts)
+
+    for query in ["deadline at work", "could not sleep", "python test failed", "rent is due"]:
+        found = [score for _, score in index.search(query, k=10)]
+        assert np.allclose(found, exact_top(index, texts, query, 10), atol=1e-5)
+
+
+def test_ivf_search(tmp_path):
+    texts = sentences(3000, seed=1)
+    index = VectorIndex(str(tmp_path), ivf_threshold=1000, n_lists=16, nprobe=16)
+    index.add_many(list(range(1, len(texts) + 1)), texts)
+    assert index.centroids is not None
+
+    # Probing every list is exact
+    for query in ["deadline at work", "family dinner", "legs after the run"]:
+        found = [score for _, score in index.search(query, k=10)]
+        assert np.allclose(found, exact_top(index, texts, query, 10), atol=1e-5)
+
+    # Default probing finds most of the true neighbours
+    index.nprobe = 4
+    hits = total = 0
+    for query in ["deadline at work", "family dinner", "legs after the run", "budget for bills"]:
+        best = exact_top(index, texts, query, 10)
+        found = [score for _, score in index.search(query, k=10)]
+        hits += sum(1 for score in found if score >= best[-1] - 1e-6)
+        total += len(best)
+    assert hits >= 0.8 * total
+
+
+def test_reopened_index_keeps_vectors(tmp_path):
+    texts = sentences(500, seed=2)
+    index = VectorIndex(str(tmp_path))
+    index.add_many(list(range(1, len(texts) + 1)), texts)
+    index.delete(3)
+    index.flush()
+
+    reopened = VectorIndex(str(tmp_path))
+    assert len(reopened) == len(texts) - 1
+    assert reopened.search("work meeting", k=5) == index.search("work meeting", k=5)
+
+
+def test_recall_searches_once_ready(tmp_path):
+    store = MemoryStore(str(tmp_path))
+    store.add_many([
+        {"role": "user", "content": text, "timestamp": f"2025-01-01T10:00:{i:02d}"}
+        for i, text in enumerate(["stuck on the python bug again", "slept badly, long night"])
+    ])
+    recall = SemanticRecall(store, str(tmp_path))
+    try:
+        assert recall.search("bug in my code", k=1, wait=10)[0]["content"] == "stuck on the python bug again"
+    finally:
+        store.close()
@@ -0,0 +1,133 @@
+"""Voice handler: the TTS worker queue, streamed replies and the audio cache"""
+
+import os
+import threading
+import time
+from audio_cache import AudioCache
+from voice_handler import NullBackend, VoiceHandler
+
+
+class RenderingBackend:
+    """Renders fixed-size files slowly; play blocks until released"""
+
+    name = "fake"
+    cache_key = "fake"
+    can_render = True
+
+    def __init__(self, render_seconds=0.0):
+        self.render_seconds = render_seconds
+        self.release = threading.Event()
+        self.release.set()
+        self.played = []  # (text, path, file existed when playback started)
+
+    def render(self, text, path):
+        time.sleep(self.render_seconds)
+        with open(path, "wb") as f:
+            f.write(b"\0" * 1000)
+        return True
+
+    def play(self, text, cancelled, path=None, on_start=None):
+        self.played.append((text, path, bool(path) and os.path.exists(path)))
+        if on_start:
+            on_start()
+        self.release.wait()
+        return True
+
+
+def test_speak_returns_while_the_line_plays():
+    backend = NullBackend(seconds_per_word=0.1)
+    handler = VoiceHandler(backend)
+
+    started = time.perf_counter()
+    assert handler.speak("five words take half a second")
+    assert time.perf_counter() - started < 0.1
+    assert handler.speaking
+
+    assert handler.speak("and then this one", blocking=True)
+    assert backend.spoken == ["five words take half a second", "and then this one"]
+    assert not handler.speaking
+
+
+def test_cancel_silences_the_line_and_the_queue():
+    backend = NullBackend(seconds_per_word=0.5)
+    handler = VoiceHandler(backend)
+    handler.speak("a long line that will be cut off")
+    handler.speak("queued behind it")
+    deadline = time.monotonic() + 5
+    while handler.current is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    handler.barge_in("sorry, go on")
+    assert handler.wait(5)
+
+    assert backend.spoken == ["sorry, go on"]
+
+
+def test_first_audio_includes_render_time(tmp_path):
+    backend = RenderingBackend(render_seconds=0.2)
+    handler = VoiceHandler(backend, cache=AudioCache(str(tmp_path)))
+
+    list(handler.speak_stream(["Hello there. "]))
+    assert handler.wait(5)
+
+    turn = handler.turns[-1]
+    assert turn["first_audio_ms"] >= 200
+    assert turn["first_audio_ms"] >= turn["first_chunk_ms"]
+
+
+def test_null_backend_skips_the_cache(tmp_path):
+    handler = VoiceHandler(NullBackend(), cache=AudioCache(str(tmp_path)))
+
+    assert handler.cache is None
+    assert handler.speak("nothing to render", blocking=True)
+    assert not os.path.exists(os.path.join(str(tmp_path), "audio_cache"))
+
+
+def test_eviction_keeps_queued_and_playing_files(tmp_path):
+    backend = RenderingBackend()
+    cache = AudioCache(str(tmp_path), max_bytes=2500)  # Room for two files
+    handler = VoiceHandler(backend, cache=cache)
+
+    handler.warm("the next line")  # Rendered ahead, least recently used from here on
+    backend.release.clear()
+    handler.speak("playing now")
+    handler.speak("the next line")
+    deadline = time.monotonic() + 5
+    while not backend.played and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Other renders push the cache over its cap while both lines are held
+    handler.warm("something else")
+    handler.warm("and another")
+    assert os.path.exists(cache.path(cache.key("the next line", backend)))
+
+    backend.release.set()
+    assert handler.wait(5)
+    assert [(text, existed) for text, _, existed in backend.played] == [("playing now", True), ("the next line", True)]
+    assert not cache.in_use
+
+
+def test_long_streamed_reply_is_spoken_in_full():
+    backend = NullBackend(seconds_per_word=0.01)
+    handler = VoiceHandler(backend, max_queue=3)
+    clauses = [f"Clause number {i} of the answer." for i in range(20)]
+
+    list(handler.speak_stream(clause + " " for clause in clauses))
+    assert handler.wait(10)
+
+    assert backend.spoken == clauses
+    assert handler.dropped == 0
+
+
+def test_backlog_drops_lines_from_earlier_turns():
+    backend = NullBackend(seconds_per_word=0.05)
+    handler = VoiceHandler(backend, max_queue=2)
+    for i in range(4):
+        handler.speak(f"old line {i}")
+
+    list(handler.speak_stream(["First clause. ", "Second clause. ", "Third clause."]))
+    assert handler.wait(10)
+
+    assert backend.spoken[-3:] == ["First clause.", "Second clause.", "Third clause."]
+    assert handler.dropped >= 2
+    assert len(backend.spoken) == 3 + 4 - handler.dropped
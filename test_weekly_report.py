@@ -0,0 +1,155 @@
+"""Daily rollups against the full-scan weekly report they replaced"""
+
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from memory_store import get_memory_store
+from weekly_report import DailyRollups, WeeklyReportGenerator
+
+SPIRAL_HEAVY = ["🧠", "🌀", "⚡", "🪞", "📘", "😤", "🎯"] + ["🌀"] * 4
+WORDS = "i always stuck again loop why flowing clicking because never that. the works yes boom realize".split()
+
+
+# How weekly_report.py computed each section before rollups, straight over the period's messages
+
+def scan_state_distribution(conversations):
+    state_counts = Counter()
+    total_time = defaultdict(float)
+    last_time = None
+    last_state = None
+    for conv in sorted(conversations, key=lambda x: x.get("timestamp", "")):
+        state = conv.get("state", {})
+        timestamp = conv.get("timestamp", "")
+        if not isinstance(state, dict) or not timestamp or not state.get("emoji"):
+            continue
+        dt = datetime.fromisoformat(timestamp)
+        if last_state and last_time:
+            total_time[last_state] += (dt - last_time).total_seconds() / 3600
+        state_counts[state["emoji"]] += 1
+        last_state = state["emoji"]
+        last_time = dt
+    return state_counts, total_time
+
+
+def scan_loops(conversations):
+    loops, current = [], []
+    for conv in conversations:
+        state = conv.get("state", {})
+        if not isinstance(state, dict):
+            continue
+        if state.get("emoji") == "🌀":
+            current.append(conv)
+            continue
+        if len(current) >= 3:
+            loops.append({
+                "duration": len(current),
+                "start": current[0].get("timestamp", ""),
+                "end": current[-1].get("timestamp", ""),
+                "trigger": current[0].get("content", "")[:100]
+            })
+        current = []
+    return loops
+
+
+def scan_breakthroughs(conversations):
+    breakthroughs = []
+    for curr, next_conv in zip(conversations, conversations[1:]):
+        curr_state, next_state = curr.get("state", {}), next_conv.get("state", {})
+        if not isinstance(curr_state, dict) or not isinstance(next_state, dict):
+            continue
+        if curr_state.get("emoji") == "🌀" and next_state.get("emoji") in ["⚡", "🪞"]:
+            breakthroughs.append({
+                "timestamp": next_conv.get("timestamp", ""),
+                "from": "spiral",
+                "to": next_state.get("name", ""),
+                "trigger": next_conv.get("content", "")[:150]
+            })
+    return breakthroughs
+
+
+def scan_top_triggers(conversations):
+    triggers = defaultdict(list)
+    for prev, curr in zip(conversations, conversations[1:]):
+        prev_state, curr_state = prev.get("state", {}), curr.get("state", {})
+        if not isinstance(prev_state, dict) or not isinstance(curr_state, dict):
+            continue
+        if prev_state.get("emoji") != curr_state.get("emoji"):
+            words = [w for w in curr.get("content", "").lower().split() if len(w) > 4]
+            if words:
+                triggers[curr_state.get("emoji")].extend(words[:3])
+    return {state: [w for w, c in Counter(words).most_common(3)] for state, words in triggers.items()}
+
+
+def ten_days_of_chat(rng, start):
+    """User messages (a few unlabeled), most followed by an assistant reply that has no state"""
+    conversations = []
+    for minute in sorted(rng.sample(range(60 * 24 * 10), rng.randint(0, 120))):
+        when = start + timedelta(minutes=minute)
+        if rng.random() < 0.1:
+            state = {"name": "unlabeled"}
+        else:
+            state = {"emoji": rng.choice(SPIRAL_HEAVY), "name": "state"}
+        conversations.append({
+            "role": "user",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(0, 8))),
+            "state": state,
+            "timestamp": when.isoformat()
+        })
+        if rng.random() < 0.8:
+            conversations.append({
+                "role": "assistant",
+                "content": " ".join(rng.choices(WORDS, k=rng.randint(1, 8))),
+                "timestamp": (when + timedelta(seconds=5)).isoformat()
+            })
+    return conversations
+
+
+def test_rollups_match_full_scan_with_assistant_replies(tmp_path):
+    data_dir = str(tmp_path)
+    store = get_memory_store(data_dir)
+    rollups = DailyRollups(data_dir)
+
+    # One store for every history - each gets its own stretch of the calendar
+    for n in range(80):
+        rng = random.Random(n)
+        start = datetime(2025, 1, 1) + timedelta(days=20 * n)
+        conversations = ten_days_of_chat(rng, start)
+
+        # Two waves, so days get rolled up again as messages land in them
+        half = len(conversations) // 2
+        store.add_many(conversations[:half])
+        rollups.refresh()
+        store.add_many(conversations[half:])
+        rollups.refresh()
+
+        first_day = start.date() + timedelta(days=rng.randint(0, 3))
+        last_day = start.date() + timedelta(days=9)
+        scanned = store.conversations_between(
+            datetime.combine(first_day, datetime.min.time()),
+            datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+        )
+        summary = rollups.summarize(first_day, last_day)
+
+        state_counts, time_in_state = scan_state_distribution(scanned)
+        assert summary["total"] == len(scanned), n
+        assert list(summary["state_counts"].items()) == list(state_counts.items()), n
+        assert set(summary["time_in_state"]) == set(time_in_state), n
+        for emoji, hours in time_in_state.items():
+            assert abs(summary["time_in_state"][emoji] - hours) < 1e-6, n
+        assert summary["loops"] == scan_loops(scanned), n
+        assert summary["breakthroughs"] == scan_breakthroughs(scanned), n
+        assert WeeklyReportGenerator.top_triggers(summary["triggers"]) == scan_top_triggers(scanned), n
+
+
+def test_refresh_advances_past_assistant_replies(tmp_path):
+    data_dir = str(tmp_path)
+    store = get_memory_store(data_dir)
+    rollups = DailyRollups(data_dir)
+    store.add_many([
+        {"role": "user", "content": "stuck in the same loop again", "state": {"emoji": "🌀", "name": "spiral"},
+         "timestamp": "2025-01-01T10:00:00"},
+        {"role": "assistant", "content": "what changed since yesterday", "timestamp": "2025-01-01T10:00:05"}
+    ])
+
+    assert rollups.refresh() == 1
+    assert store.get_meta("rollup_last_id", 0) > 0
@@ -0,0 +1,98 @@
+"""
+Time Index
+Records kept in timestamp order next to a sorted list of epoch offsets.
+range(start, end) bisects straight to the window and returns that slice,
+so records outside it are never looked at. Timestamps are parsed once,
+when a record is added.
+"""
+
+import bisect
+from datetime import date, datetime, timezone
+from state_sequence import NAT, parse_epochs
+
+
+def to_epoch(value):
+    """datetime, date or ISO string -> int64 microseconds (the same scale as parse_epochs)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(parse_epochs([value.isoformat()])[0])
+
+
+class TimeIndex:
+    def __init__(self, records=()):
+        self.epochs = []  # Sorted
+        self.records = []  # Same order as epochs
+        self.add_many(records)
+
+    def rebuild(self, records):
+        self.epochs = []
+        self.records = []
+        self.add_many(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def copy(self):
+        """Independent index over the same records - change it while others read this one"""
+        index = TimeIndex()
+        index.epochs = list(self.epochs)
+        index.records = list(self.records)
+        return index
+
+    def add_many(self, records):
+        """Index records with a valid timestamp; anything else is skipped"""
+        records = [r for r in records if isinstance(r, dict)]
+        epochs = parse_epochs([r.get("timestamp", "") for r in records]).tolist()
+        pairs = [(epoch, record) for epoch, record in zip(epochs, records) if epoch != NAT]
+        if not pairs:
+            return
+
+        in_order = all(pairs[i][0] <= pairs[i + 1][0] for i in range(len(pairs) - 1))
+        if in_order and (not self.epochs or pairs[0][0] >= self.epochs[-1]):
+            # New messages arrive in order - the common case is an append
+            self.epochs.extend(epoch for epoch, _ in pairs)
+            self.records.extend(record for _, record in pairs)
+        elif len(pairs) < 32:
+            for epoch, record in pairs:
+                i = bisect.bisect_right(self.epochs, epoch)
+                self.epochs.insert(i, epoch)
+                self.records.insert(i, record)
+        else:
+            # Stable sort keeps earlier-indexed records first among equal timestamps
+            merged = sorted(list(zip(self.epochs, self.records)) + pairs, key=lambda pair: pair[0])
+            self.epochs = [epoch for epoch, _ in merged]
+            self.records = [record for _, record in merged]
+
+    def remove(self, records):
+        """Drop specific record objects (e.g. trimmed by retention)"""
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            epoch = int(parse_epochs([record.get("timestamp", "")])[0])
+            if epoch == NAT:
+                continue
+            i = bisect.bisect_left(self.epochs, epoch)
+            while i < len(self.epochs) and self.epochs[i] == epoch:
+                if self.records[i] is record:
+                    del self.epochs[i]
+                    del self.records[i]
+                    break
+                i += 1
+
+    def _bounds(self, start=None, end=None):
+        lo = 0 if start is None else bisect.bisect_left(self.epochs, to_epoch(start))
+        hi = len(self.epochs) if end is None else bisect.bisect_left(self.epochs, to_epoch(end))
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        """Records with start <= timestamp < end, oldest first"""
+        lo, hi = self._bounds(start, end)
+        return self.records[lo:hi]
+
+    def count(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return hi - lo
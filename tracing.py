@@ -0,0 +1,221 @@
+"""
+Turn Tracing
+Per-stage latency for chat turns: nested spans timed with perf_counter,
+one JSON line per turn in a rolling my_data/traces.jsonl, and p50/p95/p99
+per stage over the last N turns.
+Disabled (or outside a turn), span() hands back a shared no-op object.
+A stage measured on another thread after its turn was written (first audio)
+is appended as an amend line and folded back into that turn on load.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    __slots__ = ("turn", "name", "parent", "started")
+
+    def __init__(self, turn, name):
+        self.turn = turn
+        self.name = name
+
+    def __enter__(self):
+        stack = self.turn["stack"]
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.started) * 1000
+        self.turn["stack"].pop()
+        self.turn["spans"].append({"name": self.name, "parent": self.parent, "ms": round(ms, 2)})
+        return False
+
+
+class Tracer:
+    def __init__(self, data_dir="my_data", enabled=True, max_turns=500):
+        self.path = os.path.join(data_dir, "traces.jsonl")
+        self.enabled = enabled
+        self.max_turns = max_turns  # File is compacted back to this many turns at 2x
+        self.turns = deque(maxlen=max_turns)
+        self._local = threading.local()  # Active turn per script thread (one per session run)
+        self._lock = threading.Lock()
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "amends" in entry:
+                        self._amend(entry)
+                    else:
+                        self.turns.append(entry)
+        except OSError as e:
+            print(f"Trace load failed: {e}")
+
+    # === RECORDING ===
+    def begin_turn(self, kind="chat"):
+        """Start a turn on this thread (replaces one that never ended)"""
+        if not self.enabled:
+            self._local.turn = None
+            return None
+        self._local.turn = {
+            "kind": kind,
+            "timestamp": datetime.now().isoformat(),
+            "started": time.perf_counter(),
+            "stack": [],
+            "spans": []
+        }
+        return self._local.turn
+
+    def span(self, name):
+        """Context manager timing one stage of the current turn"""
+        turn = getattr(self._local, "turn", None) if self.enabled else None
+        if turn is None:
+            return NO_SPAN
+        return Span(turn, name)
+
+    def record(self, name, ms, turn=None):
+        """
+        Add a stage measured elsewhere. From another thread (e.g. first audio
+        on the TTS thread) pass the turn begin_turn() returned; if that turn
+        has already been written, the stage is added to it after the fact.
+        """
+        if turn is None:
+            turn = getattr(self._local, "turn", None) if self.enabled else None
+            parent = turn["stack"][-1] if turn and turn["stack"] else None
+        else:
+            parent = None  # The owning thread's open spans aren't this one's parents
+        if turn is None or ms is None:
+            return
+        span = {"name": name, "parent": parent, "ms": round(ms, 2)}
+        with self._lock:
+            turn["spans"].append(span)  # Shared with the saved entry, if there is one
+            entry = turn.get("entry")
+            if entry is not None:
+                self._write({"amends": entry["timestamp"], "spans": [span]})
+
+    def end_turn(self):
+        """Close the current turn and append it to the rolling file"""
+        turn = getattr(self._local, "turn", None)
+        self._local.turn = None
+        if turn is None:
+            return None
+
+        entry = {
+            "kind": turn["kind"],
+            "timestamp": turn["timestamp"],
+            "total_ms": round((time.perf_counter() - turn["started"]) * 1000, 2),
+            "spans": turn["spans"]
+        }
+        with self._lock:
+            turn["entry"] = entry  # Late records amend it
+            self.turns.append(entry)
+            self._write(entry)
+        return entry
+
+    def _write(self, line):
+        """Append one line to the rolling file (caller holds the lock)"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            self._lines += 1
+            if self._lines > 2 * self.max_turns:
+                self._compact()
+        except OSError as e:
+            print(f"Trace write failed: {e}")
+
+    def _amend(self, line):
+        """Fold an amend line into the turn it belongs to (if still in the window)"""
+        for entry in reversed(self.turns):
+            if entry.get("timestamp") == line["amends"]:
+                entry["spans"].extend(line.get("spans", []))
+                return
+
+    def _compact(self):
+        """Rewrite the file with only the turns still in the window"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for entry in self.turns:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self._lines = len(self.turns)
+
+    # === STATS ===
+    def stage_stats(self, last=50):
+        """{stage: {"count", "p50", "p95", "p99"}} in ms over the last N turns (a stage's spans summed per turn)"""
+        samples = {}
+        for entry in list(self.turns)[-last:]:
+            per_turn = {"turn": entry.get("total_ms", 0)}
+            for span in entry.get("spans", []):
+                per_turn[span["name"]] = per_turn.get(span["name"], 0) + span["ms"]
+            for name, ms in per_turn.items():
+                samples.setdefault(name, []).append(ms)
+
+        stats = {}
+        for name, values in samples.items():
+            values.sort()
+
+            def pct(p):
+                return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 1)
+
+            stats[name] = {"count": len(values), "p50": pct(50), "p95": pct(95), "p99": pct(99)}
+        return stats
+
+
+# Global tracer instances - one per data directory, shared by every session
+_tracers = {}
+_tracers_lock = threading.Lock()
+
+
+def get_tracer(data_dir="my_data"):
+    """Get or create the process-wide tracer"""
+    with _tracers_lock:
+        tracer = _tracers.get(data_dir)
+        if tracer is None:
+            tracer = Tracer(data_dir)
+            _tracers[data_dir] = tracer
+        return tracer
+
+
+def trace(name, data_dir="my_data"):
+    """with trace("stage"): ... - shorthand for get_tracer().span(name)"""
+    tracer = _tracers.get(data_dir) or get_tracer(data_dir)  # No lock once it exists
+    return tracer.span(name)
+
+
+def traced(name):
+    """Decorator: time every call of a function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
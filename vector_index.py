@@ -0,0 +1,320 @@
+"""
+Vector Memory Index
+Offline semantic recall - no network, no GPU.
+Memories are embedded with a feature-hashing embedder, stored in a
+memory-mapped float32 matrix and searched with batched NumPy dot products.
+An optional IVF coarse quantizer keeps search cheap on large histories.
+SemanticRecall opens the index and catches up on the store on a background
+thread (training the quantizer there too), so no chat turn embeds history.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+import numpy as np
+from bm25_index import tokenize
+
+
+class HashingEmbedder:
+    """Signed feature hashing over words and word bigrams, L2-normalized"""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        counts = {}
+        for feature in self._features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+
+        for feature, count in counts.items():
+            # crc32 is stable across processes, unlike hash()
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dim] += sign * (1.0 + np.log(count))
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed_many(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.embed(text) for text in texts])
+
+
+class VectorIndex:
+    def __init__(self, data_dir="my_data", dim=256, ivf_threshold=50000, n_lists=None, nprobe=8):
+        self.dir = os.path.join(data_dir, "vectors")
+        os.makedirs(self.dir, exist_ok=True)
+        self.embedder = HashingEmbedder(dim)
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold  # Train the coarse quantizer past this many vectors
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+
+        self.meta_path = os.path.join(self.dir, "index.json")
+        self.meta = {"dim": dim, "count": 0, "capacity": 0, "last_id": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta.update(json.load(f))
+            if self.meta["dim"] != dim:
+                raise ValueError(f"Index was built with dim={self.meta['dim']}, not {dim}")
+
+        self.centroids = None
+        centroid_path = os.path.join(self.dir, "centroids.npy")
+        if os.path.exists(centroid_path):
+            self.centroids = np.load(centroid_path)
+
+        self._open(max(self.meta["capacity"], 1024))
+        self.row_of = {int(doc_id): row for row, doc_id in enumerate(self.ids[:self.meta["count"]])}
+
+    # === STORAGE ===
+    def _map(self, name, dtype, shape):
+        path = os.path.join(self.dir, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open(self, capacity):
+        self.vectors = self._map("vectors.f32", np.float32, (capacity, self.dim))
+        self.ids = self._map("ids.i64", np.int64, (capacity,))
+        self.alive = self._map("alive.u8", np.uint8, (capacity,))
+        self.lists = self._map("lists.i32", np.int32, (capacity,))
+        self.meta["capacity"] = capacity
+
+    def _grow(self, needed):
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.flush()
+        del self.vectors, self.ids, self.alive, self.lists
+        self._open(capacity)
+
+    def flush(self):
+        for array in (self.vectors, self.ids, self.alive, self.lists):
+            array.flush()
+        with open(self.meta_path, "w") as f:
+            json.dump(self.meta, f)
+
+    def __len__(self):
+        return int(self.alive[:self.meta["count"]].sum())
+
+    # === UPDATES ===
+    def add_many(self, doc_ids, texts, train=True):
+        """Embed and append documents; re-adding an id replaces its old vector.
+        train=False leaves training the quantizer (see needs_training) to the caller"""
+        if not doc_ids:
+            return
+        embeddings = self.embedder.embed_many(texts)
+
+        with self._lock:
+            for doc_id in doc_ids:
+                self.delete(doc_id)
+
+            start = self.meta["count"]
+            end = start + len(doc_ids)
+            self._grow(end)
+
+            self.vectors[start:end] = embeddings
+            self.ids[start:end] = doc_ids
+            self.alive[start:end] = 1
+            if self.centroids is not None:
+                self.lists[start:end] = self._assign(embeddings)
+
+            for offset, doc_id in enumerate(doc_ids):
+                self.row_of[int(doc_id)] = start + offset
+            self.meta["count"] = end
+
+            if train and self.needs_training:
+                self.train_ivf()
+
+    def add(self, doc_id, text):
+        self.add_many([doc_id], [text])
+
+    def delete(self, doc_id):
+        with self._lock:
+            row = self.row_of.pop(int(doc_id), None)
+            if row is not None:
+                self.alive[row] = 0
+
+    # === COARSE QUANTIZER ===
+    @property
+    def needs_training(self):
+        return self.centroids is None and len(self) >= self.ivf_threshold
+
+    def _assign(self, embeddings):
+        return np.argmax(embeddings @ self.centroids.T, axis=1).astype(np.int32)
+
+    def train_ivf(self, iterations=10, sample_size=20000, seed=0):
+        """Spherical k-means over a sample, then assign every vector to a list"""
+        with self._lock:
+            count = self.meta["count"]
+            rows = np.flatnonzero(self.alive[:count])
+            if len(rows) == 0:
+                return
+
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(rows))))
+            rng = np.random.default_rng(seed)
+            sample = self.vectors[rng.choice(rows, min(sample_size, len(rows)), replace=False)]
+            centroids = sample[rng.choice(len(sample), min(n_lists, len(sample)), replace=False)].copy()
+
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[assignment == c]
+                    if len(members):
+                        mean = members.sum(axis=0)
+                        norm = np.linalg.norm(mean)
+                        centroids[c] = mean / norm if norm > 0 else mean
+
+            self.centroids = centroids.astype(np.float32)
+            np.save(os.path.join(self.dir, "centroids.npy"), self.centroids)
+
+            batch = 65536
+            for start in range(0, count, batch):
+                end = min(start + batch, count)
+                self.lists[start:end] = self._assign(self.vectors[start:end])
+            self.flush()
+
+    # === SEARCH ===
+    def search(self, text, k=5, batch=65536):
+        """Return the top-k (doc_id, cosine similarity) pairs"""
+        query = self.embedder.embed(text)
+        if not query.any():
+            return []
+
+        with self._lock:
+            count = self.meta["count"]
+            if count == 0:
+                return []
+
+            if self.centroids is not None:
+                probe = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+                candidates = np.flatnonzero(np.isin(self.lists[:count], probe) & (self.alive[:count] == 1))
+                scores = self.vectors[candidates] @ query if len(candidates) else np.zeros(0, np.float32)
+            else:
+                # Brute force in batches so we never materialize more than one block
+                candidates = np.arange(count)
+                scores = np.empty(count, dtype=np.float32)
+                for start in range(0, count, batch):
+                    end = min(start + batch, count)
+                    scores[start:end] = self.vectors[start:end] @ query
+                scores[self.alive[:count] == 0] = -np.inf
+
+            if len(scores) == 0:
+                return []
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (int(self.ids[candidates[i]]), float(scores[i]))
+                for i in top if np.isfinite(scores[i]) and scores[i] > 0
+            ]
+
+
+class SemanticRecall:
+    """
+    Keeps a VectorIndex in sync with the memory store and resolves hits to records.
+    search() returns [] while the index is opening/catching up or the
+    quantizer is training - both happen on a background thread.
+    """
+
+    def __init__(self, store, data_dir="my_data"):
+        self.store = store
+        self.data_dir = data_dir
+        self.index = None
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+        self.thread = threading.Thread(target=self._build, name="vector-build", daemon=True)
+        self.thread.start()
+
+    def _build(self):
+        """Open the index and embed every row stored since it was last flushed"""
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                self.index = VectorIndex(self.data_dir)
+                added = self._sync(train=True)
+            print(f"🧭 Vector index ready: {len(self.index)} memories (+{added}) "
+                  f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"Vector index build failed: {e}")
+        finally:
+            self.ready.set()
+
+    def _train(self):
+        try:
+            with self._lock:
+                self.index.train_ivf()
+        except Exception as e:
+            print(f"Vector quantizer training failed: {e}")
+        finally:
+            self.ready.set()
+
+    def _sync(self, train=False):
+        """Embed store rows written since the last sync. Returns how many were embedded"""
+        doc_ids, texts = [], []
+        last_id = self.index.meta["last_id"]
+        for row_id, record in self.store.iter_conversations(after_id=last_id):
+            content = record.get("content", "")
+            if isinstance(content, str) and content:
+                doc_ids.append(row_id)
+                texts.append(content)
+            last_id = row_id
+
+        if last_id != self.index.meta["last_id"]:
+            self.index.add_many(doc_ids, texts, train=train)
+            self.index.meta["last_id"] = last_id
+            self.index.flush()
+        return len(doc_ids)
+
+    def _train_later(self):
+        """Crossed the IVF threshold - k-means runs on its own thread, searches skip the index meanwhile"""
+        if self.index.needs_training and self.ready.is_set():
+            self.ready.clear()
+            threading.Thread(target=self._train, name="vector-train", daemon=True).start()
+
+    def sync(self):
+        with self._lock:
+            if self.index is not None:
+                self._sync()
+                self._train_later()
+
+    def search(self, text, k=3, wait=0):
+        """Top-k similar records, or [] if the index isn't ready after wait seconds"""
+        if not self.ready.wait(wait):
+            return []
+        with self._lock:
+            if self.index is None:
+                return []
+            self._sync()
+            hits = self.index.search(text, k)
+            self._train_later()
+        records = self.store.get_many([doc_id for doc_id, _ in hits])
+        return [records[doc_id] for doc_id, _ in hits if doc_id in records]
+
+
+# Global recall instances, one per data directory
+_recalls = {}
+_recalls_lock = threading.Lock()
+
+
+def get_semantic_recall(store, data_dir="my_data"):
+    """Get or create the semantic recall singleton - opens and catches up in the background"""
+    with _recalls_lock:
+        recall = _recalls.get(data_dir)
+        if recall is None:
+            recall = SemanticRecall(store, data_dir)
+            _recalls[data_dir] = recall
+        return recall
@@ -1,28 +1,52 @@
 """
 Voice Conversation Handler
 Uses LLM to generate contextual, natural follow-up questions
+While a reply is being spoken, follow-ups for the likeliest next intents
+(VoicePrompts.FOLLOW_UPS categories) are prepared in the background, so a
+matching next message is answered without waiting on the LLM.
 """
 
-import requests
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from ollama_client import get_ollama_client, DEFAULT_URL, DEFAULT_MODEL
+from voice_prompts import VoicePrompts
+
+# One background lane for speculative LLM calls, shared by every session
+_speculation_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="voice-speculation")
 
 class VoiceConversationHandler:
-    def __init__(self, ollama_url="http://localhost:11434/api/chat", model="qwen2.5:7b"):
-        self.ollama_url = ollama_url
+    # Slightly higher temperature for variety, short responses only
+    FOLLOW_UP_OPTIONS = {"temperature": 0.8, "num_predict": 100}
+    
+    # Fixed lines - pre-rendered into the audio cache
+    OPENINGS = [
+        "What's on your mind?",
+        "How's your day going?",
+        "What's happening?",
+        "Tell me about today?"
+    ]
+    FALLBACKS = [
+        "Tell me more?",
+        "And then?",
+        "Why?",
+        "How did that feel?",
+        "What happened next?",
+        "Anything else?"
+    ]
+    
+    def __init__(self, ollama_url=DEFAULT_URL, model=DEFAULT_MODEL, max_speculations=2):
+        self.client = get_ollama_client(ollama_url)  # Pooled, shared with the chat path
         self.model = model
         self.conversation_count = 0
         self.asked_questions = []
+        self.max_speculations = max_speculations  # Intents prepared per turn
+        self.speculations = {}  # category -> future of (question, seconds to generate)
+        self.speculation_metrics = {"speculated": 0, "hits": 0, "misses": 0, "wasted": 0, "saved_seconds": 0.0}
     
-    def generate_follow_up(self, user_message, recent_context=None):
-        """
-        Generate a short, contextual follow-up question
-        
-        Args:
-            user_message: What the user just said
-            recent_context: List of recent exchanges for context
-        """
-        self.conversation_count += 1
-        
+    def _follow_up_messages(self, user_message, recent_context=None):
+        """Chat messages asking for a short, contextual voice reply"""
         # Build fuller context
         recent_exchanges = ""
         if recent_context and len(recent_context) > 0:
@@ -54,74 +78,187 @@ Style: Direct, no BS, curious, slightly intense. Like talking to a smarter versi
 
 Your response:"""
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def _clean_question(self, question, track=True):
+        # Clean up - remove quotes, extra punctuation
+        question = question.strip().strip('"\'')
+        
+        # Ensure it ends with ?
+        if not question.endswith('?'):
+            question += '?'
+        
+        # Track this question
+        if track:
+            self.asked_questions.append(question.lower())
+        return question
+    
+    def generate_follow_up(self, user_message, recent_context=None):
+        """
+        Generate a short, contextual follow-up question
+        
+        Args:
+            user_message: What the user just said
+            recent_context: List of recent exchanges for context
+        """
+        self.conversation_count += 1
+        
         try:
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.8,  # Slightly higher for variety
-                        "num_predict": 100    # Short responses only
-                    }
-                },
+            question = self.client.chat(
+                self._follow_up_messages(user_message, recent_context),
+                model=self.model,
+                options=self.FOLLOW_UP_OPTIONS,
                 timeout=10
             )
-            
-            if response.status_code == 200:
-                question = response.json()["message"]["content"].strip()
-                
-                # Clean up - remove quotes, extra punctuation
-                question = question.strip('"\'')
-                
-                # Ensure it ends with ?
-                if not question.endswith('?'):
-                    question += '?'
-                
-                # Track this question
-                self.asked_questions.append(question.lower())
-                
-                return question
-            else:
-                # Fallback
-                return self._get_fallback_question()
+            return self._clean_question(question)
                 
         except Exception as e:
             print(f"Voice follow-up generation error: {e}")
             return self._get_fallback_question()
     
+    def stream_follow_up(self, user_message, recent_context=None):
+        """
+        Same reply as generate_follow_up, yielded token by token as Ollama
+        produces it (so speech can start on the first clause).
+        Falls back to a canned question if nothing arrives.
+        """
+        self.conversation_count += 1
+        
+        text = ""
+        try:
+            for piece in self.client.stream_chat(
+                self._follow_up_messages(user_message, recent_context),
+                model=self.model,
+                options=self.FOLLOW_UP_OPTIONS,
+                timeout=10
+            ):
+                text += piece
+                yield piece
+        except Exception as e:
+            print(f"Voice follow-up generation error: {e}")
+        
+        if text.strip():
+            self._clean_question(text)
+        else:
+            yield self._get_fallback_question()
+    
     def _get_fallback_question(self):
         """Simple fallback questions if LLM fails"""
-        fallbacks = [
-            "Tell me more?",
-            "And then?",
-            "Why?",
-            "How did that feel?",
-            "What happened next?",
-            "Anything else?"
-        ]
-        
         # Rotate through fallbacks
-        idx = self.conversation_count % len(fallbacks)
-        return fallbacks[idx]
+        idx = self.conversation_count % len(self.FALLBACKS)
+        return self.FALLBACKS[idx]
+    
+    # === SPECULATION ===
+    def speculate(self, recent_context, warm=None):
+        """
+        Start preparing follow-ups for the likeliest next intents while the
+        current reply plays. warm(question) is called on each one when ready
+        (e.g. to pre-render its audio).
+        """
+        self._discard_speculations()
+        context = [msg for msg in (recent_context or []) if isinstance(msg, dict)][-6:]
+        for category in self._likely_intents(context):
+            self.speculations[category] = _speculation_pool.submit(self._speculate_one, category, context, warm)
+            self.speculation_metrics["speculated"] += 1
+    
+    def _likely_intents(self, context):
+        """Intents seen most in the user's recent messages, topped up in FOLLOW_UPS order"""
+        seen = Counter(
+            VoicePrompts.classify(msg.get("content", ""))
+            for msg in context if msg.get("role") == "user"
+        )
+        ranked = [category for category, _ in seen.most_common()]
+        ranked += [category for category in VoicePrompts.FOLLOW_UPS if category not in ranked]
+        return ranked[:self.max_speculations]
+    
+    def _speculate_one(self, category, context, warm):
+        started = time.perf_counter()
+        recent_exchanges = "\n".join(
+            f"{'You' if msg.get('role') == 'assistant' else 'AK'}: {msg.get('content', '')}"
+            for msg in context
+        )
+        system_prompt = f"""You are Second Brain - AK's digital consciousness. You're having a voice conversation with him.
+
+RECENT CONVERSATION:
+{recent_exchanges if recent_exchanges else 'Just starting'}
+
+His next message {VoicePrompts.INTENTS[category]}.
+Write the ONE short follow-up question (under 15 words) you would ask back.
+It has to fit whatever exactly he says, so build on the conversation, not on details you can't know.
+Examples of the kind of question: {' / '.join(VoicePrompts.FOLLOW_UPS[category][:3])}
+
+Style: Direct, no BS, curious, slightly intense.
+
+Your question:"""
+        question = self.client.chat(
+            [{"role": "system", "content": system_prompt}],
+            model=self.model,
+            options=self.FOLLOW_UP_OPTIONS,
+            timeout=10
+        )
+        question = self._clean_question(question, track=False)
+        if warm:
+            try:
+                warm(question)
+            except Exception as e:
+                print(f"Voice speculation warm-up error: {e}")
+        return question, time.perf_counter() - started
+    
+    def take_speculation(self, user_message, wait=0.5):
+        """
+        The prepared follow-up for user_message's intent, or None (generate live).
+        Waits up to `wait` seconds for one that is almost done.
+        """
+        future = self.speculations.pop(VoicePrompts.classify(user_message), None)
+        self._discard_speculations()
+        if future is None:
+            self.speculation_metrics["misses"] += 1
+            return None
+        
+        waited = time.perf_counter()
+        try:
+            question, seconds = future.result(timeout=wait)
+        except Exception:
+            self.speculation_metrics["misses"] += 1
+            return None
+        waited = time.perf_counter() - waited
+        
+        self.speculation_metrics["hits"] += 1
+        self.speculation_metrics["saved_seconds"] += max(0.0, seconds - waited)
+        self.conversation_count += 1
+        self.asked_questions.append(question.lower())
+        return question
+    
+    def _discard_speculations(self):
+        """Drop speculations for a turn that has passed (not-yet-started ones never run)"""
+        for future in self.speculations.values():
+            future.cancel()
+            self.speculation_metrics["wasted"] += 1
+        self.speculations = {}
+    
+    def speculation_stats(self):
+        metrics = self.speculation_metrics
+        attempts = metrics["hits"] + metrics["misses"]
+        return {
+            "speculated": metrics["speculated"],
+            "hits": metrics["hits"],
+            "misses": metrics["misses"],
+            "wasted": metrics["wasted"],
+            "hit_rate": metrics["hits"] / attempts if attempts else 0.0,
+            "latency_saved_ms": round(metrics["saved_seconds"] * 1000, 1),
+            "avg_saved_ms": round(metrics["saved_seconds"] * 1000 / metrics["hits"], 1) if metrics["hits"] else 0.0
+        }
     
     def get_opening_prompt(self):
         """Get an opening question to start the conversation"""
-        openings = [
-            "What's on your mind?",
-            "How's your day going?",
-            "What's happening?",
-            "Tell me about today?"
-        ]
-        
-        idx = self.conversation_count % len(openings)
-        return openings[idx]
+        idx = self.conversation_count % len(self.OPENINGS)
+        return self.OPENINGS[idx]
     
     def reset(self):
         """Reset conversation state"""
         self.conversation_count = 0
-        self.asked_questions = []
\ No newline at end of file
+        self.asked_questions = []
+        self._discard_speculations()
\ No newline at end of file
@@ -1,83 +1,398 @@
 """
 Voice Handler for Second Brain
-Handles text-to-speech output
+Handles text-to-speech output on a worker thread.
+speak() queues an utterance and returns, so the UI can rerun while it plays.
+When it backs up past max_queue, the oldest lines left over from earlier
+turns are dropped (never clauses of the reply being streamed); cancel() silences
+everything and barge_in() cuts the current line off for a new one.
+Backends: macOS say, espeak-ng/espeak on Linux, or a null backend for tests.
+speak_stream() speaks streamed LLM text clause by clause as it arrives and
+records time-to-first-audio per turn.
+With an AudioCache, lines are rendered to WAV once and played from disk.
 """
 
-import pyttsx3
+import os
+import queue
+import re
+import shutil
+import subprocess
 import threading
+import time
+from collections import deque
+from audio_cache import AudioCache
+
+
+# === BACKENDS ===
+def run_until_cancelled(command, cancelled, on_start=None):
+    """Run a command to completion. Returns True on success, False if cancelled or failed"""
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        print(f"[TTS] Error: {e}")
+        return False
+    if on_start:
+        on_start()
+
+    while process.poll() is None:
+        if cancelled.wait(0.05):
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            return False
+    return process.returncode == 0
+
+
+class CommandBackend:
+    """Speaks by running a TTS command; cancelling terminates the process"""
+
+    def __init__(self, name, command, render_command=None, player=None, voice=None, rate=175):
+        self.name = name
+        self.command = command  # argv prefix, the text is appended
+        self.render_command = render_command  # argv with {path}, the text is appended
+        self.player = player  # argv prefix that plays a WAV file
+        self.voice = voice
+        self.rate = rate
+
+    @property
+    def cache_key(self):
+        return f"{self.name}|{self.voice}|{self.rate}"
+
+    @property
+    def can_render(self):
+        return bool(self.render_command and self.player)
+
+    def play(self, text, cancelled, path=None, on_start=None):
+        """Speak text (or play its pre-rendered WAV). Returns True if it finished.
+        on_start is called once the speech/player process is running"""
+        if path:
+            return run_until_cancelled(self.player + [path], cancelled, on_start)
+        return run_until_cancelled(self.command + [text], cancelled, on_start)
+
+    def render(self, text, path):
+        """Synthesize text into a WAV file"""
+        command = [arg.replace("{path}", path) for arg in self.render_command] + [text]
+        return run_until_cancelled(command, threading.Event()) and os.path.exists(path)
+
+
+class NullBackend:
+    """No audio - records what would have been said (tests, headless servers)"""
+
+    name = "null"
+    cache_key = "null"
+    can_render = False  # Nothing to synthesize - caching silence would only fill the disk
+
+    def __init__(self, seconds_per_word=0.0):
+        self.seconds_per_word = seconds_per_word  # Simulated speaking time
+        self.spoken = []
+
+    def play(self, text, cancelled, path=None, on_start=None):
+        if on_start:
+            on_start()
+        duration = self.seconds_per_word * len(text.split())
+        if duration and cancelled.wait(duration):
+            return False
+        self.spoken.append(text)
+        return True
+
+
+def detect_backend(name=None, rate=175):
+    """say on macOS, espeak-ng/espeak on Linux, otherwise null. name forces one"""
+    if name == "null":
+        return NullBackend()
+
+    wav_player = next(([p] for p in ("aplay", "paplay", "afplay") if shutil.which(p)), None)
+    candidates = {
+        "say": (["say", "-r", str(rate)],
+                ["say", "-r", str(rate), "--data-format=LEI16@22050", "-o", "{path}"],
+                ["afplay"]),
+        "espeak-ng": (["espeak-ng", "-s", str(rate)], ["espeak-ng", "-s", str(rate), "-w", "{path}"], wav_player),
+        "espeak": (["espeak", "-s", str(rate)], ["espeak", "-s", str(rate), "-w", "{path}"], wav_player)
+    }
+    for candidate, (command, render_command, player) in candidates.items():
+        if name not in (None, candidate):
+            continue
+        if shutil.which(command[0]):
+            return CommandBackend(candidate, command, render_command, player, rate=rate)
+    print(f"[TTS] No speech command found{f' for {name}' if name else ''} - voice output disabled")
+    return NullBackend()
+
+
+# === CHUNKING ===
+class SentenceChunker:
+    """
+    Cuts streamed text into speakable pieces: at sentence ends always, at
+    clause punctuation once the piece is long enough to sound natural, and
+    at a word boundary if no punctuation turns up for max_chars.
+    """
+
+    SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s')
+    CLAUSE_END = re.compile(r'[,;:—–]\s')
+
+    def __init__(self, min_clause=24, max_chars=160):
+        self.min_clause = min_clause
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, piece):
+        """Add streamed text; returns the chunks it completed"""
+        self.buffer += piece
+        chunks = []
+        while True:
+            cut = self._cut()
+            if cut is None:
+                return chunks
+            chunk, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:]
+            if chunk:
+                chunks.append(chunk)
+
+    def flush(self):
+        """Whatever is left once the stream ends"""
+        chunk, self.buffer = self.buffer.strip(), ""
+        return chunk
+
+    def _cut(self):
+        sentence = self.SENTENCE_END.search(self.buffer)
+        if sentence:
+            return sentence.end()
+        for clause in self.CLAUSE_END.finditer(self.buffer):
+            if clause.end() >= self.min_clause:
+                return clause.end()
+        if len(self.buffer) > self.max_chars:
+            space = self.buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+
+# === WORKER ===
+class Utterance:
+    __slots__ = ("text", "generation", "done", "completed", "turn", "key")
+
+    def __init__(self, text, generation, turn=None, key=None):
+        self.text = text
+        self.generation = generation
+        self.done = threading.Event()
+        self.completed = False
+        self.turn = turn  # Per-turn latency record when part of a stream
+        self.key = key  # Audio cache entry held (kept from eviction) until it's done
+
 
 class VoiceHandler:
-    def __init__(self):
-        self.engine = None
-        self.initialize_engine()
-    
-    def initialize_engine(self):
-        """Initialize text-to-speech engine"""
-        try:
-            self.engine = pyttsx3.init()
-            
-            # Configure voice properties
-            self.engine.setProperty('rate', 175)  # Speed (words per minute)
-            self.engine.setProperty('volume', 0.9)  # Volume (0-1)
-            
-            # Try to set a good voice
-            voices = self.engine.getProperty('voices')
-            # Prefer male voice if available
-            for voice in voices:
-                if 'male' in voice.name.lower() and 'female' not in voice.name.lower():
-                    self.engine.setProperty('voice', voice.id)
-                    break
-        except Exception as e:
-            print(f"TTS initialization error: {e}")
-            self.engine = None
-    
-    def speak(self, text, blocking=True):
-        """Convert text to speech using macOS say command"""
-        import subprocess
-        print(f"[TTS] Speaking: {text}")
-        
-        try:
-            # Use macOS built-in say command (more reliable)
-            subprocess.run(['say', text], check=True)
-            print(f"[TTS] Done")
-            return True
-        except Exception as e:
-            print(f"[TTS] Error: {e}")
+    def __init__(self, backend=None, max_queue=8, cache=None):
+        self.backend = backend or detect_backend()
+        self.cache = cache if cache and self.backend.can_render else None
+        self.queue = queue.Queue()
+        self.max_queue = max_queue
+        self.pending = deque()  # Queued utterances not yet picked up, oldest first
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by cancel() - older utterances are skipped
+        self._cancelled = threading.Event()  # Set to stop the line being spoken
+        self.current = None
+        self.dropped = 0
+        self._prerender_thread = None
+        self.turns = deque(maxlen=50)  # Latency records of recent streamed turns
+
+        self.thread = threading.Thread(target=self._run, name="tts", daemon=True)
+        self.thread.start()
+
+    def speak(self, text, blocking=False, turn=None):
+        """
+        Queue text to be spoken. Returns True once queued, or with blocking=True
+        waits and returns whether it was spoken to the end.
+        """
+        text = (text or "").strip()
+        if not text:
             return False
-        
-        try:
-            # Reinitialize engine each time (pyttsx3 can get stuck)
-            self.initialize_engine()
-            
-            print(f"[TTS] Speaking now...")
-            self.engine.say(text)
-            self.engine.runAndWait()
-            print(f"[TTS] Done speaking")
+        print(f"[TTS] Speaking: {text}")
+
+        with self._lock:
+            key = self.cache.hold(text, self.backend) if self.cache is not None else None
+            utterance = Utterance(text, self._generation, turn, key)
+            if len(self.pending) >= self.max_queue:
+                # Falling behind - drop the oldest line from an earlier turn. Clauses of
+                # the reply being streamed always stay, or it would skip mid-answer
+                stale = next((u for u in self.pending if u.turn is None or u.turn is not turn), None)
+                if stale is not None:
+                    self.pending.remove(stale)
+                    self._finish(stale)  # The worker skips it when it comes up
+                    self.dropped += 1
+            self.pending.append(utterance)
+            self.queue.put(utterance)
+
+        if not blocking:
             return True
-        except Exception as e:
-            print(f"[TTS] Error: {e}")
+        utterance.done.wait()
+        return utterance.completed
+
+    def cancel(self):
+        """Stop the current line and drop everything queued"""
+        with self._lock:
+            self._generation += 1
+            self._cancelled.set()
+            self.pending.clear()
+            while True:
+                try:
+                    self._finish(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                self.queue.task_done()
+
+    def _finish(self, utterance):
+        """Played, dropped or cancelled - wake any waiter and let its cache entry go (once)"""
+        if utterance.done.is_set():
+            return
+        if utterance.key is not None:
+            self.cache.release(utterance.key)
+        utterance.done.set()
+
+    def _play(self, text, on_start=None):
+        """From the audio cache when possible (rendering misses into it), else live"""
+        path = None
+        if self.cache is not None:
+            try:
+                path = self.cache.render(text, self.backend)
+            except Exception as e:
+                print(f"[TTS] Cache error: {e}")
+        if self._cancelled.is_set():
             return False
-    
-    def _speak_thread(self, text):
-        """Thread function for non-blocking speech (not used anymore)"""
+        return self.backend.play(text, self._cancelled, path=path, on_start=on_start)
+
+    @staticmethod
+    def _first_audio(turn):
+        """Playback started - the first time in a streamed turn is its time to first audio"""
+        if turn is not None and turn["first_audio_ms"] is None:
+            turn["first_audio_ms"] = (time.perf_counter() - turn["started"]) * 1000
+            print(f"[TTS] First audio after {turn['first_audio_ms']:.0f} ms")
+            if turn["on_first_audio"]:
+                try:
+                    turn["on_first_audio"](turn["first_audio_ms"])
+                except Exception as e:
+                    print(f"[TTS] First audio callback failed: {e}")
+
+    def warm(self, text):
+        """Render text into the cache ahead of time (e.g. a likely next reply)"""
+        if self.cache is not None and text:
+            self.cache.render(text, self.backend)
+
+    def prerender(self, phrases):
+        """Render fixed phrases into the cache on a background thread (once per handler)"""
+        if self.cache is None or self._prerender_thread is not None:
+            return
+        self._prerender_thread = threading.Thread(
+            target=self._prerender, args=(list(phrases),), name="tts-prerender", daemon=True
+        )
+        self._prerender_thread.start()
+
+    def _prerender(self, phrases):
         try:
-            self.engine.say(text)
-            self.engine.runAndWait()
+            rendered = self.cache.prerender(phrases, self.backend)
+            print(f"[TTS] Pre-rendered {rendered} phrases ({len(phrases)} fixed)")
         except Exception as e:
-            print(f"TTS thread error: {e}")
+            print(f"[TTS] Pre-render failed: {e}")
+
+    def speak_stream(self, pieces, started=None, on_first_audio=None):
+        """
+        Pass streamed text through unchanged (e.g. into st.write_stream) while
+        queueing each completed sentence/clause for speech as soon as it closes.
+        started (perf_counter) is when the turn began - defaults to now.
+        on_first_audio(ms) is called from the TTS thread when playback starts,
+        which may be after the stream (and the caller's turn) has finished.
+        """
+        turn = {
+            "started": started or time.perf_counter(),
+            "first_chunk_ms": None,  # First speakable chunk ready
+            "first_audio_ms": None,  # Backend started speaking it
+            "chunks": 0,
+            "on_first_audio": on_first_audio
+        }
+        self.turns.append(turn)
+        chunker = SentenceChunker()
+
+        def queue_chunks(chunks):
+            for chunk in chunks:
+                if turn["first_chunk_ms"] is None:
+                    turn["first_chunk_ms"] = (time.perf_counter() - turn["started"]) * 1000
+                turn["chunks"] += 1
+                self.speak(chunk, turn=turn)
+
+        for piece in pieces:
+            queue_chunks(chunker.feed(piece))
+            yield piece
+        queue_chunks([chunker.flush()] if chunker.buffer.strip() else [])
+        turn["generated_ms"] = (time.perf_counter() - turn["started"]) * 1000
+
+    def latency_stats(self):
+        """First-audio latency over recent streamed turns (ms)"""
+        samples = sorted(t["first_audio_ms"] for t in self.turns if t["first_audio_ms"] is not None)
+        if not samples:
+            return {"turns": 0}
+        last = next(t for t in reversed(self.turns) if t["first_audio_ms"] is not None)
+        return {
+            "turns": len(samples),
+            "last_first_audio_ms": round(last["first_audio_ms"], 1),
+            "p50_first_audio_ms": round(samples[len(samples) // 2], 1),
+            "p95_first_audio_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 1)
+        }
+
+    def barge_in(self, text=None):
+        """Interrupt whatever is playing (the user started talking); optionally say text next"""
+        self.cancel()
+        if text:
+            return self.speak(text)
+        return True
+
+    @property
+    def speaking(self):
+        return self.queue.unfinished_tasks > 0  # Queued or playing
+
+    def wait(self, timeout=None):
+        """Block until the queue is drained (for scripts, not the UI)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.speaking:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self):
+        while True:
+            utterance = self.queue.get()
+            with self._lock:
+                if utterance.done.is_set() or utterance.generation != self._generation:
+                    self._finish(utterance)  # Dropped or cancelled while it waited
+                    self.queue.task_done()
+                    continue
+                self.pending.remove(utterance)
+                self._cancelled.clear()
+                self.current = utterance
+
+            try:
+                # Timed when the backend starts playing, after any render into the cache
+                utterance.completed = self._play(utterance.text, on_start=lambda: self._first_audio(utterance.turn))
+                if utterance.completed:
+                    print(f"[TTS] Done")
+            except Exception as e:
+                print(f"[TTS] Error: {e}")
+            finally:
+                self.current = None
+                self._finish(utterance)
+                self.queue.task_done()
 
 # Global voice handler instance
 _voice_handler = None
+_voice_lock = threading.Lock()
 
-def get_voice_handler():
+def get_voice_handler(data_dir="my_data"):
     """Get or create voice handler singleton"""
     global _voice_handler
-    if _voice_handler is None:
-        _voice_handler = VoiceHandler()
-    return _voice_handler
+    with _voice_lock:
+        if _voice_handler is None:
+            _voice_handler = VoiceHandler(cache=AudioCache(data_dir))
+        return _voice_handler
 
 
 def speak(text, blocking=False):
     """Convenience function to speak text"""
     handler = get_voice_handler()
-    return handler.speak(text, blocking)
\ No newline at end of file
+    return handler.speak(text, blocking)
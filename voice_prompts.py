@@ -52,6 +52,15 @@ class VoicePrompts:
         ]
     }
     
+    # What the user is doing when each category fits (for speculative follow-ups)
+    INTENTS = {
+        "explore": "keeps telling the story",
+        "feeling": "talks about how he feels",
+        "decision": "talks about a decision or something he did",
+        "why": "asks why, or says he's not sure",
+        "pattern": "mentions something that keeps happening",
+    }
+    
     # Closing prompts
     CLOSINGS = [
         "Anything else?",
@@ -60,6 +69,14 @@ class VoicePrompts:
         "More to say?",
     ]
     
+    @staticmethod
+    def all_phrases():
+        """Every fixed prompt (for pre-rendering audio)"""
+        phrases = VoicePrompts.OPENINGS + VoicePrompts.CLOSINGS
+        for prompts in VoicePrompts.FOLLOW_UPS.values():
+            phrases = phrases + prompts
+        return phrases
+    
     @staticmethod
     def get_opening():
         """Get a random opening prompt"""
@@ -74,33 +91,36 @@ class VoicePrompts:
             user_text: What the user just said
             conversation_length: How many exchanges so far
         """
-        text_lower = user_text.lower()
-        
         # After 5+ exchanges, offer to wrap up
         if conversation_length > 5:
             if random.random() < 0.3:  # 30% chance
                 return random.choice(VoicePrompts.CLOSINGS)
         
-        # Detect context and choose appropriate follow-up
+        return random.choice(VoicePrompts.FOLLOW_UPS[VoicePrompts.classify(user_text)])
+    
+    @staticmethod
+    def classify(user_text):
+        """Which FOLLOW_UPS category fits what the user said"""
+        text_lower = user_text.lower()
         
         # If they mentioned a decision/action
         if any(word in text_lower for word in ['decided', 'did', 'went', 'made', 'chose']):
-            return random.choice(VoicePrompts.FOLLOW_UPS["decision"])
+            return "decision"
         
         # If they mentioned a feeling
         if any(word in text_lower for word in ['feel', 'felt', 'emotion', 'angry', 'sad', 'happy', 'frustrated']):
-            return random.choice(VoicePrompts.FOLLOW_UPS["feeling"])
+            return "feeling"
         
         # If they asked why or expressed confusion
         if any(word in text_lower for word in ['why', 'wonder', 'confused', 'not sure', "don't know"]):
-            return random.choice(VoicePrompts.FOLLOW_UPS["why"])
+            return "why"
         
         # If they mentioned repetition/patterns
         if any(word in text_lower for word in ['again', 'always', 'never', 'keeps', 'pattern', 'loop']):
-            return random.choice(VoicePrompts.FOLLOW_UPS["pattern"])
+            return "pattern"
         
         # Default: explore more
-        return random.choice(VoicePrompts.FOLLOW_UPS["explore"])
+        return "explore"
     
     @staticmethod
     def generate_voice_response(user_text, conversation_history, is_opening=False):
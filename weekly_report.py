@@ -2,217 +2,164 @@
 Weekly Pattern Report Generator
 Automated digest of patterns, loops, triggers, breakthroughs
 Runs every Sunday or on-demand
+Built from per-day rollups, so monthly and yearly reports stay cheap.
+In the app, ReportRunner builds them in-process on a background thread.
 """
 
-import json
+import argparse
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from collections import Counter, defaultdict
+from memory_store import get_memory_store
+from state_sequence import StateSequence
+
+PERIODS = {7: "week", 30: "month", 365: "year"}
 
 class WeeklyReportGenerator:
-    def __init__(self, data_dir="my_data"):
+    def __init__(self, data_dir="my_data", rollups=None):
         self.data_dir = data_dir
-        
-    def load_conversations(self, days=7):
-        """Load conversations from last N days"""
-        cutoff = datetime.now() - timedelta(days=days)
-        conversations = []
-        
-        # Load from master file
-        master_file = os.path.join(self.data_dir, "conversations.json")
-        if os.path.exists(master_file):
-            try:
-                with open(master_file) as f:
-                    all_convos = json.load(f)
-                    for conv in all_convos:
-                        if isinstance(conv, dict):
-                            timestamp = conv.get("timestamp", "")
-                            try:
-                                dt = datetime.fromisoformat(timestamp)
-                                if dt >= cutoff:
-                                    conversations.append(conv)
-                            except:
-                                continue
-            except:
-                pass
-        
-        return conversations
+        self._rollups = rollups  # Shared DailyRollups (default: the process-wide one)
     
-    def get_state_distribution(self, conversations):
+    @property
+    def rollups(self):
+        return self._rollups or get_daily_rollups(self.data_dir)
+    
+    def get_state_distribution(self, conversations, sequence=None):
         """Calculate state distribution"""
-        state_counts = Counter()
-        total_time = defaultdict(float)
-        last_time = None
-        last_state = None
-        
-        for conv in sorted(conversations, key=lambda x: x.get("timestamp", "")):
-            state = conv.get("state", {})
-            timestamp = conv.get("timestamp", "")
-            
-            if not isinstance(state, dict) or not timestamp:
-                continue
-            
-            emoji = state.get("emoji")
-            if not emoji:
-                continue
-            
-            try:
-                dt = datetime.fromisoformat(timestamp)
-                
-                # Calculate time spent in previous state
-                if last_state and last_time:
-                    duration = (dt - last_time).total_seconds() / 3600  # hours
-                    total_time[last_state] += duration
-                
-                state_counts[emoji] += 1
-                last_state = emoji
-                last_time = dt
-            except:
-                continue
+        if sequence is None:
+            sequence = StateSequence.from_conversations(conversations)
         
-        return state_counts, total_time
+        # Time spent in a state runs until the next labeled message (hours)
+        state_counts, time_in_state = sequence.time_in_state()
+        return state_counts, defaultdict(float, time_in_state)
     
-    def detect_loops(self, conversations):
+    def detect_loops(self, conversations, sequence=None):
         """Find spiral loops and stuck patterns"""
-        loops = []
-        current_loop = []
+        if sequence is None:
+            sequence = StateSequence.from_conversations(conversations)
         
-        for conv in conversations:
-            state = conv.get("state", {})
-            if not isinstance(state, dict):
-                continue
-            
-            emoji = state.get("emoji")
-            
-            # Spiral detection
-            if emoji == "🌀":
-                current_loop.append({
-                    "timestamp": conv.get("timestamp", ""),
-                    "content": conv.get("content", "")[:100]
-                })
-            else:
-                # Loop ended
-                if len(current_loop) >= 3:
-                    loops.append({
-                        "duration": len(current_loop),
-                        "start": current_loop[0]["timestamp"],
-                        "end": current_loop[-1]["timestamp"],
-                        "trigger": current_loop[0]["content"]
-                    })
-                current_loop = []
+        loops = []
+        for first, last, length, closed in sequence.state_runs("🌀", min_length=3):
+            if not closed:
+                continue  # Still spiraling - not a finished loop yet
+            loops.append({
+                "duration": length,
+                "start": conversations[first].get("timestamp", ""),
+                "end": conversations[last].get("timestamp", ""),
+                "trigger": conversations[first].get("content", "")[:100]
+            })
         
         return loops
     
-    def find_breakthroughs(self, conversations):
+    def find_breakthroughs(self, conversations, sequence=None):
         """Identify breakthrough moments (spiral → flow or reflection)"""
-        breakthroughs = []
+        if sequence is None:
+            sequence = StateSequence.from_conversations(conversations)
         
-        for i in range(len(conversations) - 1):
-            curr = conversations[i]
-            next_conv = conversations[i + 1]
-            
-            curr_state = curr.get("state", {})
-            next_state = next_conv.get("state", {})
-            
-            if not isinstance(curr_state, dict) or not isinstance(next_state, dict):
-                continue
-            
-            curr_emoji = curr_state.get("emoji")
-            next_emoji = next_state.get("emoji")
-            
-            # Breakthrough: spiral → flow/reflection
-            if curr_emoji == "🌀" and next_emoji in ["⚡", "🪞"]:
-                breakthroughs.append({
-                    "timestamp": next_conv.get("timestamp", ""),
-                    "from": "spiral",
-                    "to": next_state.get("name", ""),
-                    "trigger": next_conv.get("content", "")[:150]
-                })
+        breakthroughs = []
+        for i in sequence.shifts("🌀", ["⚡", "🪞"]):
+            next_conv = conversations[i]
+            breakthroughs.append({
+                "timestamp": next_conv.get("timestamp", ""),
+                "from": "spiral",
+                "to": next_conv["state"].get("name", ""),
+                "trigger": next_conv.get("content", "")[:150]
+            })
         
         return breakthroughs
     
-    def get_top_triggers(self, conversations):
-        """Find common triggers for different states"""
-        triggers = defaultdict(list)
-        
-        for i in range(1, len(conversations)):
-            prev = conversations[i-1]
+    @staticmethod
+    def trigger_keywords(conv):
+        """Extract keywords (simple version)"""
+        content = conv.get("content", "").lower()
+        return [w for w in content.split() if len(w) > 4][:3]
+    
+    def trigger_counts(self, conversations, sequence=None):
+        """Keyword counts per state, taken from the messages where the state changed"""
+        if sequence is None:
+            sequence = StateSequence.from_conversations(conversations)
+        triggers = defaultdict(Counter)
+        
+        # Only messages where the state changed need their text looked at
+        for i in sequence.changes():
             curr = conversations[i]
-            
-            prev_state = prev.get("state", {})
-            curr_state = curr.get("state", {})
-            
-            if not isinstance(prev_state, dict) or not isinstance(curr_state, dict):
-                continue
-            
-            prev_emoji = prev_state.get("emoji")
-            curr_emoji = curr_state.get("emoji")
-            
-            # State changed
-            if prev_emoji != curr_emoji:
-                content = curr.get("content", "").lower()
-                # Extract keywords (simple version)
-                words = [w for w in content.split() if len(w) > 4]
-                if words:
-                    triggers[curr_emoji].extend(words[:3])
+            words = self.trigger_keywords(curr)
+            if words:
+                triggers[curr.get("state", {}).get("emoji")].update(words)
         
-        # Get most common triggers per state
-        top_triggers = {}
-        for state, words in triggers.items():
-            counter = Counter(words)
-            top_triggers[state] = [w for w, c in counter.most_common(3)]
-        
-        return top_triggers
+        return triggers
+    
+    def get_top_triggers(self, conversations, sequence=None):
+        """Find common triggers for different states"""
+        return self.top_triggers(self.trigger_counts(conversations, sequence))
+    
+    @staticmethod
+    def top_triggers(triggers):
+        """Get most common triggers per state"""
+        return {state: [w for w, c in counter.most_common(3)] for state, counter in triggers.items()}
     
     def load_latest_patterns(self):
         """Load latest auto-extracted patterns"""
-        pattern_dir = os.path.join(self.data_dir, "patterns")
-        if not os.path.exists(pattern_dir):
-            return None
-        
-        pattern_files = [f for f in os.listdir(pattern_dir) if f.startswith("auto_extracted_")]
-        if not pattern_files:
-            return None
-        
-        latest = sorted(pattern_files)[-1]
-        
-        try:
-            with open(os.path.join(pattern_dir, latest)) as f:
-                return json.load(f)
-        except:
+        return get_memory_store(self.data_dir).latest_pattern_report()
+    
+    def generate_report(self, days=7, start=None, end=None):
+        """
+        Generate comprehensive weekly report (or any N-day period)
+        
+        Args:
+            days: Period length, counted back from today
+            start, end: Explicit first and last day (dates, inclusive); either one
+                        switches to a fixed range
+        """
+        self.rollups.refresh()
+        built = self.build_report(days, start, end)
+        if built is None:
             return None
+        return self.save_report(*built)
     
-    def generate_report(self, days=7):
-        """Generate comprehensive weekly report"""
+    def build_report(self, days=7, start=None, end=None, patterns=None):
+        """Markdown for a period from the (already refreshed) rollups. Returns (name, markdown) or None"""
+        if start is not None or end is not None:
+            end = end or datetime.now().date()
+            start = start or end - timedelta(days=days - 1)
+            days = (end - start).days + 1
+            period = f"{start.strftime('%B %d, %Y')} – {end.strftime('%B %d, %Y')}"
+            name = f"report_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
+        else:
+            start = (datetime.now() - timedelta(days=days)).date()
+            period = f"{datetime.now().strftime('%B %d, %Y')} (Last {days} days)"
+            name = f"{PERIODS.get(days, f'{days}d')}_{datetime.now().strftime('%Y%m%d')}"
         print(f"📊 Generating {days}-day pattern report...")
         
-        conversations = self.load_conversations(days)
+        # Whole days, stitched from rollups - raw history is never scanned
+        summary = self.rollups.summarize(start, end)
+        total = summary["total"]
         
-        if len(conversations) < 5:
-            print(f"⚠️  Not enough data. Only {len(conversations)} conversations in last {days} days.")
+        if total < 5:
+            print(f"⚠️  Not enough data. Only {total} conversations in {period}.")
             return None
         
-        print(f"Analyzing {len(conversations)} conversations...")
+        print(f"Analyzing {total} conversations from {summary['days']} daily rollups...")
         
-        # Gather all data
-        state_counts, time_in_state = self.get_state_distribution(conversations)
-        loops = self.detect_loops(conversations)
-        breakthroughs = self.find_breakthroughs(conversations)
-        triggers = self.get_top_triggers(conversations)
-        patterns = self.load_latest_patterns()
+        if patterns is None:
+            patterns = self.load_latest_patterns()
         
         # Build markdown report
         report = self._build_markdown_report(
-            days, conversations, state_counts, time_in_state,
-            loops, breakthroughs, triggers, patterns
+            period, total, summary["state_counts"], summary["time_in_state"],
+            summary["loops"], summary["breakthroughs"], self.top_triggers(summary["triggers"]), patterns
         )
-        
-        # Save report
+        return name, report
+    
+    def save_report(self, name, report):
+        """Write a report under my_data/reports/ and return its path"""
         os.makedirs(os.path.join(self.data_dir, "reports"), exist_ok=True)
         filename = os.path.join(
             self.data_dir,
             "reports",
-            f"week_{datetime.now().strftime('%Y%m%d')}.md"
+            f"{name}.md"
         )
         
         with open(filename, 'w') as f:
@@ -221,14 +168,14 @@ class WeeklyReportGenerator:
         print(f"✅ Report saved: {filename}")
         return filename
     
-    def _build_markdown_report(self, days, conversations, state_counts, 
+    def _build_markdown_report(self, period, total, state_counts, 
                                 time_in_state, loops, breakthroughs, 
                                 triggers, patterns):
         """Build the markdown report"""
         
         report = f"""# Second Brain Weekly Report
-**Period:** {datetime.now().strftime('%B %d, %Y')} (Last {days} days)
-**Total Conversations:** {len(conversations)}
+**Period:** {period}
+**Total Conversations:** {total}
 
 ---
 
@@ -333,9 +280,254 @@ class WeeklyReportGenerator:
         return report
 
 
+class DailyRollups:
+    """
+    Per-day summaries of the conversation history, kept in memory.db.
+    A day is rolled up again when rows land in it or get relabeled. Each
+    rollup carries its first/last state so adjacent days stitch together:
+    spiral runs, breakthroughs and triggers that cross midnight still count.
+    """
+    
+    def __init__(self, data_dir="my_data"):
+        self.store = get_memory_store(data_dir)
+        self.generator = WeeklyReportGenerator(data_dir, rollups=self)
+        self._lock = threading.Lock()
+        self.version = 0  # Bumped whenever a refresh changes any rollup
+    
+    def refresh(self):
+        """Roll up every day touched since the last refresh. Returns the number of days rebuilt"""
+        with self._lock:
+            last_id = self.store.get_meta("rollup_last_id", 0)
+            days, max_id = self.store.days_touched(after_id=last_id)
+            days |= self.store.stale_rollup_days()
+            
+            for day in sorted(days):
+                try:
+                    conversations = self.store.conversations_on(day)
+                except ValueError:
+                    continue  # Timestamp that isn't a date - nothing to roll up
+                self.store.set_rollup(day, self.rollup_day(conversations))
+            
+            if max_id != last_id:
+                self.store.set_meta("rollup_last_id", max_id)
+            if days:
+                self.version += 1
+            return len(days)
+    
+    def rollup_day(self, conversations):
+        """Everything a report needs from one day, plus the state at both edges"""
+        generator = self.generator
+        sequence = StateSequence.from_conversations(conversations)
+        state_counts, time_in_state = generator.get_state_distribution(conversations, sequence)
+        
+        # Spiral runs: finished loops, plus runs touching midnight on either side
+        first_state = next((i for i, c in enumerate(conversations) if isinstance(c.get("state", {}), dict)), None)
+        lead, tail, loops = None, None, []
+        for first, last, length, closed in sequence.state_runs("🌀"):
+            run = {
+                "length": length,
+                "start": conversations[first].get("timestamp", ""),
+                "end": conversations[last].get("timestamp", ""),
+                "trigger": conversations[first].get("content", "")[:100]
+            }
+            if first == first_state:
+                lead = dict(run, closed=closed)
+            elif not closed:
+                tail = run
+            elif length >= 3:
+                loops.append(run)
+        
+        def edge(conv):
+            state = conv.get("state", {})
+            if not isinstance(state, dict):
+                return None
+            return {
+                "emoji": state.get("emoji"),
+                "name": state.get("name", ""),
+                "timestamp": conv.get("timestamp", ""),
+                "trigger": conv.get("content", "")[:150],
+                "keywords": generator.trigger_keywords(conv)
+            }
+        
+        return {
+            "total": len(conversations),
+            "state_counts": dict(state_counts),
+            "time_in_state": dict(time_in_state),
+            "labeled_bounds": sequence.labeled_bounds(),
+            "has_state": first_state is not None,
+            "lead": lead,
+            "tail": tail,
+            "loops": loops,
+            "breakthroughs": generator.find_breakthroughs(conversations, sequence),
+            # Lists of pairs - a state can be None, which JSON can't use as a key
+            "triggers": [[emoji, dict(words)] for emoji, words in
+                         generator.trigger_counts(conversations, sequence).items()],
+            "first": edge(conversations[0]) if conversations else None,
+            "last": edge(conversations[-1]) if conversations else None
+        }
+    
+    def summarize(self, start_day, end_day=None):
+        """Merge the rollups in a day range into report inputs"""
+        total = 0
+        state_counts = Counter()
+        time_in_state = defaultdict(float)
+        loops, breakthroughs = [], []
+        triggers = defaultdict(Counter)
+        prev_labeled = None  # Latest labeled (emoji, epoch) so far
+        prev_last = None  # Edge state of the previous day's last message
+        run = None  # Spiral run still open at the end of the previous day
+        
+        def close(run):
+            if run and run["length"] >= 3:
+                loops.append({"duration": run["length"], "start": run["start"],
+                              "end": run["end"], "trigger": run["trigger"]})
+        
+        rollups = self.store.rollups_between(start_day, end_day)
+        for day, rollup in rollups:
+            total += rollup["total"]
+            state_counts.update(rollup["state_counts"])
+            
+            # The gap after yesterday's last labeled message counts toward its state
+            bounds = rollup["labeled_bounds"]
+            if prev_labeled and bounds:
+                time_in_state[prev_labeled[0]] += (bounds[0][1] - prev_labeled[1]) / 3.6e9
+            for emoji, hours in rollup["time_in_state"].items():
+                time_in_state[emoji] += hours
+            if bounds:
+                prev_labeled = bounds[1]
+            
+            # Messages either side of midnight are still adjacent
+            first = rollup["first"]
+            if prev_last is not None and first is not None:
+                if prev_last["emoji"] == "🌀" and first["emoji"] in ("⚡", "🪞"):
+                    breakthroughs.append({"timestamp": first["timestamp"], "from": "spiral",
+                                          "to": first["name"], "trigger": first["trigger"]})
+                if prev_last["emoji"] != first["emoji"] and first["keywords"]:
+                    triggers[first["emoji"]].update(first["keywords"])
+            breakthroughs.extend(rollup["breakthroughs"])
+            for emoji, words in rollup["triggers"]:
+                triggers[emoji].update(words)
+            prev_last = rollup["last"]
+            
+            if rollup["has_state"]:
+                lead = rollup["lead"]
+                if lead:
+                    if run:
+                        run["length"] += lead["length"]
+                        run["end"] = lead["end"]
+                    else:
+                        run = {k: lead[k] for k in ("length", "start", "end", "trigger")}
+                    if lead["closed"]:
+                        close(run)
+                        run = None
+                else:
+                    close(run)
+                    run = None
+                loops.extend({"duration": r["length"], "start": r["start"], "end": r["end"],
+                              "trigger": r["trigger"]} for r in rollup["loops"])
+                if rollup["tail"]:
+                    run = dict(rollup["tail"])
+        
+        return {
+            "days": len(rollups),
+            "total": total,
+            "state_counts": state_counts,
+            "time_in_state": time_in_state,
+            "loops": loops,
+            "breakthroughs": breakthroughs,
+            "triggers": triggers
+        }
+
+
+# Global rollup instances, one per data directory
+_daily_rollups = {}
+_daily_rollups_lock = threading.Lock()
+
+
+def get_daily_rollups(data_dir="my_data"):
+    """Get or create the rollup singleton"""
+    with _daily_rollups_lock:
+        rollups = _daily_rollups.get(data_dir)
+        if rollups is None:
+            rollups = DailyRollups(data_dir)
+            _daily_rollups[data_dir] = rollups
+        return rollups
+
+
+class ReportRunner:
+    """
+    Builds reports in-process on one background thread, from the shared rollups.
+    Results are cached per (period, data version), so asking again before
+    anything changed returns immediately.
+    """
+    
+    def __init__(self, data_dir="my_data", cache_size=8):
+        self.rollups = get_daily_rollups(data_dir)
+        self.generator = WeeklyReportGenerator(data_dir, rollups=self.rollups)
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="weekly-report")
+        self.cache = {}  # (period, data version) -> (filename, markdown) or None
+        self.cache_size = cache_size
+        self.pending = {}  # period -> Future, so repeated clicks share one job
+        self._lock = threading.Lock()
+    
+    def submit(self, days=7, start=None, end=None):
+        """Queue a report. Returns a Future of (filename, markdown), or None if there's too little data"""
+        period = (days, start, end)
+        with self._lock:
+            future = self.pending.get(period)
+            if future is None or future.done():
+                future = self.pending[period] = self.pool.submit(self._run, period)
+            return future
+    
+    def _run(self, period):
+        self.rollups.refresh()
+        patterns = self.generator.load_latest_patterns()
+        # Relative periods also move with the calendar day
+        key = (period, datetime.now().date(), self.rollups.version, patterns.get("generated") if patterns else None)
+        
+        with self._lock:
+            if key in self.cache:
+                return self.cache[key]
+        
+        built = self.generator.build_report(*period, patterns=patterns)
+        result = None
+        if built is not None:
+            name, markdown = built
+            result = (self.generator.save_report(name, markdown), markdown)
+        
+        with self._lock:
+            self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                del self.cache[next(iter(self.cache))]
+        return result
+
+
+# Global runner instances, one per data directory
+_report_runners = {}
+_report_runners_lock = threading.Lock()
+
+
+def get_report_runner(data_dir="my_data"):
+    """Get or create the report runner singleton"""
+    with _report_runners_lock:
+        runner = _report_runners.get(data_dir)
+        if runner is None:
+            runner = ReportRunner(data_dir)
+            _report_runners[data_dir] = runner
+        return runner
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pattern digest over the last N days")
+    parser.add_argument("--days", type=int, default=7, help="7 = weekly, 30 = monthly, 365 = yearly")
+    parser.add_argument("--from", dest="start", type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(),
+                        help="First day (YYYY-MM-DD) - overrides --days")
+    parser.add_argument("--to", dest="end", type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(),
+                        help="Last day (YYYY-MM-DD, default: today)")
+    args = parser.parse_args()
+    
     generator = WeeklyReportGenerator()
-    report_file = generator.generate_report(days=7)
+    report_file = generator.generate_report(days=args.days, start=args.start, end=args.end)
     
     if report_file:
         print(f"\n📄 View report: cat {report_file}")
\ No newline at end of file